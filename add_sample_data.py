@@ -1,27 +1,8 @@
-import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
-from database import Base, OrderProduct, Plant, PlantMaterial, PlantProduct, Product, Material, ProductMaterial, StorageProduct, StorageMaterial, Order
+from database import Session, init_db, OrderProduct, Plant, PlantMaterial, PlantProduct, Product, Material, ProductMaterial, StorageProduct, StorageMaterial, Order
 
-# Connect to DB
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATABASE_FILE = os.path.join(BASE_DIR, "project.db")
-DATABASE_URL = "sqlite:///" + DATABASE_FILE
-engine = create_engine(DATABASE_URL, echo=True)
-# Base = declarative_base()
-
-# Test connection
-try:
-    with engine.connect() as connection:
-        print("Database connected successfully!")
-except Exception as e:
-    print(f"Error connecting to database: {e}")
-
-
-# Create a new session
-Session = sessionmaker(bind=engine)
+# Create the schema if needed and reuse the application's engine
+init_db()
 session = Session()
 
 # Generate example data
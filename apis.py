@@ -1,50 +1,106 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from contextlib import asynccontextmanager
+from fastapi import APIRouter, FastAPI, Depends, HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse, ORJSONResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import delete, select, update
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel  
+import anyio.to_thread
 
 
 import schemas
-from database import get_db, Plant, Product, Material, Order, PlantProduct, PlantMaterial
+from atp import router as atp_router
+from bom import router as bom_router
+from bulk import router as bulk_router
+from cache import ResponseCache, ResponseCacheMiddleware
+from conditional import CATALOG, VOLATILE, conditional_get
+from consumption import CONSUMING_STATUSES, consume, router as consumption_router
+from export import router as export_router
+from includes import Include, IncludeTree
+from inventory import router as inventory_router
+from ledger import compact_periodically, router as ledger_router
+from mrp import router as mrp_router
+from instrumentation import SQLStatsMiddleware
+from nplusone import NPlusOneMiddleware
+from pagination import Page
+from search import router as search_router
+from serialization import json_list, row_columns
+from upsert import router as upsert_router
+from schemas import PlantProductCreate, PlantMaterialCreate, ProductMaterialCreate, OrderProductCreate
+from schemas import StorageProductCreate, StorageMaterialCreate
+from database import get_db, get_engine, get_read_db, init_db, settings, Plant, Product, Material, Order, PlantProduct, PlantMaterial
 from database import StorageProduct, StorageMaterial, ProductMaterial, OrderProduct
 
-app = FastAPI(title="Manufacturing Management API", 
-              description="API for managing plants, products, materials, and orders")
 
-class PlantProductCreate(BaseModel):
-    plant_id: int
-    product_id: int
-    quantity: Optional[int] = None
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Keep the worker threadpool and the connection pool the same size.
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.threadpool_size
+    await anyio.to_thread.run_sync(init_db)
+    async with anyio.create_task_group() as tasks:
+        if settings.ledger_compact_interval > 0:
+            tasks.start_soon(compact_periodically, get_engine(), settings.ledger_compact_interval,
+                             settings.ledger_snapshot_every)
+        yield
+        tasks.cancel_scope.cancel()
 
-class PlantMaterialCreate(BaseModel):
-    plant_id: int
-    material_id: int
-    quantity: Optional[int] = None
 
-class ProductMaterialCreate(BaseModel):
-    product_id: int
-    material_id: int
-    quantity: int
+app = FastAPI(title="Manufacturing Management API", 
+              description="API for managing plants, products, materials, and orders",
+              default_response_class=ORJSONResponse,
+              lifespan=lifespan)
+response_cache = ResponseCache(settings.response_cache_size, settings.response_cache_ttl)
+app.add_middleware(ResponseCacheMiddleware, cache=response_cache, resources=settings.cached_resources)
+app.add_middleware(NPlusOneMiddleware, settings=settings)
+app.add_middleware(SQLStatsMiddleware)
+router = APIRouter()
+
+PLANT_INCLUDES = Depends(Include(Plant, schemas.PlantWithRelations))
+PRODUCT_INCLUDES = Depends(Include(Product, schemas.ProductWithRelations))
+MATERIAL_INCLUDES = Depends(Include(Material, schemas.MaterialWithRelations))
+ORDER_INCLUDES = Depends(Include(Order, schemas.OrderWithRelations))
+
+
+@app.exception_handler(IntegrityError)
+async def integrity_error_handler(request: Request, exc: IntegrityError):
+    # Duplicate natural keys and dangling foreign keys are client errors, not crashes.
+    return JSONResponse(status_code=status.HTTP_409_CONFLICT, content={"detail": str(exc.orig)})
+
+
+def update_row(db: Session, model, item_id: int, values: dict, not_found: str):
+    """Update one row with a single UPDATE ... RETURNING and return the new values."""
+    table = model.__table__
+    if values:
+        statement = update(table).where(table.c.id == item_id).values(**values).returning(*table.c)
+    else:
+        statement = select(table).where(table.c.id == item_id)
+    row = db.execute(statement).one_or_none()
+    if row is None:
+        raise HTTPException(status_code=404, detail=not_found)
+    db.commit()
+    return row._mapping
 
-class OrderProductCreate(BaseModel):
-    order_id: int
-    product_id: int
-    quantity: int
 
-class StorageProductCreate(BaseModel):
-    product_id: int
-    quantity: int
+def delete_row(db: Session, model, item_id: int, not_found: str) -> None:
+    """Delete one row with a single DELETE ... RETURNING; the schema cascades to its children."""
+    table = model.__table__
+    deleted = db.execute(delete(table).where(table.c.id == item_id).returning(table.c.id)).scalar_one_or_none()
+    if deleted is None:
+        raise HTTPException(status_code=404, detail=not_found)
+    db.commit()
 
-class StorageMaterialCreate(BaseModel):
-    material_id: int
-    quantity: int
 
 @app.get('/')
 async def root():
     return {'message': 'Welcome!'}
 
-@app.post("/plants/", response_model=schemas.Plant, status_code=status.HTTP_201_CREATED)
+@app.get('/cache/stats')
+async def cache_stats():
+    return response_cache.stats()
+
+@router.post("/plants/", response_model=schemas.Plant, status_code=status.HTTP_201_CREATED)
 def create_plant(plant: schemas.PlantCreate, db: Session = Depends(get_db)):
     db_plant = Plant(name=plant.name, location=plant.location, capacity=plant.capacity)
     db.add(db_plant)
@@ -52,42 +108,38 @@ def create_plant(plant: schemas.PlantCreate, db: Session = Depends(get_db)):
     db.refresh(db_plant)
     return db_plant
 
-@app.get("/plants/", response_model=List[schemas.Plant])
-def read_plants(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    plants = db.query(Plant).offset(skip).limit(limit).all()
-    return plants
-
-@app.get("/plants/{plant_id}", response_model=schemas.Plant)
-def read_plant(plant_id: int, db: Session = Depends(get_db)):
-    plant = db.query(Plant).filter(Plant.id == plant_id).first()
+@router.get("/plants/", response_model=List[schemas.PlantWithRelations],
+            dependencies=[Depends(conditional_get("plant", cache_control=CATALOG, includes=Plant))])
+def read_plants(page: Page = Depends(), include: IncludeTree = PLANT_INCLUDES,
+                db: Session = Depends(get_read_db)):
+    if include:
+        return include.render_list(page.all(include.query(db)), page.response)
+    plants = page.all(db.query(*row_columns(Plant)))
+    return json_list(schemas.Plant, plants, page.response)
+
+@router.get("/plants/{plant_id}", response_model=schemas.PlantWithRelations,
+            dependencies=[Depends(conditional_get("plant", cache_control=CATALOG, includes=Plant))])
+def read_plant(plant_id: int, response: Response, include: IncludeTree = PLANT_INCLUDES,
+               db: Session = Depends(get_read_db)):
+    plant = include.query(db).filter(Plant.id == plant_id).first()
     if plant is None:
         raise HTTPException(status_code=404, detail="Plant not found")
-    return plant
+    return include.render_one(plant, response)
 
-@app.put("/plants/{plant_id}", response_model=schemas.Plant)
+@router.put("/plants/{plant_id}", response_model=schemas.Plant)
 def update_plant(plant_id: int, plant: schemas.PlantCreate, db: Session = Depends(get_db)):
-    db_plant = db.query(Plant).filter(Plant.id == plant_id).first()
-    if db_plant is None:
-        raise HTTPException(status_code=404, detail="Plant not found")
-    
-    for key, value in plant.dict().items():
-        setattr(db_plant, key, value)
-    
-    db.commit()
-    db.refresh(db_plant)
-    return db_plant
+    return update_row(db, Plant, plant_id, plant.model_dump(), "Plant not found")
 
-@app.delete("/plants/{plant_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.patch("/plants/{plant_id}", response_model=schemas.Plant)
+def patch_plant(plant_id: int, plant: schemas.PlantUpdate, db: Session = Depends(get_db)):
+    return update_row(db, Plant, plant_id, plant.model_dump(exclude_unset=True), "Plant not found")
+
+@router.delete("/plants/{plant_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_plant(plant_id: int, db: Session = Depends(get_db)):
-    db_plant = db.query(Plant).filter(Plant.id == plant_id).first()
-    if db_plant is None:
-        raise HTTPException(status_code=404, detail="Plant not found")
-    
-    db.delete(db_plant)
-    db.commit()
+    delete_row(db, Plant, plant_id, "Plant not found")
     return None
 
-@app.post("/products/", response_model=schemas.Product, status_code=status.HTTP_201_CREATED)
+@router.post("/products/", response_model=schemas.Product, status_code=status.HTTP_201_CREATED)
 def create_product(product: schemas.ProductCreate, db: Session = Depends(get_db)):
     db_product = Product(
         name=product.name,
@@ -100,42 +152,38 @@ def create_product(product: schemas.ProductCreate, db: Session = Depends(get_db)
     db.refresh(db_product)
     return db_product
 
-@app.get("/products/", response_model=List[schemas.Product])
-def read_products(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    products = db.query(Product).offset(skip).limit(limit).all()
-    return products
-
-@app.get("/products/{product_id}", response_model=schemas.Product)
-def read_product(product_id: int, db: Session = Depends(get_db)):
-    product = db.query(Product).filter(Product.id == product_id).first()
+@router.get("/products/", response_model=List[schemas.ProductWithRelations],
+            dependencies=[Depends(conditional_get("product", cache_control=CATALOG, includes=Product))])
+def read_products(page: Page = Depends(), include: IncludeTree = PRODUCT_INCLUDES,
+                  db: Session = Depends(get_read_db)):
+    if include:
+        return include.render_list(page.all(include.query(db)), page.response)
+    products = page.all(db.query(*row_columns(Product)))
+    return json_list(schemas.Product, products, page.response)
+
+@router.get("/products/{product_id}", response_model=schemas.ProductWithRelations,
+            dependencies=[Depends(conditional_get("product", cache_control=CATALOG, includes=Product))])
+def read_product(product_id: int, response: Response, include: IncludeTree = PRODUCT_INCLUDES,
+                 db: Session = Depends(get_read_db)):
+    product = include.query(db).filter(Product.id == product_id).first()
     if product is None:
         raise HTTPException(status_code=404, detail="Product not found")
-    return product
+    return include.render_one(product, response)
 
-@app.put("/products/{product_id}", response_model=schemas.Product)
+@router.put("/products/{product_id}", response_model=schemas.Product)
 def update_product(product_id: int, product: schemas.ProductCreate, db: Session = Depends(get_db)):
-    db_product = db.query(Product).filter(Product.id == product_id).first()
-    if db_product is None:
-        raise HTTPException(status_code=404, detail="Product not found")
-    
-    for key, value in product.dict().items():
-        setattr(db_product, key, value)
-    
-    db.commit()
-    db.refresh(db_product)
-    return db_product
+    return update_row(db, Product, product_id, product.model_dump(), "Product not found")
+
+@router.patch("/products/{product_id}", response_model=schemas.Product)
+def patch_product(product_id: int, product: schemas.ProductUpdate, db: Session = Depends(get_db)):
+    return update_row(db, Product, product_id, product.model_dump(exclude_unset=True), "Product not found")
 
-@app.delete("/products/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete("/products/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_product(product_id: int, db: Session = Depends(get_db)):
-    db_product = db.query(Product).filter(Product.id == product_id).first()
-    if db_product is None:
-        raise HTTPException(status_code=404, detail="Product not found")
-    
-    db.delete(db_product)
-    db.commit()
+    delete_row(db, Product, product_id, "Product not found")
     return None
 
-@app.post("/materials/", response_model=schemas.Material, status_code=status.HTTP_201_CREATED)
+@router.post("/materials/", response_model=schemas.Material, status_code=status.HTTP_201_CREATED)
 def create_material(material: schemas.MaterialCreate, db: Session = Depends(get_db)):
     db_material = Material(
         name=material.name,
@@ -148,42 +196,38 @@ def create_material(material: schemas.MaterialCreate, db: Session = Depends(get_
     db.refresh(db_material)
     return db_material
 
-@app.get("/materials/", response_model=List[schemas.Material])
-def read_materials(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    materials = db.query(Material).offset(skip).limit(limit).all()
-    return materials
-
-@app.get("/materials/{material_id}", response_model=schemas.Material)
-def read_material(material_id: int, db: Session = Depends(get_db)):
-    material = db.query(Material).filter(Material.id == material_id).first()
+@router.get("/materials/", response_model=List[schemas.MaterialWithRelations],
+            dependencies=[Depends(conditional_get("material", cache_control=CATALOG, includes=Material))])
+def read_materials(page: Page = Depends(), include: IncludeTree = MATERIAL_INCLUDES,
+                   db: Session = Depends(get_read_db)):
+    if include:
+        return include.render_list(page.all(include.query(db)), page.response)
+    materials = page.all(db.query(*row_columns(Material)))
+    return json_list(schemas.Material, materials, page.response)
+
+@router.get("/materials/{material_id}", response_model=schemas.MaterialWithRelations,
+            dependencies=[Depends(conditional_get("material", cache_control=CATALOG, includes=Material))])
+def read_material(material_id: int, response: Response, include: IncludeTree = MATERIAL_INCLUDES,
+                  db: Session = Depends(get_read_db)):
+    material = include.query(db).filter(Material.id == material_id).first()
     if material is None:
         raise HTTPException(status_code=404, detail="Material not found")
-    return material
+    return include.render_one(material, response)
 
-@app.put("/materials/{material_id}", response_model=schemas.Material)
+@router.put("/materials/{material_id}", response_model=schemas.Material)
 def update_material(material_id: int, material: schemas.MaterialCreate, db: Session = Depends(get_db)):
-    db_material = db.query(Material).filter(Material.id == material_id).first()
-    if db_material is None:
-        raise HTTPException(status_code=404, detail="Material not found")
-    
-    for key, value in material.dict().items():
-        setattr(db_material, key, value)
-    
-    db.commit()
-    db.refresh(db_material)
-    return db_material
+    return update_row(db, Material, material_id, material.model_dump(), "Material not found")
 
-@app.delete("/materials/{material_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.patch("/materials/{material_id}", response_model=schemas.Material)
+def patch_material(material_id: int, material: schemas.MaterialUpdate, db: Session = Depends(get_db)):
+    return update_row(db, Material, material_id, material.model_dump(exclude_unset=True), "Material not found")
+
+@router.delete("/materials/{material_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_material(material_id: int, db: Session = Depends(get_db)):
-    db_material = db.query(Material).filter(Material.id == material_id).first()
-    if db_material is None:
-        raise HTTPException(status_code=404, detail="Material not found")
-    
-    db.delete(db_material)
-    db.commit()
+    delete_row(db, Material, material_id, "Material not found")
     return None
 
-@app.post("/orders/", response_model=schemas.Order, status_code=status.HTTP_201_CREATED)
+@router.post("/orders/", response_model=schemas.Order, status_code=status.HTTP_201_CREATED)
 def create_order(order: schemas.OrderCreate, db: Session = Depends(get_db)):
     db_order = Order(
         order_date=order.order_date,
@@ -195,42 +239,42 @@ def create_order(order: schemas.OrderCreate, db: Session = Depends(get_db)):
     db.refresh(db_order)
     return db_order
 
-@app.get("/orders/", response_model=List[schemas.Order])
-def read_orders(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    orders = db.query(Order).offset(skip).limit(limit).all()
-    return orders
-
-@app.get("/orders/{order_id}", response_model=schemas.Order)
-def read_order(order_id: int, db: Session = Depends(get_db)):
-    order = db.query(Order).filter(Order.id == order_id).first()
+@router.get("/orders/", response_model=List[schemas.OrderWithRelations],
+            dependencies=[Depends(conditional_get("order", cache_control=VOLATILE, includes=Order))])
+def read_orders(page: Page = Depends(), include: IncludeTree = ORDER_INCLUDES,
+                db: Session = Depends(get_read_db)):
+    if include:
+        return include.render_list(page.all(include.query(db)), page.response)
+    orders = page.all(db.query(*row_columns(Order)))
+    return json_list(schemas.Order, orders, page.response)
+
+@router.get("/orders/{order_id}", response_model=schemas.OrderWithRelations,
+            dependencies=[Depends(conditional_get("order", cache_control=VOLATILE, includes=Order))])
+def read_order(order_id: int, response: Response, include: IncludeTree = ORDER_INCLUDES,
+               db: Session = Depends(get_read_db)):
+    order = include.query(db).filter(Order.id == order_id).first()
     if order is None:
         raise HTTPException(status_code=404, detail="Order not found")
-    return order
+    return include.render_one(order, response)
 
-@app.put("/orders/{order_id}", response_model=schemas.Order)
+@router.put("/orders/{order_id}", response_model=schemas.Order)
 def update_order(order_id: int, order: schemas.OrderCreate, db: Session = Depends(get_db)):
-    db_order = db.query(Order).filter(Order.id == order_id).first()
-    if db_order is None:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    for key, value in order.dict().items():
-        setattr(db_order, key, value)
-    
-    db.commit()
-    db.refresh(db_order)
-    return db_order
+    if order.status in CONSUMING_STATUSES:
+        consume(db, [order_id], order.status)
+    return update_row(db, Order, order_id, order.model_dump(), "Order not found")
+
+@router.patch("/orders/{order_id}", response_model=schemas.Order)
+def patch_order(order_id: int, order: schemas.OrderUpdate, db: Session = Depends(get_db)):
+    if order.status in CONSUMING_STATUSES:
+        consume(db, [order_id], order.status)
+    return update_row(db, Order, order_id, order.model_dump(exclude_unset=True), "Order not found")
 
-@app.delete("/orders/{order_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete("/orders/{order_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_order(order_id: int, db: Session = Depends(get_db)):
-    db_order = db.query(Order).filter(Order.id == order_id).first()
-    if db_order is None:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    db.delete(db_order)
-    db.commit()
+    delete_row(db, Order, order_id, "Order not found")
     return None
 
-@app.post("/plant-products/", status_code=status.HTTP_201_CREATED)
+@router.post("/plant-products/", response_model=schemas.PlantProduct, status_code=status.HTTP_201_CREATED)
 def create_plant_product(plant_product: PlantProductCreate, db: Session = Depends(get_db)):
     db_plant_product = PlantProduct(
         plant_id=plant_product.plant_id,
@@ -242,22 +286,18 @@ def create_plant_product(plant_product: PlantProductCreate, db: Session = Depend
     db.refresh(db_plant_product)
     return db_plant_product
 
-@app.get("/plant-products/")
-def read_plant_products(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    plant_products = db.query(PlantProduct).offset(skip).limit(limit).all()
-    return plant_products
+@router.get("/plant-products/", response_model=List[schemas.PlantProduct],
+            dependencies=[Depends(conditional_get("plant_product", cache_control=CATALOG))])
+def read_plant_products(page: Page = Depends(), db: Session = Depends(get_read_db)):
+    plant_products = page.all(db.query(*row_columns(PlantProduct)))
+    return json_list(schemas.PlantProduct, plant_products, page.response)
 
-@app.delete("/plant-products/{plant_product_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete("/plant-products/{plant_product_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_plant_product(plant_product_id: int, db: Session = Depends(get_db)):
-    db_plant_product = db.query(PlantProduct).filter(PlantProduct.id == plant_product_id).first()
-    if db_plant_product is None:
-        raise HTTPException(status_code=404, detail="Plant-Product association not found")
-    
-    db.delete(db_plant_product)
-    db.commit()
+    delete_row(db, PlantProduct, plant_product_id, "Plant-Product association not found")
     return None
 
-@app.post("/plant-materials/", status_code=status.HTTP_201_CREATED)
+@router.post("/plant-materials/", response_model=schemas.PlantMaterial, status_code=status.HTTP_201_CREATED)
 def create_plant_material(plant_material: PlantMaterialCreate, db: Session = Depends(get_db)):
     db_plant_material = PlantMaterial(
         plant_id=plant_material.plant_id,
@@ -269,22 +309,18 @@ def create_plant_material(plant_material: PlantMaterialCreate, db: Session = Dep
     db.refresh(db_plant_material)
     return db_plant_material
 
-@app.get("/plant-materials/")
-def read_plant_materials(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    plant_materials = db.query(PlantMaterial).offset(skip).limit(limit).all()
-    return plant_materials
+@router.get("/plant-materials/", response_model=List[schemas.PlantMaterial],
+            dependencies=[Depends(conditional_get("plant_material", cache_control=CATALOG))])
+def read_plant_materials(page: Page = Depends(), db: Session = Depends(get_read_db)):
+    plant_materials = page.all(db.query(*row_columns(PlantMaterial)))
+    return json_list(schemas.PlantMaterial, plant_materials, page.response)
 
-@app.delete("/plant-materials/{plant_material_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete("/plant-materials/{plant_material_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_plant_material(plant_material_id: int, db: Session = Depends(get_db)):
-    db_plant_material = db.query(PlantMaterial).filter(PlantMaterial.id == plant_material_id).first()
-    if db_plant_material is None:
-        raise HTTPException(status_code=404, detail="Plant-Material association not found")
-    
-    db.delete(db_plant_material)
-    db.commit()
+    delete_row(db, PlantMaterial, plant_material_id, "Plant-Material association not found")
     return None
 
-@app.post("/product-materials/", status_code=status.HTTP_201_CREATED)
+@router.post("/product-materials/", response_model=schemas.ProductMaterial, status_code=status.HTTP_201_CREATED)
 def create_product_material(product_material: ProductMaterialCreate, db: Session = Depends(get_db)):
     db_product_material = ProductMaterial(
         product_id=product_material.product_id,
@@ -296,22 +332,18 @@ def create_product_material(product_material: ProductMaterialCreate, db: Session
     db.refresh(db_product_material)
     return db_product_material
 
-@app.get("/product-materials/")
-def read_product_materials(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    product_materials = db.query(ProductMaterial).offset(skip).limit(limit).all()
-    return product_materials
+@router.get("/product-materials/", response_model=List[schemas.ProductMaterial],
+            dependencies=[Depends(conditional_get("product_material", cache_control=CATALOG))])
+def read_product_materials(page: Page = Depends(), db: Session = Depends(get_read_db)):
+    product_materials = page.all(db.query(*row_columns(ProductMaterial)))
+    return json_list(schemas.ProductMaterial, product_materials, page.response)
 
-@app.delete("/product-materials/{product_material_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete("/product-materials/{product_material_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_product_material(product_material_id: int, db: Session = Depends(get_db)):
-    db_product_material = db.query(ProductMaterial).filter(ProductMaterial.id == product_material_id).first()
-    if db_product_material is None:
-        raise HTTPException(status_code=404, detail="Product-Material association not found")
-    
-    db.delete(db_product_material)
-    db.commit()
+    delete_row(db, ProductMaterial, product_material_id, "Product-Material association not found")
     return None
 
-@app.post("/order-products/", status_code=status.HTTP_201_CREATED)
+@router.post("/order-products/", response_model=schemas.OrderProduct, status_code=status.HTTP_201_CREATED)
 def create_order_product(order_product: OrderProductCreate, db: Session = Depends(get_db)):
     db_order_product = OrderProduct(
         order_id=order_product.order_id,
@@ -323,23 +355,19 @@ def create_order_product(order_product: OrderProductCreate, db: Session = Depend
     db.refresh(db_order_product)
     return db_order_product
 
-@app.get("/order-products/")
-def read_order_products(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    order_products = db.query(OrderProduct).offset(skip).limit(limit).all()
-    return order_products
+@router.get("/order-products/", response_model=List[schemas.OrderProduct],
+            dependencies=[Depends(conditional_get("order_product", cache_control=VOLATILE))])
+def read_order_products(page: Page = Depends(), db: Session = Depends(get_read_db)):
+    order_products = page.all(db.query(*row_columns(OrderProduct)))
+    return json_list(schemas.OrderProduct, order_products, page.response)
 
-@app.delete("/order-products/{order_product_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete("/order-products/{order_product_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_order_product(order_product_id: int, db: Session = Depends(get_db)):
-    db_order_product = db.query(OrderProduct).filter(OrderProduct.id == order_product_id).first()
-    if db_order_product is None:
-        raise HTTPException(status_code=404, detail="Order-Product association not found")
-    
-    db.delete(db_order_product)
-    db.commit()
+    delete_row(db, OrderProduct, order_product_id, "Order-Product association not found")
     return None
 
 # StorageProduct operatons
-@app.post("/storage-products/", status_code=status.HTTP_201_CREATED)
+@router.post("/storage-products/", response_model=schemas.StorageProduct, status_code=status.HTTP_201_CREATED)
 def create_storage_product(storage_product: StorageProductCreate, db: Session = Depends(get_db)):
     db_storage_product = StorageProduct(
         product_id=storage_product.product_id,
@@ -350,35 +378,26 @@ def create_storage_product(storage_product: StorageProductCreate, db: Session =
     db.refresh(db_storage_product)
     return db_storage_product
 
-@app.get("/storage-products/")
-def read_storage_products(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    storage_products = db.query(StorageProduct).offset(skip).limit(limit).all()
-    return storage_products
+@router.get("/storage-products/", response_model=List[schemas.StorageProduct],
+            dependencies=[Depends(conditional_get("storage_product", cache_control=VOLATILE))])
+def read_storage_products(page: Page = Depends(), db: Session = Depends(get_read_db)):
+    storage_products = page.all(db.query(*row_columns(StorageProduct)))
+    return json_list(schemas.StorageProduct, storage_products, page.response)
 
-@app.put("/storage-products/{storage_product_id}")
+@router.put("/storage-products/{storage_product_id}", response_model=schemas.StorageProduct)
 def update_storage_product(storage_product_id: int, storage_product: StorageProductCreate, db: Session = Depends(get_db)):
-    db_storage_product = db.query(StorageProduct).filter(StorageProduct.id == storage_product_id).first()
-    if db_storage_product is None:
-        raise HTTPException(status_code=404, detail="Storage Product not found")
-    
-    for key, value in storage_product.dict().items():
-        setattr(db_storage_product, key, value)
-    
-    db.commit()
-    db.refresh(db_storage_product)
-    return db_storage_product
+    return update_row(db, StorageProduct, storage_product_id, storage_product.model_dump(), "Storage Product not found")
+
+@router.patch("/storage-products/{storage_product_id}", response_model=schemas.StorageProduct)
+def patch_storage_product(storage_product_id: int, storage_product: schemas.StorageProductUpdate, db: Session = Depends(get_db)):
+    return update_row(db, StorageProduct, storage_product_id, storage_product.model_dump(exclude_unset=True), "Storage Product not found")
 
-@app.delete("/storage-products/{storage_product_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete("/storage-products/{storage_product_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_storage_product(storage_product_id: int, db: Session = Depends(get_db)):
-    db_storage_product = db.query(StorageProduct).filter(StorageProduct.id == storage_product_id).first()
-    if db_storage_product is None:
-        raise HTTPException(status_code=404, detail="Storage Product not found")
-    
-    db.delete(db_storage_product)
-    db.commit()
+    delete_row(db, StorageProduct, storage_product_id, "Storage Product not found")
     return None
 
-@app.post("/storage-materials/", status_code=status.HTTP_201_CREATED)
+@router.post("/storage-materials/", response_model=schemas.StorageMaterial, status_code=status.HTTP_201_CREATED)
 def create_storage_material(storage_material: StorageMaterialCreate, db: Session = Depends(get_db)):
     db_storage_material = StorageMaterial(
         material_id=storage_material.material_id,
@@ -389,34 +408,42 @@ def create_storage_material(storage_material: StorageMaterialCreate, db: Session
     db.refresh(db_storage_material)
     return db_storage_material
 
-@app.get("/storage-materials/")
-def read_storage_materials(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    storage_materials = db.query(StorageMaterial).offset(skip).limit(limit).all()
-    return storage_materials
+@router.get("/storage-materials/", response_model=List[schemas.StorageMaterial],
+            dependencies=[Depends(conditional_get("storage_material", cache_control=VOLATILE))])
+def read_storage_materials(page: Page = Depends(), db: Session = Depends(get_read_db)):
+    storage_materials = page.all(db.query(*row_columns(StorageMaterial)))
+    return json_list(schemas.StorageMaterial, storage_materials, page.response)
 
-@app.put("/storage-materials/{storage_material_id}")
+@router.put("/storage-materials/{storage_material_id}", response_model=schemas.StorageMaterial)
 def update_storage_material(storage_material_id: int, storage_material: StorageMaterialCreate, db: Session = Depends(get_db)):
-    db_storage_material = db.query(StorageMaterial).filter(StorageMaterial.id == storage_material_id).first()
-    if db_storage_material is None:
-        raise HTTPException(status_code=404, detail="Storage Material not found")
-    
-    for key, value in storage_material.dict().items():
-        setattr(db_storage_material, key, value)
-    
-    db.commit()
-    db.refresh(db_storage_material)
-    return db_storage_material
+    return update_row(db, StorageMaterial, storage_material_id, storage_material.model_dump(), "Storage Material not found")
 
-@app.delete("/storage-materials/{storage_material_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.patch("/storage-materials/{storage_material_id}", response_model=schemas.StorageMaterial)
+def patch_storage_material(storage_material_id: int, storage_material: schemas.StorageMaterialUpdate, db: Session = Depends(get_db)):
+    return update_row(db, StorageMaterial, storage_material_id, storage_material.model_dump(exclude_unset=True), "Storage Material not found")
+
+@router.delete("/storage-materials/{storage_material_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_storage_material(storage_material_id: int, db: Session = Depends(get_db)):
-    db_storage_material = db.query(StorageMaterial).filter(StorageMaterial.id == storage_material_id).first()
-    if db_storage_material is None:
-        raise HTTPException(status_code=404, detail="Storage Material not found")
-    
-    db.delete(db_storage_material)
-    db.commit()
+    delete_row(db, StorageMaterial, storage_material_id, "Storage Material not found")
     return None
 
+if settings.async_db:
+    from async_apis import router as crud_router
+else:
+    crud_router = router
+app.include_router(bulk_router)
+# Before the CRUD routes, or PUT /storage-products/{id} would swallow /by-key.
+app.include_router(upsert_router)
+app.include_router(crud_router)
+app.include_router(export_router)
+app.include_router(search_router)
+app.include_router(bom_router)
+app.include_router(mrp_router)
+app.include_router(atp_router)
+app.include_router(consumption_router)
+app.include_router(inventory_router)
+app.include_router(ledger_router)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
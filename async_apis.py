@@ -0,0 +1,117 @@
+"""Async variants of the CRUD endpoints in apis.py.
+
+apis.py mounts this router instead of its own one when DB_ASYNC is set. Routes,
+names, response models, status codes, ETags and ``?include=`` mirror the sync
+handlers one to one; they just await an AsyncSession instead of running on the
+threadpool.
+"""
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Response, status
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from conditional import async_conditional_get
+from consumption import CONSUMING_STATUSES, consume
+from database import Order, get_async_db, get_async_read_db
+from includes import Include, IncludeTree
+from pagination import Page
+from serialization import json_list, row_columns
+from resources import RESOURCES
+
+router = APIRouter()
+
+
+async def _update_row(db: AsyncSession, resource, item_id: int, values: dict):
+    table = resource.table
+    if values:
+        statement = update(table).where(table.c.id == item_id).values(**values).returning(*table.c)
+    else:
+        statement = select(table).where(table.c.id == item_id)
+    row = (await db.execute(statement)).one_or_none()
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"{resource.label} not found")
+    await db.commit()
+    return row._mapping
+
+
+async def _consume(db: AsyncSession, resource, item_id: int, values: dict) -> None:
+    # Completing or shipping an order takes its stock, as in apis.update_order; consume() is sync ORM code.
+    if resource.model is Order and values.get("status") in CONSUMING_STATUSES:
+        await db.run_sync(consume, [item_id], values["status"])
+
+
+def add_crud_routes(router: APIRouter, resource) -> None:
+    model = resource.model
+    create_schema = resource.create_schema
+    item_path = f"{resource.path}/{{{resource.id_param}}}"
+    item_id_param = Path(alias=resource.id_param)
+
+    async def create(payload: create_schema, db: AsyncSession = Depends(get_async_db)):
+        item = model(**payload.model_dump())
+        db.add(item)
+        await db.commit()
+        await db.refresh(item)
+        return item
+
+    includes = model if resource.with_relations else None
+    versions = Depends(async_conditional_get(resource.table.name, cache_control=resource.cache_control,
+                                             includes=includes))
+    # Resources without relationships to include get an always empty tree.
+    include_param = Depends(Include(model, resource.with_relations) if resource.with_relations
+                            else lambda: IncludeTree(model, resource.schema, {}))
+
+    async def read_list(page: Page = Depends(), include: IncludeTree = include_param,
+                        db: AsyncSession = Depends(get_async_read_db)):
+        if include:
+            result = await db.execute(page.apply(include.statement()))
+            return include.render_list(page.finish(result.scalars().all()), page.response)
+        result = await db.execute(page.apply(select(*row_columns(model))))
+        return json_list(resource.schema, page.finish(result.all()), page.response)
+
+    async def read_one(response: Response, item_id: int = item_id_param, include: IncludeTree = include_param,
+                       db: AsyncSession = Depends(get_async_read_db)):
+        item = (await db.execute(include.statement().where(model.id == item_id))).scalars().first()
+        if item is None:
+            raise HTTPException(status_code=404, detail=f"{resource.label} not found")
+        return include.render_one(item, response)
+
+    async def update(payload: create_schema, item_id: int = item_id_param,
+                     db: AsyncSession = Depends(get_async_db)):
+        values = payload.model_dump()
+        await _consume(db, resource, item_id, values)
+        return await _update_row(db, resource, item_id, values)
+
+    async def patch(payload: resource.update_schema, item_id: int = item_id_param,
+                    db: AsyncSession = Depends(get_async_db)):
+        values = payload.model_dump(exclude_unset=True)
+        await _consume(db, resource, item_id, values)
+        return await _update_row(db, resource, item_id, values)
+
+    async def delete_one(item_id: int = item_id_param, db: AsyncSession = Depends(get_async_db)):
+        table = resource.table
+        result = await db.execute(delete(table).where(table.c.id == item_id).returning(table.c.id))
+        if result.scalar_one_or_none() is None:
+            raise HTTPException(status_code=404, detail=f"{resource.label} not found")
+        await db.commit()
+        return None
+
+    router.add_api_route(f"{resource.path}/", create, methods=["POST"], response_model=resource.schema,
+                         status_code=status.HTTP_201_CREATED, name=f"create_{resource.singular}")
+    read_schema = resource.with_relations or resource.schema
+    router.add_api_route(f"{resource.path}/", read_list, methods=["GET"], response_model=List[read_schema],
+                         dependencies=[versions], name=f"read_{resource.plural}")
+    if resource.has_detail:
+        router.add_api_route(item_path, read_one, methods=["GET"], response_model=read_schema,
+                             dependencies=[versions], name=f"read_{resource.singular}")
+    if resource.updatable:
+        router.add_api_route(item_path, update, methods=["PUT"], response_model=resource.schema,
+                             name=f"update_{resource.singular}")
+        router.add_api_route(item_path, patch, methods=["PATCH"], response_model=resource.schema,
+                             name=f"patch_{resource.singular}")
+    router.add_api_route(item_path, delete_one, methods=["DELETE"], status_code=status.HTTP_204_NO_CONTENT,
+                         name=f"delete_{resource.singular}")
+
+
+for _resource in RESOURCES:
+    add_crud_routes(router, _resource)
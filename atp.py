@@ -0,0 +1,166 @@
+"""Available to promise: how many units of each product can be delivered now.
+
+``atp = on_hand + buildable``, where ``on_hand`` is the finished stock in
+``storage_product`` and ``buildable`` is the number of units the
+``storage_material`` stock can make given the product's ``product_material``
+recipe, i.e. the smallest ``stock // quantity`` over its materials (0 without
+a recipe).
+
+Answers come from ``product_atp``, one row per product that triggers keep
+current: a storage_product write refreshes that product's ``on_hand``, a recipe
+write refreshes that product's ``buildable``, and a storage_material write
+refreshes ``buildable`` of every product using the material (found through
+``ix_product_material_material_id``). ``GET /atp`` pages through it like the
+product list (``Page``: cursor, sort and filters, at most ``MAX_LIMIT`` rows),
+with each page encoded to JSON by SQLite and cached until one of the source
+tables changes, and ``GET /products/{id}/atp`` is a primary-key lookup.
+
+The table and triggers are created and filled by migration 7;
+``python atp.py rebuild`` recomputes every row.
+"""
+import argparse
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import column, func, select, table, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+import schemas
+from cache import ResponseCache
+from conditional import VOLATILE, conditional_get
+from database import Product, get_read_db
+from pagination import NEXT_CURSOR_HEADER, Page, sort_keys
+from serialization import encode
+
+router = APIRouter()
+
+SOURCE_TABLES = ("product", "storage_product", "storage_material", "product_material")
+
+
+def on_hand(product: str) -> str:
+    return f"(SELECT coalesce(sum(quantity), 0) FROM storage_product WHERE product_id = {product})"
+
+
+def buildable(product: str) -> str:
+    # Integer division rounds down; negative stock can't make a negative number of units.
+    return (
+        "(SELECT max(0, coalesce(min((SELECT coalesce(sum(sm.quantity), 0) FROM storage_material AS sm "
+        "WHERE sm.material_id = pm.material_id) / pm.quantity), 0)) "
+        f"FROM product_material AS pm WHERE pm.product_id = {product} AND pm.quantity > 0)"
+    )
+
+
+def schema_statements() -> list:
+    refresh_on_hand = "UPDATE product_atp SET on_hand = {on_hand} WHERE product_id = {row}.product_id;"
+    refresh_product = "UPDATE product_atp SET buildable = {buildable} WHERE product_id = {row}.product_id;"
+    refresh_material = ("UPDATE product_atp SET buildable = {buildable} WHERE product_id IN "
+                        "(SELECT product_id FROM product_material WHERE material_id = {row}.material_id);")
+    statements = [
+        "CREATE TABLE IF NOT EXISTS product_atp (product_id INTEGER NOT NULL, on_hand INTEGER NOT NULL, "
+        "buildable INTEGER NOT NULL, atp INTEGER GENERATED ALWAYS AS (on_hand + buildable) STORED, "
+        "PRIMARY KEY (product_id))",
+        "CREATE TRIGGER IF NOT EXISTS trg_product_atp_insert AFTER INSERT ON product BEGIN "
+        "INSERT INTO product_atp (product_id, on_hand, buildable) VALUES (new.id, 0, 0); END",
+        "CREATE TRIGGER IF NOT EXISTS trg_product_atp_delete AFTER DELETE ON product BEGIN "
+        "DELETE FROM product_atp WHERE product_id = old.id; END",
+    ]
+    fill = {"on_hand": on_hand("product_atp.product_id"), "buildable": buildable("product_atp.product_id")}
+    for table, columns, refresh in (
+        ("storage_product", "product_id, quantity", refresh_on_hand),
+        ("product_material", "product_id, material_id, quantity", refresh_product),
+        ("storage_material", "material_id, quantity", refresh_material),
+    ):
+        new, old = refresh.format(row="new", **fill), refresh.format(row="old", **fill)
+        statements += [
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_atp_insert AFTER INSERT ON {table} BEGIN {new} END",
+            # A row moved to another product or material changes both the old and the new one.
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_atp_update AFTER UPDATE OF {columns} ON {table} "
+            f"BEGIN {old} {new} END",
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_atp_delete AFTER DELETE ON {table} BEGIN {old} END",
+        ]
+    return statements
+
+
+def create_schema(connection: Connection) -> None:
+    for statement in schema_statements():
+        connection.exec_driver_sql(statement)
+
+
+def rebuild(connection: Connection) -> int:
+    """Recompute ``product_atp`` from the source tables; returns the number of products."""
+    connection.exec_driver_sql("DELETE FROM product_atp")
+    connection.exec_driver_sql(
+        f"INSERT INTO product_atp (product_id, on_hand, buildable) "
+        f"SELECT id, {on_hand('product.id')}, {buildable('product.id')} FROM product"
+    )
+    return connection.exec_driver_sql("SELECT count(*) FROM product_atp").scalar()
+
+
+SELECT = ("SELECT a.product_id, p.name, a.on_hand, a.buildable, a.atp "
+          "FROM product_atp AS a JOIN product AS p ON p.id = a.product_id")
+PRODUCT_ATP = table("product_atp", column("product_id"), column("on_hand"), column("buildable"), column("atp"))
+FIELDS = ("product_id", "name", "on_hand", "buildable", "atp")
+
+# Encoded ``GET /atp`` pages and their cursor headers, stored with the versions of the source tables.
+atp_cache = ResponseCache(max_entries=256, ttl=300.0)
+
+
+def page_json(db: Session, page: Page) -> str:
+    """One page of the catalog, in the order and with the cursor headers of the product list."""
+    # Page needs the sort keys of the rows it keeps for the cursor; only those go through Python,
+    # as plain Core rows (the ORM result layer doubles the cost of fetching 10k of them).
+    connection = db.connection()
+    keys = page.finish(connection.execute(page.apply(select(*(getattr(Product, name) for name in sort_keys(Product))))))
+    rows = page.apply(
+        select(Product.id, Product.name, *PRODUCT_ATP.c).join(PRODUCT_ATP, PRODUCT_ATP.c.product_id == Product.id)
+    ).limit(len(keys)).subquery()
+    # SQLite writes the JSON itself: a page of 10k products comes back as one string
+    # instead of 10k rows to fetch, validate and encode in Python.
+    return connection.execute(select(func.json_group_array(func.json_object(
+        *(part for field in FIELDS for part in (field, rows.c[field]))
+    )))).scalar()
+
+
+@router.get("/atp", response_model=List[schemas.ProductAtp],
+            dependencies=[Depends(conditional_get(*SOURCE_TABLES, cache_control=VOLATILE))])
+def read_atp(request: Request, page: Page = Depends(), db: Session = Depends(get_read_db)):
+    versions = tuple(request.state.table_versions[table] for table in SOURCE_TABLES)
+    key = str(request.url.query)
+    cached = atp_cache.get(key, versions)
+    if cached is None:
+        body = page_json(db, page)
+        cached = body, {name: page.response.headers[name] for name in (NEXT_CURSOR_HEADER, "Link")
+                        if name in page.response.headers}
+        atp_cache.put(key, versions, cached)
+    body, headers = cached
+    page.response.headers.update(headers)
+    return encode(body.encode(), page.response)
+
+
+@router.get("/products/{product_id}/atp", response_model=schemas.ProductAtp,
+            dependencies=[Depends(conditional_get(*SOURCE_TABLES, cache_control=VOLATILE))])
+def read_product_atp(product_id: int, db: Session = Depends(get_read_db)):
+    row = db.execute(text(f"{SELECT} WHERE a.product_id = :id"), {"id": product_id}).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return row._mapping
+
+
+def main():
+    from database import build_engine, settings
+
+    parser = argparse.ArgumentParser(description="Maintain the available-to-promise table.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--url", default=settings.database_url)
+    args = parser.parse_args()
+
+    engine = build_engine(settings.model_copy(update={"database_url": args.url}))
+    with engine.begin() as connection:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+        create_schema(connection)
+        print(f"recomputed {rebuild(connection)} products")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Latency of the available-to-promise reads and the cost the triggers add to writes.
+
+Seeds a catalog of ``--products`` products with recipes over ``--materials``
+materials, fills ``product_atp`` through migration 7 and times ``GET /atp``
+(a page of ``MAX_LIMIT`` products, right after a write and when cached),
+``GET /products/{id}/atp`` and single stock and recipe updates, each of which
+refreshes the affected rows.
+
+    python benchmarks/bench_atp.py --products 50000 --repeat 50
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import migrations  # noqa: E402
+import atp  # noqa: E402
+from config import Settings  # noqa: E402
+from database import Base, build_engine, get_read_db  # noqa: E402
+from pagination import MAX_LIMIT  # noqa: E402
+
+PAGE = {"limit": MAX_LIMIT}
+
+
+def report(label, repeat, func, before=None):
+    """Time ``func`` ``repeat`` times, running ``before`` untimed ahead of each call."""
+    times = []
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        begin = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - begin) * 1000)
+    times.sort()
+    print(f"{label:<32}{statistics.median(times):>10.2f}{times[int(len(times) * 0.95) - 1]:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=50_000)
+    parser.add_argument("--materials", type=int, default=5_000)
+    parser.add_argument("--recipe-size", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = Settings(database_url="sqlite:///" + os.path.join(tmp, "atp.db"), slow_query_ms=float("inf"))
+        engine = build_engine(settings)
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("INSERT INTO product (name) VALUES (?)",
+                                 [(f"Product {i}",) for i in range(args.products)])
+            conn.exec_driver_sql("INSERT INTO material (name) VALUES (?)",
+                                 [(f"Material {i}",) for i in range(args.materials)])
+            conn.exec_driver_sql(
+                "INSERT INTO product_material (product_id, material_id, quantity) VALUES (?, ?, ?)",
+                [(p, m, rng.randint(1, 20)) for p in range(1, args.products + 1)
+                 for m in rng.sample(range(1, args.materials + 1), args.recipe_size)],
+            )
+            conn.exec_driver_sql("INSERT INTO storage_material (material_id, quantity) VALUES (?, ?)",
+                                 [(m, rng.randint(0, 10_000)) for m in range(1, args.materials + 1)])
+            conn.exec_driver_sql("INSERT INTO storage_product (product_id, quantity) VALUES (?, ?)",
+                                 [(p, rng.randint(0, 100)) for p in range(1, args.products + 1)])
+        start = time.perf_counter()
+        migrations.upgrade(engine)
+        print(f"filled product_atp for {args.products} products in {time.perf_counter() - start:.1f} s")
+
+        app = FastAPI()
+        app.include_router(atp.router)
+        SessionLocal = sessionmaker(bind=engine)
+
+        def get_session():
+            with SessionLocal() as db:
+                yield db
+
+        app.dependency_overrides[get_read_db] = get_session
+        client = TestClient(app)
+
+        with engine.connect() as conn:
+            def write(sql):
+                def run():
+                    conn.exec_driver_sql(sql, (rng.randint(1, 10_000), rng.randint(1, args.materials)))
+                    conn.commit()
+                return run
+
+            update_stock = write("UPDATE storage_material SET quantity = ? WHERE material_id = ?")
+            print(f"{'operation':<32}{'p50 ms':>10}{'p95 ms':>10}")
+            report("GET /atp after a write", args.repeat, lambda: client.get("/atp", params=PAGE), before=update_stock)
+            report("GET /atp (cached)", args.repeat, lambda: client.get("/atp", params=PAGE))
+            report("GET /products/{id}/atp", args.repeat,
+                   lambda: client.get(f"/products/{rng.randint(1, args.products)}/atp"))
+            report("update storage_material", args.repeat, update_stock)
+            report("update storage_product", args.repeat,
+                   write("UPDATE storage_product SET quantity = ? WHERE product_id = ?"))
+            report("update recipe quantity", args.repeat,
+                   write("UPDATE product_material SET quantity = ? % 20 + 1 WHERE id = ?"))
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Rows/sec and statements per row: one POST per order line vs ``POST /order-products/bulk``.
+
+    python benchmarks/bench_bulk.py --rows 100000 --single 2000
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import apis  # noqa: E402
+import bulk  # noqa: E402
+import instrumentation  # noqa: E402
+from config import Settings  # noqa: E402
+from database import Base, build_engine, get_db, get_read_db  # noqa: E402
+
+QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+LINES_PER_ORDER = 100
+
+
+def build_client(settings, rows):
+    engine = build_engine(settings)
+    Base.metadata.create_all(engine)
+    orders = rows // LINES_PER_ORDER + 1
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO product (name) VALUES (?)",
+                             [(f"Product {i}",) for i in range(LINES_PER_ORDER)])
+        conn.exec_driver_sql('INSERT INTO "order" (order_date, status) VALUES (?, ?)',
+                             [("2024-01-01 00:00:00.000000", "New")] * orders)
+    SessionLocal = sessionmaker(bind=engine)
+
+    def bench_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.add_middleware(instrumentation.SQLStatsMiddleware)
+    app.include_router(bulk.router)
+    app.include_router(apis.router)
+    app.dependency_overrides[get_db] = bench_get_db
+    app.dependency_overrides[get_read_db] = bench_get_db
+    return TestClient(app), engine
+
+
+def lines(start, count):
+    return [{"order_id": (start + i) // LINES_PER_ORDER + 1, "product_id": (start + i) % LINES_PER_ORDER + 1,
+             "quantity": 1} for i in range(count)]
+
+
+def queries(response):
+    return int(QUERIES_RE.search(response.headers["server-timing"]).group(1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000, help="rows sent in one bulk request")
+    parser.add_argument("--single", type=int, default=2000, help="rows sent one request each")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = Settings(database_url="sqlite:///" + os.path.join(tmp, "bulk.db"), slow_query_ms=float("inf"))
+        client, engine = build_client(settings, args.single + args.rows)
+
+        statements = 0
+        start = time.perf_counter()
+        for line in lines(0, args.single):
+            response = client.post("/order-products/", json=line)
+            assert response.status_code == 201, response.text
+            statements += queries(response)
+        single = time.perf_counter() - start
+
+        payload = lines(args.single, args.rows)
+        start = time.perf_counter()
+        response = client.post("/order-products/bulk", json=payload)
+        elapsed = time.perf_counter() - start
+        assert response.status_code == 201, response.text[:500]
+
+        print(f"{'mode':<8}{'rows':>10}{'rows/s':>12}{'statements/row':>16}")
+        print(f"{'single':<8}{args.single:>10}{args.single / single:>12.0f}{statements / args.single:>16.3f}")
+        print(f"{'bulk':<8}{args.rows:>10}{args.rows / elapsed:>12.0f}{queries(response) / args.rows:>16.3f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Completing many orders: one ``POST /orders/transitions`` against a PATCH per order.
+
+Seeds products with recipes, ample stock and ``--orders`` pending orders with
+``--lines`` lines each, then completes half of them through the bulk endpoint
+and the other half one ``PATCH /orders/{id}`` at a time, each consuming stock.
+
+    python benchmarks/bench_consumption.py --orders 5000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import apis  # noqa: E402
+import consumption  # noqa: E402
+from config import Settings  # noqa: E402
+from database import Base, build_engine, get_db  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=5_000)
+    parser.add_argument("--lines", type=int, default=5)
+    parser.add_argument("--products", type=int, default=1_000)
+    parser.add_argument("--materials", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = Settings(database_url="sqlite:///" + os.path.join(tmp, "consumption.db"),
+                            slow_query_ms=float("inf"))
+        engine = build_engine(settings)
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("INSERT INTO product (name) VALUES (?)",
+                                 [(f"Product {i}",) for i in range(args.products)])
+            conn.exec_driver_sql("INSERT INTO material (name) VALUES (?)",
+                                 [(f"Material {i}",) for i in range(args.materials)])
+            conn.exec_driver_sql(
+                "INSERT INTO product_material (product_id, material_id, quantity) VALUES (?, ?, ?)",
+                [(p, m, rng.randint(1, 5)) for p in range(1, args.products + 1)
+                 for m in rng.sample(range(1, args.materials + 1), 4)],
+            )
+            conn.exec_driver_sql("INSERT INTO storage_product (product_id, quantity) VALUES (?, ?)",
+                                 [(p, rng.randint(0, 20)) for p in range(1, args.products + 1)])
+            conn.exec_driver_sql("INSERT INTO storage_material (material_id, quantity) VALUES (?, ?)",
+                                 [(m, 10 ** 9) for m in range(1, args.materials + 1)])
+            conn.exec_driver_sql('INSERT INTO "order" (order_date, status) VALUES (?, ?)',
+                                 [("2024-01-01 00:00:00", "Pending")] * args.orders)
+            conn.exec_driver_sql(
+                "INSERT INTO order_product (order_id, product_id, quantity) VALUES (?, ?, ?)",
+                [(o, p, rng.randint(1, 10)) for o in range(1, args.orders + 1)
+                 for p in rng.sample(range(1, args.products + 1), args.lines)],
+            )
+
+        SessionLocal = sessionmaker(bind=engine)
+
+        def get_session():
+            with SessionLocal() as db:
+                yield db
+
+        app = FastAPI()
+        app.include_router(consumption.router)
+        app.include_router(apis.router)
+        app.dependency_overrides[get_db] = get_session
+        client = TestClient(app)
+
+        half = args.orders // 2
+        start = time.perf_counter()
+        response = client.post("/orders/transitions", json={"order_ids": list(range(1, half + 1)),
+                                                            "status": "Completed"})
+        bulk = time.perf_counter() - start
+        assert len(response.json()["consumed"]) == half, response.text
+        start = time.perf_counter()
+        for order_id in range(half + 1, args.orders + 1):
+            client.patch(f"/orders/{order_id}", json={"status": "Completed"}).raise_for_status()
+        single = time.perf_counter() - start
+        rest = args.orders - half
+        print(f"bulk transition   {half:>6} orders {bulk * 1000:>9.1f} ms  {bulk / half * 1e6:>8.1f} us/order")
+        print(f"PATCH per order   {rest:>6} orders {single * 1000:>9.1f} ms  {single / rest * 1e6:>8.1f} us/order")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
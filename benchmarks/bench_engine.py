@@ -0,0 +1,119 @@
+"""Read/write throughput of the CRUD endpoints under different engine setups.
+
+Compares the old engine (``create_engine(url, echo=True)``, rollback journal,
+no busy timeout) with the ``throughput`` and ``strict`` profiles from
+``config.py``. Each run uses a fresh database file.
+
+    python benchmarks/bench_engine.py --clients 32 --seconds 5
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apis import app  # noqa: E402
+from config import Settings  # noqa: E402
+from database import Base, build_engine, build_read_engine, get_db, get_read_db  # noqa: E402
+
+SEED_PRODUCTS = 200
+DEVNULL = open(os.devnull, "w")
+
+
+def make_engines(setup, url):
+    """Return (writer, reader) engines; the baseline shared one engine for both."""
+    if setup == "baseline":
+        # The old engine logged every statement to stdout; keep that cost but not the noise.
+        engine = create_engine(url, echo=True)
+        for handler in logging.getLogger("sqlalchemy.engine.Engine").handlers:
+            handler.setStream(DEVNULL)
+        return engine, engine
+    settings = Settings(database_url=url, profile=setup)
+    return build_engine(settings, pool_size=settings.write_pool_size), build_read_engine(settings)
+
+
+def seed(engine):
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO product (name, category, price) VALUES (?, ?, ?)",
+            [(f"Product {i}", "Bench", 1.0) for i in range(SEED_PRODUCTS)],
+        )
+
+
+async def client_loop(client, deadline, write_ratio, counters):
+    while time.perf_counter() < deadline:
+        try:
+            if random.random() < write_ratio:
+                response = await client.post("/orders/", json={
+                    "order_date": datetime.now().isoformat(),
+                    "status": "New",
+                    "customer_name": "bench",
+                })
+                kind = "writes"
+            elif random.random() < 0.5:
+                response = await client.get("/products/", params={"limit": 50})
+                kind = "reads"
+            else:
+                response = await client.get(f"/products/{random.randint(1, SEED_PRODUCTS)}")
+                kind = "reads"
+            counters[kind if response.status_code < 400 else "errors"] += 1
+        except Exception:
+            counters["errors"] += 1
+
+
+async def run(setup, clients, seconds, write_ratio):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, read_engine = make_engines(setup, "sqlite:///" + os.path.join(tmp, "bench.db"))
+        seed(engine)
+
+        def session_dependency(bind):
+            SessionLocal = sessionmaker(bind=bind)
+
+            def bench_get_db():
+                db = SessionLocal()
+                try:
+                    yield db
+                finally:
+                    db.close()
+            return bench_get_db
+
+        app.dependency_overrides[get_db] = session_dependency(engine)
+        app.dependency_overrides[get_read_db] = session_dependency(read_engine)
+        counters = {"reads": 0, "writes": 0, "errors": 0}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            deadline = time.perf_counter() + seconds
+            await asyncio.gather(*(client_loop(client, deadline, write_ratio, counters) for _ in range(clients)))
+        app.dependency_overrides.clear()
+        engine.dispose()
+        read_engine.dispose()
+    return {key: value / seconds for key, value in counters.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--setups", default="baseline,throughput,strict")
+    args = parser.parse_args()
+
+    print(f"{'setup':<12}{'reads/s':>12}{'writes/s':>12}{'errors/s':>12}")
+    for setup in args.setups.split(","):
+        result = asyncio.run(run(setup, args.clients, args.seconds, args.write_ratio))
+        print(f"{setup:<12}{result['reads']:>12.1f}{result['writes']:>12.1f}{result['errors']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
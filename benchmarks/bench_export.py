@@ -0,0 +1,81 @@
+"""Rows/sec and peak memory of the streaming table export.
+
+Seeds ``order_product`` with ``--rows`` lines (10M by default) and drains
+``export.stream_table`` for each format, the same generator ``GET /export/{table}``
+streams from. Peak RSS should not move with the row count.
+
+    python benchmarks/bench_export.py --rows 10000000
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Settings  # noqa: E402
+from database import Base, OrderProduct, build_engine, build_read_engine  # noqa: E402
+from export import gzip_chunks, stream_table  # noqa: E402
+
+LINES_PER_ORDER = 100
+
+
+def seed(engine, rows):
+    orders = -(-rows // LINES_PER_ORDER)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?) "
+            "INSERT INTO product (name) SELECT 'Product ' || i FROM n", (LINES_PER_ORDER,)
+        )
+        conn.exec_driver_sql(
+            "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?) "
+            "INSERT INTO \"order\" (order_date, status) SELECT '2024-01-01 00:00:00.000000', 'New' FROM n",
+            (orders,),
+        )
+        conn.exec_driver_sql(
+            "WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i < ? - 1) "
+            "INSERT INTO order_product (order_id, product_id, quantity) "
+            "SELECT i / ? + 1, i % ? + 1, 1 FROM n",
+            (rows, LINES_PER_ORDER, LINES_PER_ORDER),
+        )
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # mmap'd pages would count towards RSS and hide what the export itself holds;
+        # what's left on top of the seed is SQLite's page cache, capped by cache_size.
+        settings = Settings(database_url="sqlite:///" + os.path.join(tmp, "export.db"),
+                            slow_query_ms=float("inf"), mmap_size=0)
+        engine = build_engine(settings)
+        Base.metadata.create_all(engine)
+        start = time.perf_counter()
+        seed(engine, args.rows)
+        print(f"seeded {args.rows} rows in {time.perf_counter() - start:.1f}s, peak RSS {peak_rss_mb():.0f} MB")
+
+        read_engine = build_read_engine(settings)
+        print(f"{'format':<14}{'rows/s':>12}{'MB out':>10}{'peak RSS MB':>14}")
+        for label, format, compress in (("ndjson", "ndjson", False), ("csv", "csv", False),
+                                        ("ndjson+gzip", "ndjson", True)):
+            chunks = stream_table(read_engine, OrderProduct.__table__, format)
+            if compress:
+                chunks = gzip_chunks(chunks)
+            start = time.perf_counter()
+            size = sum(len(chunk) for chunk in chunks)
+            elapsed = time.perf_counter() - start
+            print(f"{label:<14}{args.rows / elapsed:>12.0f}{size / 1e6:>10.1f}{peak_rss_mb():>14.0f}")
+        read_engine.dispose()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Cold-start cost of ``import apis`` measured with ``python -X importtime``.
+
+Runs the import in fresh interpreters, reports the median cumulative time of
+``apis`` and of the heaviest modules, and exits non-zero when the median is over
+the startup budget. It also fails if importing touches the database file.
+
+    python benchmarks/bench_import.py --runs 5 --budget-ms 2500
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LINE_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)")
+PROJECT_MODULES = {
+    "apis", "async_apis", "atp", "bom", "bulk", "cache", "conditional", "config", "consumption", "database", "export",
+    "filters", "includes", "instrumentation", "inventory", "ledger", "migrations", "mrp", "nplusone", "pagination",
+    "resources", "schemas", "search", "serialization", "upsert",
+}
+
+
+def import_times(module):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    if result.stdout.strip():
+        raise SystemExit(f"importing {module} printed output:\n{result.stdout}")
+    times = {}
+    for line in result.stderr.splitlines():
+        match = LINE_RE.match(line)
+        if match:
+            times[match.group(4)] = int(match.group(2)) / 1000
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="apis")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=float(os.environ.get("IMPORT_BUDGET_MS", 2500)))
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    db_file = os.path.join(ROOT, "project.db")
+    before = os.stat(db_file).st_mtime_ns if os.path.exists(db_file) else None
+
+    samples = defaultdict(list)
+    for _ in range(args.runs):
+        for name, cumulative in import_times(args.module).items():
+            samples[name].append(cumulative)
+
+    after = os.stat(db_file).st_mtime_ns if os.path.exists(db_file) else None
+    medians = {name: statistics.median(values) for name, values in samples.items()}
+    total = medians[args.module]
+
+    print(f"{'module':<40}{'cumulative ms':>15}")
+    for name, value in sorted(medians.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{name:<40}{value:>15.1f}")
+    print("project modules:")
+    for name in sorted(PROJECT_MODULES & medians.keys(), key=lambda name: -medians[name]):
+        print(f"  {name:<38}{medians[name]:>15.1f}")
+    print(f"import {args.module}: {total:.1f} ms (budget {args.budget_ms:.0f} ms)")
+
+    if before != after:
+        raise SystemExit("importing modified project.db")
+    if total > args.budget_ms:
+        raise SystemExit(f"import {args.module} is over budget")
+
+
+if __name__ == "__main__":
+    main()
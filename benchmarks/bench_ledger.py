@@ -0,0 +1,106 @@
+"""Cost of inventory as-of lookups against the ledger, and of compacting it.
+
+Seeds ``--items`` storage_product rows, runs migration 10 for the baseline and
+then applies ``--movements`` single-row stock updates in chunks of
+``--snapshot-every``, compacting after each chunk. Times ``ledger.as_of`` for
+one item and for every item, now and at random past timestamps, next to a
+replay of the whole ledger, and the latency of writes made while a compaction
+runs in another thread.
+
+    python benchmarks/bench_ledger.py --items 10000 --movements 500000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ledger  # noqa: E402
+import migrations  # noqa: E402
+from config import Settings  # noqa: E402
+from database import Base, build_engine  # noqa: E402
+
+
+def report(label, repeat, func):
+    times = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - begin) * 1000)
+    times.sort()
+    print(f"{label:<36}{statistics.median(times):>10.2f}{times[int(len(times) * 0.95) - 1]:>10.2f}")
+
+
+def update_stock(engine, rng, items, count):
+    with engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE storage_product SET quantity = quantity + ? WHERE product_id = ?",
+                             [(rng.randint(-5, 5) or 1, rng.randint(1, items)) for _ in range(count)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--movements", type=int, default=500_000)
+    parser.add_argument("--snapshot-every", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = Settings(database_url="sqlite:///" + os.path.join(tmp, "ledger.db"), slow_query_ms=float("inf"))
+        engine = build_engine(settings)
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("INSERT INTO product (name) VALUES (?)",
+                                 [(f"Product {i}",) for i in range(args.items)])
+            conn.exec_driver_sql("INSERT INTO storage_product (product_id, quantity) VALUES (?, ?)",
+                                 [(p, 1_000) for p in range(1, args.items + 1)])
+        migrations.upgrade(engine)
+
+        start, marks, compacting = time.perf_counter(), [], 0.0
+        for _ in range(args.movements // args.snapshot_every):
+            update_stock(engine, rng, args.items, args.snapshot_every)
+            marks.append(time.time())
+            begin = time.perf_counter()
+            ledger.compact(engine, args.snapshot_every)
+            compacting += time.perf_counter() - begin
+        # Leave a tail behind the last snapshot, like between two compactions.
+        update_stock(engine, rng, args.items, args.snapshot_every // 2)
+        print(f"wrote {args.movements + args.snapshot_every // 2} movements in {time.perf_counter() - start:.1f} s, "
+              f"{compacting:.1f} s of it compacting")
+
+        print(f"{'lookup':<36}{'p50 ms':>10}{'p95 ms':>10}")
+        with engine.connect() as conn:
+            now = time.time()
+            head = conn.exec_driver_sql("SELECT max(id) FROM inventory_movement").scalar()
+            report("as-of now, one item", args.repeat,
+                   lambda: ledger.as_of(conn, now, "product", rng.randint(1, args.items)))
+            report("as-of past, one item", args.repeat,
+                   lambda: ledger.as_of(conn, rng.choice(marks), "product", rng.randint(1, args.items)))
+            report("as-of now, every item", max(args.repeat // 10, 3), lambda: ledger.as_of(conn, now))
+            report("replay from baseline, one item", max(args.repeat // 10, 3),
+                   lambda: ledger.balances(conn, 1, 0, head, "product", rng.randint(1, args.items)))
+            report("replay from baseline, every item", 3, lambda: ledger.balances(conn, 1, 0, head))
+
+        # Writers keep going while a compaction folds a full tail.
+        update_stock(engine, rng, args.items, args.snapshot_every // 2)
+        writes = []
+        compaction = threading.Thread(target=ledger.compact, args=(engine, 1))
+        compaction.start()
+        while compaction.is_alive() or not writes:
+            begin = time.perf_counter()
+            update_stock(engine, rng, args.items, 1)
+            writes.append((time.perf_counter() - begin) * 1000)
+        compaction.join()
+        writes.sort()
+        print(f"{len(writes)} writes during a compaction: p50 {statistics.median(writes):.2f} ms, "
+              f"max {writes[-1]:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Wall time of an MRP run (``POST /planning/mrp-runs``) over many open order lines.
+
+Seeds plants, products with recipes, materials with stock and orders with
+``--lines`` order lines in total, then times loading the inputs, the NumPy
+explosion and storing the run separately.
+
+    python benchmarks/bench_mrp.py --lines 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mrp  # noqa: E402
+from config import Settings  # noqa: E402
+from database import Base, build_engine  # noqa: E402
+
+
+def seed(engine, args, rng):
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO plant (name) VALUES (?)", [(f"Plant {i}",) for i in range(args.plants)])
+        conn.exec_driver_sql("INSERT INTO product (name) VALUES (?)", [(f"Product {i}",) for i in range(args.products)])
+        conn.exec_driver_sql("INSERT INTO material (name) VALUES (?)",
+                             [(f"Material {i}",) for i in range(args.materials)])
+        conn.exec_driver_sql(
+            "INSERT INTO product_material (product_id, material_id, quantity) VALUES (?, ?, ?)",
+            [(p, m, rng.randint(1, 20)) for p in range(1, args.products + 1)
+             for m in rng.sample(range(1, args.materials + 1), 8)],
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO plant_product (plant_id, product_id, quantity) VALUES (?, ?, ?)",
+            [(pl, p, rng.randint(1, 1000)) for p in range(1, args.products + 1)
+             for pl in rng.sample(range(1, args.plants + 1), 2)],
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO plant_material (plant_id, material_id, quantity) VALUES (?, ?, ?)",
+            [(pl, m, rng.randint(0, 5000)) for pl in range(1, args.plants + 1) for m in range(1, args.materials + 1)],
+        )
+        conn.exec_driver_sql("INSERT INTO storage_material (material_id, quantity) VALUES (?, ?)",
+                             [(m, rng.randint(0, 50_000)) for m in range(1, args.materials + 1)])
+        conn.exec_driver_sql("INSERT INTO storage_product (product_id, quantity) VALUES (?, ?)",
+                             [(p, rng.randint(0, 100)) for p in range(1, args.products + 1)])
+        orders = args.lines // 10
+        conn.exec_driver_sql(
+            'INSERT INTO "order" (order_date, status) VALUES (?, ?)',
+            [("2024-01-01 00:00:00", rng.choice(("New", "Pending", "Shipped", "Completed"))) for _ in range(orders)],
+        )
+        # Ten distinct products per order keeps (order_id, product_id) unique.
+        conn.exec_driver_sql(
+            "INSERT INTO order_product (order_id, product_id, quantity) VALUES (?, ?, ?)",
+            [(o, p, rng.randint(1, 10)) for o in range(1, orders + 1)
+             for p in rng.sample(range(1, args.products + 1), 10)],
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=1_000_000, help="order lines over all orders")
+    parser.add_argument("--products", type=int, default=5_000)
+    parser.add_argument("--materials", type=int, default=2_000)
+    parser.add_argument("--plants", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = Settings(database_url="sqlite:///" + os.path.join(tmp, "mrp.db"), slow_query_ms=float("inf"))
+        engine = build_engine(settings)
+        Base.metadata.create_all(engine)
+        start = time.perf_counter()
+        seed(engine, args, rng)
+        print(f"seeded {args.lines} order lines in {time.perf_counter() - start:.1f} s")
+
+        with engine.connect() as conn:
+            start = time.perf_counter()
+            inputs = mrp.load_inputs(conn)
+            loaded = time.perf_counter()
+            totals, plants = mrp.compute(inputs)
+            computed = time.perf_counter()
+        print(f"load inputs  {(loaded - start) * 1000:>9.1f} ms")
+        print(f"compute      {(computed - loaded) * 1000:>9.1f} ms  "
+              f"({len(totals)} materials, {len(plants)} plant lines)")
+
+        with Session(engine) as db:
+            run = mrp.run_mrp(db)
+            print(f"full run     {run.duration_ms:>9.1f} ms  ({run.orders} orders, {run.order_lines} lines)")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Per-page latency of offset vs cursor pagination at increasing depth.
+
+Seeds ``order_product`` with ``--rows`` lines and fetches the page at each depth
+through ``GET /order-products/`` once with ``skip`` and once with ``after``.
+Offset pages get slower the deeper they are; cursor pages should stay flat.
+
+    python benchmarks/bench_pagination.py --rows 500000 --limit 100
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import apis  # noqa: E402
+from config import Settings  # noqa: E402
+from database import Base, build_engine, get_db, get_read_db  # noqa: E402
+from pagination import encode_cursor  # noqa: E402
+
+
+def seed(engine, rows):
+    orders = rows // 10
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            'INSERT INTO "order" (order_date, status) VALUES (?, ?)',
+            [("2024-01-01 00:00:00.000000", "New")] * orders,
+        )
+        conn.exec_driver_sql("INSERT INTO product (name) VALUES (?)", [(f"Product {i}",) for i in range(10)])
+        conn.exec_driver_sql(
+            "INSERT INTO order_product (order_id, product_id, quantity) VALUES (?, ?, 1)",
+            [(i // 10 + 1, i % 10 + 1) for i in range(rows)],
+        )
+
+
+def timed(client, params, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get("/order-products/", params=params)
+        samples.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = Settings(database_url="sqlite:///" + os.path.join(tmp, "pages.db"), slow_query_ms=float("inf"))
+        engine = build_engine(settings)
+        Base.metadata.create_all(engine)
+        seed(engine, args.rows)
+        SessionLocal = sessionmaker(bind=engine)
+
+        def bench_get_db():
+            db = SessionLocal()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app = FastAPI()
+        app.include_router(apis.router)
+        app.dependency_overrides[get_db] = bench_get_db
+        app.dependency_overrides[get_read_db] = bench_get_db
+        client = TestClient(app)
+
+        pages = args.rows // args.limit
+        depths = sorted({1, pages // 100, pages // 10, pages // 2, pages - 1} - {0})
+        print(f"{args.rows} rows, {args.limit} per page")
+        print(f"{'page':>8}{'offset ms':>12}{'cursor ms':>12}")
+        for page in depths:
+            skip = page * args.limit
+            offset_ms = timed(client, {"skip": skip, "limit": args.limit}, args.repeat)
+            cursor_ms = timed(client, {"after": encode_cursor("id", [skip]), "limit": args.limit}, args.repeat)
+            print(f"{page:>8}{offset_ms:>12.2f}{cursor_ms:>12.2f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Latency of ``GET /search`` queries over a large FTS5 index.
+
+Seeds products and materials with generated names and descriptions from a
+small vocabulary, so common words match a third of all rows, builds the index
+through migration 5 and times the search endpoint for common, rare, prefix and
+filtered queries, ranking every match or only the ``--max-ranked`` newest.
+
+    python benchmarks/bench_search.py --rows 1000000 --queries 200
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import migrations  # noqa: E402
+from config import Settings  # noqa: E402
+from database import Base, build_engine  # noqa: E402
+from search import search  # noqa: E402
+
+WORDS = ("herbal tea green black roasted coffee mint chamomile ginger lemon honey oat rice steel copper "
+         "cotton linen paper glass bottle cap label box crate pallet blend dried fresh organic premium").split()
+
+QUERIES = {
+    "common word": ("tea", None),
+    "rare word": ("zanzibar", None),
+    "two words": ("herbal mint", None),
+    "short prefix": ("ch*", None),
+    "long prefix": ("cham*", None),
+    "entity filter": ("organic", "material"),
+}
+
+
+def phrase(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000, help="products and materials each")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--max-ranked", type=int, default=None, help="rank only the newest N matches")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = Settings(database_url="sqlite:///" + os.path.join(tmp, "search.db"), slow_query_ms=float("inf"))
+        engine = build_engine(settings)
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            for table in ("product", "material"):
+                conn.exec_driver_sql(
+                    f"INSERT INTO {table} (name, description) VALUES (?, ?)",
+                    [(f"{phrase(rng, 2)} {i}", phrase(rng, 12) + (" zanzibar" if i % 10_000 == 0 else ""))
+                     for i in range(args.rows)],
+                )
+        start = time.perf_counter()
+        migrations.upgrade(engine)
+        print(f"indexed {2 * args.rows} rows in {time.perf_counter() - start:.1f} s")
+
+        print(f"{'query':<16}{'p50 ms':>10}{'p95 ms':>10}")
+        with Session(engine) as db:
+            for label, (q, entity) in QUERIES.items():
+                times = []
+                for _ in range(args.queries):
+                    begin = time.perf_counter()
+                    search(q=q, entity=entity, limit=20, max_ranked=args.max_ranked, db=db)
+                    times.append((time.perf_counter() - begin) * 1000)
+                times.sort()
+                print(f"{label:<16}{statistics.median(times):>10.2f}{times[int(len(times) * 0.95) - 1]:>10.2f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
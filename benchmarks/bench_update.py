@@ -0,0 +1,72 @@
+"""Statements and time per update: the old SELECT/setattr/refresh handler vs ``update_row``.
+
+Both paths run against the same seeded file database with the statement
+counter from instrumentation.py, outside of HTTP so only the DB work is timed.
+
+    python benchmarks/bench_update.py --updates 5000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import instrumentation  # noqa: E402
+from apis import update_row  # noqa: E402
+from config import Settings  # noqa: E402
+from database import Base, Product, build_engine  # noqa: E402
+
+SEED_PRODUCTS = 1000
+
+
+def legacy_update(db, product_id, values):
+    # What update_product did before: load, setattr, commit, refresh.
+    product = db.query(Product).filter(Product.id == product_id).first()
+    for key, value in values.items():
+        setattr(product, key, value)
+    db.commit()
+    db.refresh(product)
+    return product
+
+
+def single_statement_update(db, product_id, values):
+    return update_row(db, Product, product_id, values, "Product not found")
+
+
+def run(SessionLocal, update, updates):
+    with instrumentation.collect_stats() as stats:
+        start = time.perf_counter()
+        for i in range(updates):
+            with SessionLocal() as db:
+                update(db, i % SEED_PRODUCTS + 1, {"price": i})
+        elapsed = time.perf_counter() - start
+    return stats.query_count / updates, elapsed / updates * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = Settings(database_url="sqlite:///" + os.path.join(tmp, "update.db"), slow_query_ms=float("inf"))
+        engine = build_engine(settings)
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("INSERT INTO product (name, price) VALUES (?, 1)",
+                                 [(f"Product {i}",) for i in range(SEED_PRODUCTS)])
+        SessionLocal = sessionmaker(bind=engine)
+
+        print(f"{'path':<12}{'statements/update':>20}{'us/update':>12}")
+        for label, update in (("legacy", legacy_update), ("update_row", single_statement_update)):
+            statements, micros = run(SessionLocal, update, args.updates)
+            print(f"{label:<12}{statements:>20.2f}{micros:>12.1f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""p50/p99 latency of the sync and async CRUD routers under many concurrent clients.
+
+Both routers are mounted on a fresh app over the same seeded database file and
+driven in-process through httpx's ASGI transport, so the sync handlers compete
+for the anyio threadpool exactly as they do under uvicorn.
+
+    python benchmarks/load_async.py --clients 500 --requests 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import apis  # noqa: E402
+import async_apis  # noqa: E402
+from config import Settings  # noqa: E402
+from database import Base, build_async_engine, build_engine, build_read_engine  # noqa: E402
+from database import get_async_db, get_async_read_db, get_db, get_read_db  # noqa: E402
+
+SEED_PRODUCTS = 500
+
+
+def build_app(mode, settings):
+    app = FastAPI()
+    if mode == "async":
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+
+        engines = [build_async_engine(settings), build_async_engine(settings, read_only=True)]
+
+        def session_dependency(async_engine):
+            AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+            async def bench_get_async_db():
+                async with AsyncSessionLocal() as db:
+                    yield db
+            return bench_get_async_db
+
+        app.include_router(async_apis.router)
+        app.dependency_overrides[get_async_db] = session_dependency(engines[0])
+        app.dependency_overrides[get_async_read_db] = session_dependency(engines[1])
+
+        async def dispose():
+            for async_engine in engines:
+                await async_engine.dispose()
+        return app, dispose
+
+    engines = [build_engine(settings, pool_size=settings.write_pool_size), build_read_engine(settings)]
+
+    def session_dependency(engine):
+        SessionLocal = sessionmaker(bind=engine)
+
+        def bench_get_db():
+            db = SessionLocal()
+            try:
+                yield db
+            finally:
+                db.close()
+        return bench_get_db
+
+    app.include_router(apis.router)
+    app.dependency_overrides[get_db] = session_dependency(engines[0])
+    app.dependency_overrides[get_read_db] = session_dependency(engines[1])
+
+    async def dispose():
+        for engine in engines:
+            engine.dispose()
+    return app, dispose
+
+
+async def client_loop(client, requests, latencies, errors):
+    for i in range(requests):
+        start = time.perf_counter()
+        if i % 2:
+            response = await client.get("/products/", params={"limit": 20})
+        else:
+            response = await client.get(f"/products/{i % SEED_PRODUCTS + 1}")
+        latencies.append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            errors.append(response.status_code)
+
+
+async def run(mode, clients, requests, settings):
+    app, dispose = build_app(mode, settings)
+    latencies, errors = [], []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client, requests, latencies, errors) for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+    await dispose()
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "p50": quantiles[49] * 1000,
+        "p99": quantiles[98] * 1000,
+        "rps": len(latencies) / elapsed,
+        "errors": len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=20, help="requests per client")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = Settings(database_url="sqlite:///" + os.path.join(tmp, "load.db"))
+        engine = build_engine(settings)
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                "INSERT INTO product (name, category, price) VALUES (?, ?, ?)",
+                [(f"Product {i}", "Load", 1.0) for i in range(SEED_PRODUCTS)],
+            )
+        engine.dispose()
+
+        print(f"{args.clients} clients x {args.requests} requests")
+        print(f"{'mode':<8}{'p50 ms':>10}{'p99 ms':>10}{'req/s':>10}{'errors':>8}")
+        for mode in ("sync", "async"):
+            result = asyncio.run(run(mode, args.clients, args.requests, settings))
+            print(f"{mode:<8}{result['p50']:>10.1f}{result['p99']:>10.1f}{result['rps']:>10.1f}{result['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
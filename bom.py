@@ -0,0 +1,86 @@
+"""Bill-of-materials explosion: which materials, and how much of each, orders need.
+
+``GET /orders/{id}/materials`` and ``POST /orders/materials`` (``{"order_ids": [...]}``)
+join the order lines with the product recipes and sum ``line quantity * recipe
+quantity`` per material in one aggregate statement, next to the material's
+on-hand ``storage_material`` quantity and the resulting shortage. Both covering
+indexes (order lines by order, recipes by product) serve the join.
+
+Results are kept in an LRU keyed by the order ids and stored with the
+``change_version`` counters of every table the statement reads, so a change to
+order lines, recipes, materials or stock is seen on the next request.
+"""
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+import schemas
+from cache import ResponseCache
+from conditional import VOLATILE, conditional_get, table_versions
+from database import Material, Order, OrderProduct, ProductMaterial, StorageMaterial, get_read_db
+
+router = APIRouter()
+
+TABLES = ("order_product", "product_material", "material", "storage_material")
+
+requirements_cache = ResponseCache(max_entries=4096, ttl=300.0)
+
+
+def requirements_statement(order_ids):
+    return (
+        select(
+            Material.id.label("material_id"),
+            Material.name,
+            Material.unit,
+            func.sum(OrderProduct.quantity * ProductMaterial.quantity).label("required"),
+            # storage_material has one row per material, so this is that row's quantity.
+            func.coalesce(func.max(StorageMaterial.quantity), 0).label("on_hand"),
+        )
+        .select_from(OrderProduct)
+        .join(ProductMaterial, ProductMaterial.product_id == OrderProduct.product_id)
+        .join(Material, Material.id == ProductMaterial.material_id)
+        .outerjoin(StorageMaterial, StorageMaterial.material_id == Material.id)
+        .where(OrderProduct.order_id.in_(order_ids))
+        .group_by(Material.id)
+        .order_by(Material.id)
+    )
+
+
+def material_requirements(db: Session, order_ids, versions: tuple) -> list:
+    key = tuple(sorted(set(order_ids)))
+    cached = requirements_cache.get(key, versions)
+    if cached is not None:
+        return cached
+    materials = [
+        schemas.MaterialRequirement(**row._mapping, shortage=max(row.required - row.on_hand, 0))
+        for row in db.execute(requirements_statement(key))
+    ]
+    requirements_cache.put(key, versions, materials)
+    return materials
+
+
+def missing_orders(db: Session, order_ids) -> list:
+    found = set(db.execute(select(Order.id).where(Order.id.in_(order_ids))).scalars())
+    return sorted(set(order_ids) - found)
+
+
+@router.get("/orders/{order_id}/materials", response_model=schemas.OrderMaterials,
+            dependencies=[Depends(conditional_get(*TABLES, cache_control=VOLATILE))])
+def read_order_materials(order_id: int, request: Request, db: Session = Depends(get_read_db)):
+    versions = tuple(request.state.table_versions[table] for table in TABLES)
+    materials = material_requirements(db, [order_id], versions)
+    # Only an empty result needs the extra lookup to tell "no lines" from "no order".
+    if not materials and missing_orders(db, [order_id]):
+        raise HTTPException(status_code=404, detail="Order not found")
+    return schemas.OrderMaterials(order_ids=[order_id], materials=materials)
+
+
+@router.post("/orders/materials", response_model=schemas.OrderMaterials)
+def read_orders_materials(body: schemas.OrderMaterialsRequest, db: Session = Depends(get_read_db)):
+    missing = missing_orders(db, body.order_ids)
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Orders not found: {missing}")
+    materials = material_requirements(db, body.order_ids, table_versions(db, TABLES))
+    return schemas.OrderMaterials(order_ids=sorted(set(body.order_ids)), materials=materials)
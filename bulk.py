@@ -0,0 +1,177 @@
+"""Bulk create and delete endpoints: ``POST /{resource}/bulk`` and ``DELETE /{resource}/?ids=``.
+
+The body is a JSON array, or one object per line when sent as NDJSON. All items
+are validated in one pydantic pass and the valid ones inserted in chunks with a
+single executemany ``INSERT ... RETURNING id`` each. Every chunk runs in a
+savepoint; when one fails, its rows are retried one by one so only the
+offending items are reported. With ``?atomic=true`` any error rolls back the
+whole batch. Bulk deletes are one ``DELETE ... WHERE id IN (...) RETURNING id``;
+the schema cascades to child rows.
+"""
+import json
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import delete, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import schemas
+from database import get_db
+from resources import RESOURCES
+
+router = APIRouter()
+
+CHUNK_ROWS = 500
+MAX_ITEMS = 100_000
+# Stays under SQLite's bound-parameter limit.
+MAX_DELETE_IDS = 10_000
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+def parse_items(body: bytes, content_type: str):
+    """Decode the body into a list of items and the per-index errors found on the way."""
+    if content_type.split(";")[0].strip().lower() in NDJSON_TYPES:
+        items, errors = [], {}
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as exc:
+                errors[len(items)] = [{"type": "json_invalid", "loc": [], "msg": str(exc)}]
+                items.append(None)
+        return items, errors
+    try:
+        items = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    return items, {}
+
+
+def validate_items(adapter: TypeAdapter, items: list, errors: dict) -> list:
+    """Validate every item in one pass; returns ``(index, values)`` for the valid ones."""
+    candidates = [(index, item) for index, item in enumerate(items) if index not in errors]
+    try:
+        models = adapter.validate_python([item for _, item in candidates])
+    except ValidationError as exc:
+        for error in exc.errors(include_url=False, include_context=False, include_input=False):
+            index = candidates[error["loc"][0]][0]
+            errors.setdefault(index, []).append(
+                {"type": error["type"], "loc": list(error["loc"][1:]), "msg": error["msg"]}
+            )
+        candidates = [(index, item) for index, item in candidates if index not in errors]
+        models = adapter.validate_python([item for _, item in candidates])
+    return [(index, model.model_dump()) for (index, _), model in zip(candidates, models)]
+
+
+def insert_rows(db: Session, table, rows: list, errors: dict, statement=None, keys=()) -> list:
+    """Insert ``(index, values)`` rows chunk by chunk; returns ``(index, id)`` for the ones written.
+
+    ``statement`` replaces the plain INSERT, e.g. with an upsert; ``keys`` are then the
+    natural key columns used to match the returned ids back to the rows.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        # pysqlite doesn't open a transaction before the first INSERT, so the first
+        # SAVEPOINT would become the outer transaction and commit on release.
+        db.connection().exec_driver_sql("BEGIN IMMEDIATE")
+    # sort_by_parameter_order would make SQLAlchemy fall back to one INSERT per row on
+    # SQLite. It isn't needed: under BEGIN IMMEDIATE each new row gets max(rowid) + 1 in
+    # VALUES order, so sorting the returned ids lines them up with the chunk.
+    statement = (insert(table) if statement is None else statement).returning(
+        table.c.id, *(table.c[key] for key in keys)
+    )
+    written = []
+    for start in range(0, len(rows), CHUNK_ROWS):
+        chunk = rows[start:start + CHUNK_ROWS]
+        try:
+            with db.begin_nested():
+                returned = db.execute(statement, [values for _, values in chunk]).all()
+            written.extend(_match_ids(chunk, returned, keys))
+            continue
+        except IntegrityError:
+            pass
+        for index, values in chunk:
+            try:
+                with db.begin_nested():
+                    written.append((index, db.execute(statement, [values]).one()[0]))
+            except IntegrityError as exc:
+                errors[index] = [{"type": "integrity_error", "loc": [], "msg": str(exc.orig)}]
+    return written
+
+
+def _match_ids(chunk: list, returned: list, keys) -> list:
+    if not keys:
+        return list(zip((index for index, _ in chunk), sorted(row[0] for row in returned)))
+    ids = {tuple(row[1:]): row[0] for row in returned}
+    return [(index, ids[tuple(values[key] for key in keys)]) for index, values in chunk]
+
+
+async def write_bulk(request: Request, response: Response, db: Session, adapter: TypeAdapter, table,
+                     atomic: bool, statement=None, keys=()) -> schemas.BulkResult:
+    """Parse, validate and write one bulk request, setting the response status from the outcome."""
+    items, errors = parse_items(await request.body(), request.headers.get("content-type", ""))
+    if len(items) > MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_ITEMS} items per request")
+    rows = validate_items(adapter, items, errors)
+
+    written = []
+    if rows and not (atomic and errors):
+        written = await run_in_threadpool(insert_rows, db, table, rows, errors, statement, keys)
+        if atomic and errors:
+            await run_in_threadpool(db.rollback)
+            written = []
+        else:
+            await run_in_threadpool(db.commit)
+
+    if errors and not written:
+        response.status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    elif errors:
+        response.status_code = status.HTTP_207_MULTI_STATUS
+    return schemas.BulkResult(
+        created=[schemas.BulkCreated(index=index, id=item_id) for index, item_id in written],
+        errors=[schemas.BulkItemError(index=index, errors=errors[index]) for index in sorted(errors)],
+    )
+
+
+def add_bulk_route(router: APIRouter, resource) -> None:
+    adapter = TypeAdapter(List[resource.create_schema])
+
+    async def create_bulk(request: Request, response: Response, atomic: bool = False,
+                          db: Session = Depends(get_db)):
+        return await write_bulk(request, response, db, adapter, resource.table, atomic)
+
+    router.add_api_route(f"{resource.path}/bulk", create_bulk, methods=["POST"], response_model=schemas.BulkResult,
+                         status_code=status.HTTP_201_CREATED, name=f"create_{resource.plural}_bulk")
+
+
+def parse_ids(ids: str) -> list:
+    try:
+        parsed = [int(item) for item in ids.split(",") if item.strip()]
+    except ValueError:
+        raise HTTPException(status_code=422, detail="ids must be a comma separated list of integers")
+    if len(parsed) > MAX_DELETE_IDS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_DELETE_IDS} ids per request")
+    return parsed
+
+
+def add_bulk_delete_route(router: APIRouter, resource) -> None:
+    table = resource.table
+
+    def delete_bulk(ids: str = Query(..., description="Comma separated ids"), db: Session = Depends(get_db)):
+        statement = delete(table).where(table.c.id.in_(parse_ids(ids))).returning(table.c.id)
+        deleted = sorted(db.execute(statement).scalars())
+        db.commit()
+        return schemas.BulkDeleted(deleted=deleted)
+
+    router.add_api_route(f"{resource.path}/", delete_bulk, methods=["DELETE"], response_model=schemas.BulkDeleted,
+                         name=f"delete_{resource.plural}")
+
+
+for _resource in RESOURCES:
+    add_bulk_route(router, _resource)
+    add_bulk_delete_route(router, _resource)
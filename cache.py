@@ -0,0 +1,212 @@
+"""In-process response cache for the catalog GET endpoints, invalidated by table versions.
+
+Every table has a version counter. Session writes bump the counters of the tables
+they touch: ORM flushes through ``after_flush``, Core INSERT/UPDATE/DELETE run on
+a session through ``do_orm_execute``, and both again on ``after_commit`` so a
+reader that cached between the write and its commit is invalidated too. Deletes
+also bump the tables their ON DELETE actions reach.
+
+``ResponseCacheMiddleware`` stores the encoded body of ``GET /{resource}/`` and
+``GET /{resource}/{id}`` for the resources in ``RESPONSE_CACHE_RESOURCES`` under
+the versions of their table and of any ``?include=`` relationships, with LRU
+and TTL eviction, and replays the bytes as long as the versions still match.
+Writes made outside a Session (raw connections, other processes) are not seen,
+so run one worker per database or keep the TTL short.
+"""
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs
+
+from fastapi import HTTPException
+from sqlalchemy import event, orm
+
+from conditional import etag_matches
+from database import Base
+from includes import parse as parse_includes, tables as included_tables
+from resources import BY_PATH
+
+_clock = itertools.count(1)
+_versions = {}
+_cascades = None
+
+
+def table_version(table: str) -> int:
+    return _versions.get(table, 0)
+
+
+def bump(tables) -> None:
+    for table in tables:
+        # next() on a shared counter is atomic, so concurrent bumps can't cancel out.
+        _versions[table] = next(_clock)
+
+
+def _cascade_targets(table: str) -> set:
+    """Tables whose rows change when rows of ``table`` are deleted."""
+    global _cascades
+    if _cascades is None:
+        cascades = {}
+        for child in Base.metadata.tables.values():
+            for foreign_key in child.foreign_keys:
+                if foreign_key.ondelete:
+                    cascades.setdefault(foreign_key.column.table.name, set()).add(child.name)
+        _cascades = cascades
+    reached, todo = set(), [table]
+    while todo:
+        for child in _cascades.get(todo.pop(), ()):
+            if child not in reached:
+                reached.add(child)
+                todo.append(child)
+    return reached
+
+
+def _record(session, tables) -> None:
+    tables = set(tables)
+    session.info.setdefault("written_tables", set()).update(tables)
+    bump(tables)
+
+
+@event.listens_for(orm.Session, "after_flush")
+def _flushed(session, flush_context):
+    tables = {obj.__table__.name for obj in list(session.new) + list(session.dirty)}
+    for obj in session.deleted:
+        tables.add(obj.__table__.name)
+        tables |= _cascade_targets(obj.__table__.name)
+    _record(session, tables)
+
+
+@event.listens_for(orm.Session, "do_orm_execute")
+def _executed(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = orm_execute_state.statement.table.name
+    tables = {table} | (_cascade_targets(table) if orm_execute_state.is_delete else set())
+    _record(orm_execute_state.session, tables)
+
+
+@event.listens_for(orm.Session, "after_commit")
+def _committed(session):
+    bump(session.info.pop("written_tables", ()))
+
+
+@event.listens_for(orm.Session, "after_rollback")
+def _rolled_back(session):
+    session.info.pop("written_tables", None)
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 1024, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.stale = self.evictions = 0
+
+    def get(self, key, versions):
+        """The entry stored under ``key`` if it was stored with the same ``versions`` and hasn't expired."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_versions, expires, response = entry
+            if expires < time.monotonic() or stored_versions != versions:
+                del self.entries[key]
+                self.stale += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return response
+
+    def put(self, key, versions, response) -> None:
+        with self.lock:
+            self.entries[key] = (versions, time.monotonic() + self.ttl, response)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+# Headers that belong to one client or one request and must not be replayed.
+_UNCACHED_HEADERS = {b"set-cookie", b"server-timing", b"x-query-count", b"content-length"}
+
+
+class ResponseCacheMiddleware:
+    def __init__(self, app, cache: ResponseCache, resources):
+        self.app = app
+        self.cache = cache
+        self.resources = set(resources)
+
+    def tables_for(self, scope):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return None
+        parts = scope["path"].strip("/").split("/")
+        if parts[0] not in self.resources or len(parts) > 2 or (len(parts) == 2 and not parts[1].isdigit()):
+            return None
+        model = BY_PATH[parts[0]].model
+        include = parse_qs(scope["query_string"].decode("latin-1")).get("include")
+        try:
+            tree = parse_includes(model, ",".join(include)) if include else {}
+        except HTTPException:
+            return None
+        return (model.__table__.name,) + tuple(sorted(included_tables(model, tree) - {model.__table__.name}))
+
+    async def __call__(self, scope, receive, send):
+        tables = self.tables_for(scope)
+        if not tables:
+            await self.app(scope, receive, send)
+            return
+
+        key = (scope["path"], scope["query_string"])
+        # Taken before the handler runs: a write racing with it leaves the entry already stale.
+        versions = tuple(table_version(t) for t in tables)
+        cached = self.cache.get(key, versions)
+        if cached is not None:
+            status, headers, body = cached
+            etag = dict(headers).get(b"etag")
+            if_none_match = dict(scope["headers"]).get(b"if-none-match")
+            if etag and if_none_match and etag_matches(if_none_match.decode("latin-1"), etag.decode("latin-1")):
+                await send({"type": "http.response.start", "status": 304,
+                            "headers": [(name, value) for name, value in headers
+                                        if name in (b"etag", b"cache-control")] + [(b"x-cache", b"HIT")]})
+                await send({"type": "http.response.body", "body": b""})
+                return
+            await send({"type": "http.response.start", "status": status,
+                        "headers": headers + [(b"content-length", str(len(body)).encode()), (b"x-cache", b"HIT")]})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        start, chunks = {}, []
+
+        async def send_and_capture(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+                message = dict(message, headers=list(message.get("headers", [])) + [(b"x-cache", b"MISS")])
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False) and start.get("status") == 200:
+                    headers = [(name, value) for name, value in start.get("headers", [])
+                               if name.lower() not in _UNCACHED_HEADERS]
+                    self.cache.put(key, versions, (200, headers, b"".join(chunks)))
+            await send(message)
+
+        await self.app(scope, receive, send_and_capture)
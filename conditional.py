@@ -0,0 +1,92 @@
+"""Strong ETags and ``304 Not Modified`` for the read endpoints.
+
+The ETag of a GET is a hash of its path, query string and the ``change_version``
+counters of the tables it reads, which triggers bump on every write (see
+database.py). Checking it costs one primary-key lookup, done before the handler
+queries or serializes anything; a matching ``If-None-Match`` ends the request
+with an empty 304. Because the counters live in the database, ETags stay valid
+across restarts and workers.
+"""
+import hashlib
+
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database import ChangeVersion, get_async_read_db, get_read_db
+from includes import parse as parse_includes, tables as included_tables
+
+# Reference data changes rarely; a short max-age lets browsers skip the request entirely.
+CATALOG = "public, max-age=30, stale-while-revalidate=60"
+# Orders, order lines and stock move constantly: always revalidate, which is cheap with the ETag.
+VOLATILE = "private, no-cache"
+
+
+def versions_statement(tables):
+    return select(ChangeVersion.table_name, ChangeVersion.version).where(ChangeVersion.table_name.in_(tables))
+
+
+def table_versions(db: Session, tables) -> tuple:
+    rows = dict(db.execute(versions_statement(tables)).all())
+    return tuple(rows.get(table, 0) for table in tables)
+
+
+async def async_table_versions(db, tables) -> tuple:
+    rows = dict((await db.execute(versions_statement(tables))).all())
+    return tuple(rows.get(table, 0) for table in tables)
+
+
+def make_etag(request: Request, versions: tuple) -> str:
+    key = f"{request.url.path}?{request.url.query}|{versions}".encode()
+    return '"' + hashlib.blake2b(key, digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    candidates = {candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def read_tables(request: Request, tables: tuple, cache_control: str, includes) -> tuple:
+    """The tables a GET reads, with its ``?include=`` relationships, and its Cache-Control."""
+    read, control = tables, cache_control
+    if includes is not None:
+        tree = parse_includes(includes, request.query_params.get("include"))
+        read = tables + tuple(sorted(included_tables(includes, tree) - set(tables)))
+    if len(read) > len(tables):
+        # Included rows may come from volatile tables; don't let clients reuse them unchecked.
+        control = VOLATILE
+    return read, control
+
+
+def respond(request: Request, response: Response, read: tuple, control: str, versions: tuple) -> None:
+    # Handlers that cache their own results can reuse the lookup.
+    request.state.table_versions = dict(zip(read, versions))
+    etag = make_etag(request, versions)
+    headers = {"ETag": etag, "Cache-Control": control}
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+
+
+def conditional_get(*tables: str, cache_control: str = VOLATILE, includes=None):
+    """Dependency that sets ``ETag``/``Cache-Control`` and answers 304 when the client's copy is current.
+
+    ``includes`` is the model whose ``?include=`` relationships (includes.py) add their tables.
+    """
+
+    def check(request: Request, response: Response, db: Session = Depends(get_read_db)):
+        read, control = read_tables(request, tables, cache_control, includes)
+        respond(request, response, read, control, table_versions(db, read))
+
+    return check
+
+
+def async_conditional_get(*tables: str, cache_control: str = VOLATILE, includes=None):
+    """``conditional_get`` for the DB_ASYNC routes, looking the versions up on their AsyncSession."""
+
+    # db is an AsyncSession; sqlalchemy.ext.asyncio is only imported when DB_ASYNC is on.
+    async def check(request: Request, response: Response, db=Depends(get_async_read_db)):
+        read, control = read_tables(request, tables, cache_control, includes)
+        respond(request, response, read, control, await async_table_versions(db, read))
+
+    return check
@@ -0,0 +1,166 @@
+import os
+from typing import Optional
+
+from pydantic import BaseModel
+from sqlalchemy.engine import make_url
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DATABASE_URL = "sqlite:///" + os.path.join(BASE_DIR, "project.db")
+
+# Starlette runs sync endpoints on anyio's default thread limiter (40 tokens),
+# so a pool of the same size means no request thread ever waits for a connection.
+DEFAULT_THREADPOOL_SIZE = 40
+
+# Durability profiles. "throughput" is safe against application crashes and
+# only loses the last transactions on power loss; "strict" fsyncs every commit.
+DURABILITY_PROFILES = {
+    "throughput": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "cache_size": -64000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "foreign_keys": "ON",
+    },
+    "strict": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "busy_timeout": 10000,
+        "cache_size": -16000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "foreign_keys": "ON",
+    },
+}
+
+
+def to_async_url(url: str) -> str:
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    return url
+
+
+def read_only_url(url: str) -> str:
+    """Open the same SQLite file through a ``mode=ro`` URI; other URLs are returned as is."""
+    parsed = make_url(url)
+    database = parsed.database
+    if not parsed.drivername.startswith("sqlite") or not database or database == ":memory:":
+        return url
+    if database.startswith("file:"):
+        return url
+    return f"{parsed.drivername}:///file:{database}?mode=ro&uri=true"
+
+
+class Settings(BaseModel):
+    database_url: str = DEFAULT_DATABASE_URL
+    profile: str = "throughput"
+    echo: bool = False
+    threadpool_size: int = DEFAULT_THREADPOOL_SIZE
+    pool_size: Optional[int] = None
+    # Sessions keep their connection until the response is serialized, which for
+    # sync endpoints waits for another threadpool slot. A hard cap equal to the
+    # threadpool can therefore deadlock; burst connections are cheap for SQLite.
+    max_overflow: int = -1
+    pool_timeout: float = 30.0
+    busy_timeout: Optional[int] = None
+    cache_size: Optional[int] = None
+    mmap_size: Optional[int] = None
+    synchronous: Optional[str] = None
+    async_db: bool = False
+    async_database_url: Optional[str] = None
+    database_read_url: Optional[str] = None
+    write_pool_size: int = 2
+    read_your_writes_seconds: float = 5.0
+    slow_query_ms: float = 100.0
+    nplusone: str = "off"
+    nplusone_threshold: int = 3
+    lazy_raise: bool = False
+    response_cache_resources: str = "plants,products,materials"
+    response_cache_ttl: float = 60.0
+    response_cache_size: int = 1024
+    # Seconds between inventory ledger compactions (0 disables them) and the number of
+    # movements since the latest snapshot that makes a compaction write a new one.
+    ledger_compact_interval: float = 60.0
+    ledger_snapshot_every: int = 10_000
+
+    @property
+    def effective_async_database_url(self) -> str:
+        return self.async_database_url or to_async_url(self.database_url)
+
+    @property
+    def effective_read_database_url(self) -> str:
+        return self.database_read_url or read_only_url(self.database_url)
+
+    @property
+    def read_pragmas(self) -> dict:
+        # journal_mode is a property of the file and can't be changed read-only.
+        pragmas = {key: value for key, value in self.pragmas.items() if key != "journal_mode"}
+        pragmas["query_only"] = "ON"
+        return pragmas
+
+    @property
+    def cached_resources(self) -> list:
+        return [name.strip() for name in self.response_cache_resources.split(",") if name.strip()]
+
+    @property
+    def effective_pool_size(self) -> int:
+        return self.pool_size if self.pool_size is not None else self.threadpool_size
+
+    @property
+    def pragmas(self) -> dict:
+        if self.profile not in DURABILITY_PROFILES:
+            raise ValueError(f"Unknown database profile: {self.profile!r}")
+        pragmas = dict(DURABILITY_PROFILES[self.profile])
+        overrides = {
+            "busy_timeout": self.busy_timeout,
+            "cache_size": self.cache_size,
+            "mmap_size": self.mmap_size,
+            "synchronous": self.synchronous,
+        }
+        pragmas.update({key: value for key, value in overrides.items() if value is not None})
+        return pragmas
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else None
+
+
+def get_settings() -> Settings:
+    """Build settings from DB_* environment variables on top of the defaults."""
+    values = {
+        "database_url": os.environ.get("DATABASE_URL", DEFAULT_DATABASE_URL),
+        "profile": os.environ.get("DB_PROFILE", "throughput"),
+        "echo": _env_bool("DB_ECHO", False),
+        "threadpool_size": _env_int("DB_THREADPOOL_SIZE") or DEFAULT_THREADPOOL_SIZE,
+        "pool_size": _env_int("DB_POOL_SIZE"),
+        "max_overflow": _env_int("DB_MAX_OVERFLOW") if _env_int("DB_MAX_OVERFLOW") is not None else -1,
+        "pool_timeout": float(os.environ.get("DB_POOL_TIMEOUT", 30.0)),
+        "busy_timeout": _env_int("DB_BUSY_TIMEOUT_MS"),
+        "cache_size": _env_int("DB_CACHE_SIZE"),
+        "mmap_size": _env_int("DB_MMAP_SIZE"),
+        "synchronous": os.environ.get("DB_SYNCHRONOUS") or None,
+        "async_db": _env_bool("DB_ASYNC", False),
+        "async_database_url": os.environ.get("ASYNC_DATABASE_URL") or None,
+        "database_read_url": os.environ.get("DATABASE_READ_URL") or None,
+        "write_pool_size": _env_int("DB_WRITE_POOL_SIZE") or 2,
+        "read_your_writes_seconds": float(os.environ.get("DB_READ_YOUR_WRITES_SECONDS", 5.0)),
+        "slow_query_ms": float(os.environ.get("DB_SLOW_QUERY_MS", 100.0)),
+        "nplusone": os.environ.get("DB_NPLUSONE", "off"),
+        "nplusone_threshold": _env_int("DB_NPLUSONE_THRESHOLD") or 3,
+        "lazy_raise": _env_bool("DB_LAZY_RAISE", False),
+        "response_cache_resources": os.environ.get("RESPONSE_CACHE_RESOURCES", "plants,products,materials"),
+        "response_cache_ttl": float(os.environ.get("RESPONSE_CACHE_TTL", 60.0)),
+        "response_cache_size": _env_int("RESPONSE_CACHE_SIZE") or 1024,
+        "ledger_compact_interval": float(os.environ.get("LEDGER_COMPACT_INTERVAL", 60.0)),
+        "ledger_snapshot_every": _env_int("LEDGER_SNAPSHOT_EVERY") or 10_000,
+    }
+    return Settings(**values)
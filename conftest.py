@@ -0,0 +1,54 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+from config import Settings
+from database import Base, build_engine, get_db, get_read_db, init_db
+
+
+@pytest.fixture
+def make_client(tmp_path):
+    """Factory for a TestClient over a fresh SQLite file with ``routers`` mounted.
+
+    ``seed(db)`` fills the tables before ``run_migrations`` (so migrations see the data
+    as it was) and is committed for it. ``middlewares`` are starlette ``Middleware``
+    entries, added in order, so the last one is outermost. The client carries the
+    ``engine`` and a ``session`` factory for checks behind the API's back.
+    """
+    engines = []
+
+    def make(*routers, middlewares=(), seed=None, run_migrations=False):
+        engine = build_engine(Settings(database_url=f"sqlite:///{tmp_path / 'test.db'}"))
+        engines.append(engine)
+        Base.metadata.create_all(engine)
+        SessionLocal = sessionmaker(bind=engine)
+        if seed is not None:
+            with SessionLocal() as db:
+                seed(db)
+                db.commit()
+        if run_migrations:
+            init_db(engine)
+
+        def get_session():
+            db = SessionLocal()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app = FastAPI()
+        for router in routers:
+            app.include_router(router)
+        for middleware in middlewares:
+            app.add_middleware(middleware.cls, *middleware.args, **middleware.kwargs)
+        app.dependency_overrides[get_db] = get_session
+        app.dependency_overrides[get_read_db] = get_session
+        client = TestClient(app)
+        client.engine = engine
+        client.session = SessionLocal
+        return client
+
+    yield make
+    for engine in engines:
+        engine.dispose()
@@ -0,0 +1,122 @@
+"""Stock consumption when orders are completed or shipped.
+
+Moving an order to one of ``CONSUMING_STATUSES`` (``PUT``/``PATCH /orders/{id}``
+or ``POST /orders/transitions`` for many orders at once) takes its order lines
+out of stock: finished goods in ``storage_product`` first, and whatever has to
+be produced out of ``storage_material`` through the ``product_material`` recipe.
+
+Every order is consumed at most once, when its stored status moves into one of
+these statuses; ``order_consumption`` records which ones were, so Completed ->
+Shipped or a retried request doesn't take stock twice. Migration 8 records the
+orders that were already completed or shipped.
+The whole batch is one ``BEGIN IMMEDIATE`` transaction: demand, stock and
+recipes are read with one grouped query each, then each storage table gets one
+executemany ``UPDATE ... SET quantity = quantity - ?``. If anything is short,
+nothing is written and the request fails with 409 and the shortages. Moving an
+order back out of these statuses does not restock it. The decrements show up
+in the inventory ledger with reason ``consumption``.
+"""
+from collections import defaultdict
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.orm import Session
+
+import schemas
+from database import Order, OrderConsumption, OrderProduct, ProductMaterial, StorageMaterial, StorageProduct, get_db
+from ledger import movement_reason
+
+router = APIRouter()
+
+CONSUMING_STATUSES = ("Completed", "Shipped")
+
+
+def totals(db: Session, key, quantity, condition) -> dict:
+    return dict(db.execute(select(key, func.sum(quantity)).where(condition).group_by(key)).all())
+
+
+def decrement(db: Session, table, key: str, amounts: dict) -> None:
+    if amounts:
+        db.execute(
+            update(table).where(table.c[key] == bindparam("key"))
+            .values(quantity=table.c.quantity - bindparam("amount")),
+            [{"key": item, "amount": amount} for item, amount in amounts.items()],
+        )
+
+
+def consume(db: Session, order_ids, order_status: str) -> list:
+    """Take the stock of the orders in ``order_ids`` moving into a consuming status and return their ids.
+
+    Must run before the session's transaction has written anything; raises 409 without
+    writing when stock is short. The caller commits.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        # Nobody else may take the stock between the checks below and the updates.
+        db.connection().exec_driver_sql("BEGIN IMMEDIATE")
+    consumed = select(OrderConsumption.order_id).where(OrderConsumption.order_id == Order.id).exists()
+    # Only a transition into these statuses takes stock: editing an order that is already
+    # completed or shipped (e.g. one that got there before consumption existed) doesn't.
+    ids = db.execute(
+        select(Order.id).where(Order.id.in_(order_ids), Order.status.not_in(CONSUMING_STATUSES), ~consumed)
+        .order_by(Order.id)
+    ).scalars().all()
+    if not ids:
+        return []
+
+    # Subqueries rather than id lists keep every statement under SQLite's bound-parameter limit.
+    lines = OrderProduct.order_id.in_(ids)
+    ordered = select(OrderProduct.product_id).where(lines)
+    demand = totals(db, OrderProduct.product_id, OrderProduct.quantity, lines & OrderProduct.product_id.is_not(None))
+    finished = totals(db, StorageProduct.product_id, StorageProduct.quantity, StorageProduct.product_id.in_(ordered))
+    from_stock = {product: min(quantity, max(finished.get(product, 0), 0)) for product, quantity in demand.items()}
+    to_build = {product: quantity - from_stock[product] for product, quantity in demand.items()
+                if quantity > from_stock[product]}
+
+    needed, has_recipe = defaultdict(int), set()
+    recipes = select(ProductMaterial.product_id, ProductMaterial.material_id, ProductMaterial.quantity).where(
+        ProductMaterial.product_id.in_(ordered), ProductMaterial.quantity > 0
+    )
+    for product, material, quantity in db.execute(recipes):
+        if product in to_build:
+            needed[material] += to_build[product] * quantity
+            has_recipe.add(product)
+    used = select(ProductMaterial.material_id).where(ProductMaterial.product_id.in_(ordered))
+    available = totals(db, StorageMaterial.material_id, StorageMaterial.quantity, StorageMaterial.material_id.in_(used))
+
+    short_products = [
+        {"product_id": product, "required": demand[product], "available": from_stock[product]}
+        for product in sorted(to_build) if product not in has_recipe
+    ]
+    short_materials = [
+        {"material_id": material, "required": quantity, "available": available.get(material, 0)}
+        for material, quantity in sorted(needed.items()) if quantity > available.get(material, 0)
+    ]
+    if short_products or short_materials:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail={
+            "message": "Insufficient stock", "products": short_products, "materials": short_materials,
+        })
+
+    # A batch's movements can only reference its order when there is one; order_consumption lists them all.
+    with movement_reason(db, "consumption", ids[0] if len(ids) == 1 else None):
+        decrement(db, StorageProduct.__table__, "product_id", {p: q for p, q in from_stock.items() if q})
+        decrement(db, StorageMaterial.__table__, "material_id", needed)
+    now = datetime.now()
+    db.execute(insert(OrderConsumption), [
+        {"order_id": order_id, "status": order_status, "consumed_at": now} for order_id in ids
+    ])
+    return ids
+
+
+@router.post("/orders/transitions", response_model=schemas.OrderTransitionResult)
+def transition_orders(body: schemas.OrderTransition, db: Session = Depends(get_db)):
+    """Set the status of many orders in one transaction, consuming stock for completed or shipped ones."""
+    consumed = consume(db, body.order_ids, body.status) if body.status in CONSUMING_STATUSES else []
+    table = Order.__table__
+    updated = db.execute(
+        update(table).where(table.c.id.in_(body.order_ids)).values(status=body.status).returning(table.c.id)
+    ).scalars().all()
+    db.commit()
+    return schemas.OrderTransitionResult(
+        updated=sorted(updated), consumed=consumed, missing=sorted(set(body.order_ids) - set(updated)),
+    )
@@ -1,33 +1,212 @@
+import math
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
-from sqlalchemy import Column, Integer, DECIMAL, String, ForeignKey, DateTime
+import time
+from fastapi import Request, Response
+from sqlalchemy import DDL, create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy import orm
+from sqlalchemy.orm import declarative_base, sessionmaker, relationship
+from sqlalchemy import Boolean, Column, Integer, DECIMAL, Float, String, ForeignKey, DateTime, Index
+
+import instrumentation
+from config import Settings, get_settings, to_async_url
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATABASE_FILE = os.path.join(BASE_DIR, "project.db")
-DATABASE_URL = "sqlite:///" + DATABASE_FILE
-engine = create_engine(DATABASE_URL, echo=True)
+
+settings = get_settings()
+DATABASE_URL = settings.database_url
+
+
+def install_sqlite_pragmas(engine: Engine, pragmas: dict) -> None:
+    """Apply the given PRAGMAs to every new DBAPI connection of a SQLite engine."""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def build_engine(settings: Settings, url=None, pool_size=None, pragmas=None) -> Engine:
+    url = url or settings.database_url
+    kwargs = {"echo": settings.echo}
+    if url.startswith("sqlite") and ":memory:" not in url:
+        kwargs.update(
+            pool_size=pool_size or settings.effective_pool_size,
+            max_overflow=settings.max_overflow,
+            pool_timeout=settings.pool_timeout,
+            connect_args={"check_same_thread": False},
+        )
+    engine = create_engine(url, **kwargs)
+    install_sqlite_pragmas(engine, settings.pragmas if pragmas is None else pragmas)
+    instrumentation.install(engine, settings.slow_query_ms)
+    return engine
+
+
+def build_read_engine(settings: Settings) -> Engine:
+    """Engine for GET handlers: ``mode=ro`` connections with ``query_only`` set."""
+    return build_engine(settings, url=settings.effective_read_database_url, pragmas=settings.read_pragmas)
+
+
+def build_async_engine(settings: Settings, read_only: bool = False):
+    # Imported here so the sync path does not need aiosqlite installed.
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+    if read_only:
+        url = to_async_url(settings.effective_read_database_url)
+    else:
+        url = settings.effective_async_database_url
+    kwargs = {"echo": settings.echo}
+    if url.startswith("sqlite") and ":memory:" not in url:
+        # aiosqlite defaults to NullPool, i.e. a new thread and connection per session.
+        kwargs.update(
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=settings.effective_pool_size if read_only else settings.write_pool_size,
+            # No threadpool on this path, so a bounded pool can't deadlock and
+            # queues sessions fairly instead of opening one connection each.
+            max_overflow=0,
+            pool_timeout=settings.pool_timeout,
+        )
+    async_engine = create_async_engine(url, **kwargs)
+    install_sqlite_pragmas(async_engine.sync_engine, settings.read_pragmas if read_only else settings.pragmas)
+    instrumentation.install(async_engine.sync_engine, settings.slow_query_ms)
+    return async_engine
+
+
 Base = declarative_base()
 
+# DB_LAZY_RAISE makes touching an unloaded relationship an error instead of a
+# query, so an attribute walk over a list can't silently turn into an N+1.
+RELATIONSHIP_LAZY = "raise" if settings.lazy_raise else "select"
+
+# Nothing below connects at import time: the engines are built on first use and
+# the schema is only created by init_db(), which the app runs in its lifespan.
+Session = sessionmaker()
+ReadSession = sessionmaker()
+
+_engine = None
+_read_engine = None
+
+
+def get_engine() -> Engine:
+    global _engine
+    if _engine is None:
+        # Writes are serialized by SQLite anyway, so only a few writer connections are kept open.
+        _engine = build_engine(settings, pool_size=settings.write_pool_size)
+        Session.configure(bind=_engine)
+    return _engine
+
+
+def get_read_engine() -> Engine:
+    global _read_engine
+    if _read_engine is None:
+        _read_engine = build_read_engine(settings)
+        ReadSession.configure(bind=_read_engine)
+    return _read_engine
+
+
+def __getattr__(name):
+    # Keeps "from database import engine" working without building it at import.
+    if name == "engine":
+        return get_engine()
+    if name == "read_engine":
+        return get_read_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def init_db(engine: Engine = None) -> None:
+    """Create missing tables and apply pending migrations."""
+    import migrations
+
+    engine = engine or get_engine()
+    Base.metadata.create_all(engine)
+    migrations.upgrade(engine)
 
-try:
-    with engine.connect() as connection:
-        print("Database connected successfully!")
-except Exception as e:
-    print(f"Error connecting to database: {e}")
 
-Session = sessionmaker(bind=engine)
-session = Session()
+LAST_WRITE_COOKIE = "db_last_write"
+LAST_WRITE_HEADER = "X-Last-Write"
 
-def get_db():
-    db = Session()
+
+@event.listens_for(orm.Session, "after_commit")
+def _remember_write(db):
+    response = db.info.get("response")
+    if response is not None:
+        # Truncated, not rounded: a stamp ahead of the clock is refused by wrote_recently.
+        stamp = f"{math.floor(time.time() * 1000) / 1000:.3f}"
+        response.set_cookie(LAST_WRITE_COOKIE, stamp, max_age=max(1, int(settings.read_your_writes_seconds)))
+        response.headers[LAST_WRITE_HEADER] = stamp
+
+
+def get_db(response: Response):
+    db = Session(bind=get_engine(), info={"response": response})
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def wrote_recently(request: Request) -> bool:
+    """True if the client committed a write within the read-your-writes window."""
+    stamp = request.headers.get(LAST_WRITE_HEADER) or request.cookies.get(LAST_WRITE_COOKIE)
+    try:
+        written = float(stamp)
+    except (TypeError, ValueError):
+        return False
+    # The stamp comes from the client: a future or non-finite one must not pin it to the writer.
+    return math.isfinite(written) and 0 <= time.time() - written < settings.read_your_writes_seconds
+
+
+def get_read_db(request: Request):
+    # Clients that just wrote read from the writer so a lagging replica can't hide their write.
+    if wrote_recently(request):
+        db = Session(bind=get_engine())
+    else:
+        db = ReadSession(bind=get_read_engine())
     try:
         yield db
     finally:
         db.close()
 
 
+_async_engine = None
+_AsyncSession = None
+_async_read_engine = None
+_AsyncReadSession = None
+
+
+def get_async_sessionmaker(read_only: bool = False):
+    global _async_engine, _AsyncSession, _async_read_engine, _AsyncReadSession
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    # Objects are serialized after commit; expiring them would need IO the event loop can't do lazily.
+    if read_only:
+        if _AsyncReadSession is None:
+            _async_read_engine = build_async_engine(settings, read_only=True)
+            _AsyncReadSession = async_sessionmaker(_async_read_engine, expire_on_commit=False)
+        return _AsyncReadSession
+    if _AsyncSession is None:
+        _async_engine = build_async_engine(settings)
+        _AsyncSession = async_sessionmaker(_async_engine, expire_on_commit=False)
+    return _AsyncSession
+
+
+async def get_async_db(response: Response):
+    async with get_async_sessionmaker()(info={"response": response}) as db:
+        yield db
+
+
+async def get_async_read_db(request: Request):
+    async with get_async_sessionmaker(read_only=not wrote_recently(request))() as db:
+        yield db
+
+
 class Plant(Base):
     __tablename__ = 'plant'
     
@@ -35,8 +214,8 @@ class Plant(Base):
     name = Column(String, unique=True, nullable=False)
     location = Column(String)
     capacity = Column(Integer)
-    plant_product = relationship("PlantProduct", back_populates="plant")
-    plant_material = relationship("PlantMaterial", back_populates="plant")
+    plant_product = relationship("PlantProduct", back_populates="plant", lazy=RELATIONSHIP_LAZY, passive_deletes=True)
+    plant_material = relationship("PlantMaterial", back_populates="plant", lazy=RELATIONSHIP_LAZY, passive_deletes=True)
 
 class Product(Base):
     __tablename__ = 'product'
@@ -44,22 +223,25 @@ class Product(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String, unique=True, nullable=False)
     description = Column(String)
-    category = Column(String)
+    category = Column(String, index=True)
     price = Column(DECIMAL)
-    plant_product = relationship("PlantProduct", back_populates="product")
-    product_material = relationship("ProductMaterial", back_populates="product")
-    storage_product = relationship("StorageProduct", back_populates="product")
-    order_product = relationship("OrderProduct", back_populates="product")
+    plant_product = relationship("PlantProduct", back_populates="product", lazy=RELATIONSHIP_LAZY, passive_deletes=True)
+    product_material = relationship("ProductMaterial", back_populates="product", lazy=RELATIONSHIP_LAZY, passive_deletes=True)
+    storage_product = relationship("StorageProduct", back_populates="product", lazy=RELATIONSHIP_LAZY, passive_deletes=True)
+    order_product = relationship("OrderProduct", back_populates="product", lazy=RELATIONSHIP_LAZY, passive_deletes=True)
     
 class PlantProduct(Base):
     __tablename__ = 'plant_product'
+    __table_args__ = (
+        Index('uq_plant_product_plant_id_product_id', 'plant_id', 'product_id', unique=True),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    plant_id = Column(Integer, ForeignKey('plant.id'))
-    product_id= Column(Integer, ForeignKey('product.id'))
+    plant_id = Column(Integer, ForeignKey('plant.id', ondelete='CASCADE'))
+    product_id= Column(Integer, ForeignKey('product.id', ondelete='CASCADE'), index=True)
     quantity = Column(Integer)
-    product = relationship("Product", back_populates="plant_product")
-    plant = relationship("Plant", back_populates="plant_product")
+    product = relationship("Product", back_populates="plant_product", lazy=RELATIONSHIP_LAZY)
+    plant = relationship("Plant", back_populates="plant_product", lazy=RELATIONSHIP_LAZY)
 
 class Material(Base):
     __tablename__ = 'material'
@@ -69,66 +251,255 @@ class Material(Base):
     description = Column(String)
     unit = Column(String)
     cost = Column(DECIMAL)
-    plant_material = relationship("PlantMaterial", back_populates="material")
-    product_material = relationship("ProductMaterial", back_populates="material")
-    storage_material = relationship("StorageMaterial", back_populates="material")
+    plant_material = relationship("PlantMaterial", back_populates="material", lazy=RELATIONSHIP_LAZY, passive_deletes=True)
+    product_material = relationship("ProductMaterial", back_populates="material", lazy=RELATIONSHIP_LAZY, passive_deletes=True)
+    storage_material = relationship("StorageMaterial", back_populates="material", lazy=RELATIONSHIP_LAZY, passive_deletes=True)
 
 
 class StorageMaterial(Base):
     __tablename__ = 'storage_material'
+    __table_args__ = (
+        Index('uq_storage_material_material_id', 'material_id', unique=True),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    material_id = Column(Integer, ForeignKey('material.id'))
+    material_id = Column(Integer, ForeignKey('material.id', ondelete='CASCADE'))
     quantity = Column(Integer, nullable=False)
-    material=relationship("Material", back_populates="storage_material")
+    material=relationship("Material", back_populates="storage_material", lazy=RELATIONSHIP_LAZY)
 
 class PlantMaterial(Base):
     __tablename__ = 'plant_material'
+    __table_args__ = (
+        Index('uq_plant_material_plant_id_material_id', 'plant_id', 'material_id', unique=True),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    plant_id = Column(Integer, ForeignKey('plant.id'))
-    material_id = Column(Integer, ForeignKey('material.id'))
+    plant_id = Column(Integer, ForeignKey('plant.id', ondelete='CASCADE'))
+    material_id = Column(Integer, ForeignKey('material.id', ondelete='CASCADE'), index=True)
     quantity = Column(Integer)
-    plant = relationship("Plant", back_populates="plant_material")
-    material = relationship("Material", back_populates="plant_material")
+    plant = relationship("Plant", back_populates="plant_material", lazy=RELATIONSHIP_LAZY)
+    material = relationship("Material", back_populates="plant_material", lazy=RELATIONSHIP_LAZY)
 
 class Order(Base):
     __tablename__ = 'order'
+    __table_args__ = (
+        Index('ix_order_status_order_date', 'status', 'order_date'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    order_date = Column(DateTime, nullable=False)
+    order_date = Column(DateTime, nullable=False, index=True)
     status = Column(String, nullable=False)
-    customer_name = Column(String)
-    order_product = relationship("OrderProduct", back_populates="order")
+    customer_name = Column(String, index=True)
+    order_product = relationship("OrderProduct", back_populates="order", lazy=RELATIONSHIP_LAZY, passive_deletes=True)
     
 
 class ProductMaterial(Base):
     __tablename__ = 'product_material'
+    __table_args__ = (
+        Index('uq_product_material_product_id_material_id', 'product_id', 'material_id', unique=True),
+        # Covers the recipe lookups of the order/material joins without touching the table.
+        Index('ix_product_material_product_id_covering', 'product_id', 'material_id', 'quantity'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    product_id = Column(Integer, ForeignKey('product.id'))
-    material_id = Column(Integer, ForeignKey('material.id'))
+    product_id = Column(Integer, ForeignKey('product.id', ondelete='CASCADE'))
+    material_id = Column(Integer, ForeignKey('material.id', ondelete='CASCADE'), index=True)
     quantity = Column(Integer, nullable=False)
-    product = relationship("Product", back_populates="product_material")
-    material = relationship("Material", back_populates="product_material")
+    product = relationship("Product", back_populates="product_material", lazy=RELATIONSHIP_LAZY)
+    material = relationship("Material", back_populates="product_material", lazy=RELATIONSHIP_LAZY)
 
 
 class OrderProduct(Base):
     __tablename__ = 'order_product'
+    __table_args__ = (
+        Index('uq_order_product_order_id_product_id', 'order_id', 'product_id', unique=True),
+        # Covers listing the lines of an order without touching the table.
+        Index('ix_order_product_order_id_covering', 'order_id', 'product_id', 'quantity'),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    order_id = Column(Integer, ForeignKey('order.id'))
-    product_id = Column(Integer, ForeignKey('product.id'))
+    order_id = Column(Integer, ForeignKey('order.id', ondelete='CASCADE'))
+    product_id = Column(Integer, ForeignKey('product.id', ondelete='SET NULL'), index=True)
     quantity = Column(Integer, nullable=False)
-    order = relationship("Order", back_populates="order_product")
-    product = relationship("Product", back_populates="order_product")
+    order = relationship("Order", back_populates="order_product", lazy=RELATIONSHIP_LAZY)
+    product = relationship("Product", back_populates="order_product", lazy=RELATIONSHIP_LAZY)
 
 class StorageProduct(Base):
     __tablename__ = 'storage_product'
-    
+    __table_args__ = (
+        Index('uq_storage_product_product_id', 'product_id', unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    product_id = Column(Integer, ForeignKey('product.id', ondelete='CASCADE'))
+    quantity = Column(Integer, nullable=False)
+    product = relationship("Product", back_populates="storage_product", lazy=RELATIONSHIP_LAZY)
+
+
+
+class ChangeVersion(Base):
+    """Per-table write counter bumped by triggers; the ETags of the read endpoints are built from it."""
+    __tablename__ = 'change_version'
+
+    table_name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class OrderConsumption(Base):
+    """Orders whose stock has been taken (see consumption.py); at most one row per order."""
+    __tablename__ = 'order_consumption'
+
+    order_id = Column(Integer, ForeignKey('order.id', ondelete='CASCADE'), primary_key=True)
+    status = Column(String, nullable=False)
+    consumed_at = Column(DateTime, nullable=False)
+
+
+class MrpRun(Base):
+    """One material requirements planning run over the open orders (see mrp.py)."""
+    __tablename__ = 'mrp_run'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    created_at = Column(DateTime, nullable=False)
+    orders = Column(Integer, nullable=False)
+    order_lines = Column(Integer, nullable=False)
+    duration_ms = Column(Float, nullable=False)
+    lines = relationship("MrpRunLine", back_populates="run", lazy=RELATIONSHIP_LAZY, passive_deletes=True)
+
+
+class MrpRunLine(Base):
+    """Requirement of one material in a run; ``plant_id`` is NULL on the all-plants total."""
+    __tablename__ = 'mrp_run_line'
+    __table_args__ = (
+        Index('ix_mrp_run_line_run_id_plant_id_material_id', 'run_id', 'plant_id', 'material_id'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    run_id = Column(Integer, ForeignKey('mrp_run.id', ondelete='CASCADE'), nullable=False)
+    plant_id = Column(Integer)
+    material_id = Column(Integer, nullable=False)
+    required = Column(Integer, nullable=False)
+    on_hand = Column(Integer, nullable=False)
+    shortage = Column(Integer, nullable=False)
+    run = relationship("MrpRun", back_populates="lines", lazy=RELATIONSHIP_LAZY)
+
+
+class InventoryMovement(Base):
+    """One change to ``storage_product`` or ``storage_material``, appended by triggers (see ledger.py)."""
+    __tablename__ = 'inventory_movement'
+    __table_args__ = (
+        Index('ix_inventory_movement_created_at', 'created_at'),
+        Index('ix_inventory_movement_kind_item_id', 'kind', 'item_id'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String, nullable=False)
+    item_id = Column(Integer, nullable=False)
+    delta = Column(Integer, nullable=False)
+    reason = Column(String, nullable=False)
+    order_id = Column(Integer)
+    created_at = Column(Float, nullable=False)
+
+
+class InventoryMovementContext(Base):
+    """Reason and order the movement triggers record; only ever set inside the writing transaction."""
+    __tablename__ = 'inventory_movement_context'
+
+    id = Column(Integer, primary_key=True)
+    reason = Column(String, nullable=False)
+    order_id = Column(Integer)
+
+
+class InventorySnapshot(Base):
+    """Balances of every item after movement ``last_movement_id``; ``baseline`` ones were read from storage."""
+    __tablename__ = 'inventory_snapshot'
+    __table_args__ = (
+        Index('ix_inventory_snapshot_taken_at', 'taken_at'),
+    )
+
     id = Column(Integer, primary_key=True, autoincrement=True)
-    product_id = Column(Integer, ForeignKey('product.id'))
+    taken_at = Column(Float, nullable=False)
+    last_movement_id = Column(Integer, nullable=False)
+    baseline = Column(Boolean, nullable=False, default=False)
+
+
+class InventorySnapshotItem(Base):
+    __tablename__ = 'inventory_snapshot_item'
+
+    snapshot_id = Column(Integer, ForeignKey('inventory_snapshot.id', ondelete='CASCADE'), primary_key=True)
+    kind = Column(String, primary_key=True)
+    item_id = Column(Integer, primary_key=True)
     quantity = Column(Integer, nullable=False)
-    product = relationship("Product", back_populates="storage_product")
 
-Base.metadata.create_all(engine)
+
+VERSIONED_TABLES = [model.__table__ for model in (
+    Plant, Product, Material, Order, PlantProduct, PlantMaterial, ProductMaterial, OrderProduct,
+    StorageProduct, StorageMaterial,
+)]
+
+
+def change_version_triggers(table_name: str) -> list:
+    """CREATE TRIGGER statements bumping ``change_version`` on every write to ``table_name``.
+
+    SQLite only has row triggers, so a bulk statement bumps the counter once per row;
+    foreign key actions fire the child table's triggers as well.
+    """
+    return [
+        f'CREATE TRIGGER IF NOT EXISTS trg_{table_name}_version_{operation.lower()} '
+        f'AFTER {operation} ON "{table_name}" BEGIN '
+        f"INSERT INTO change_version (table_name, version) VALUES ('{table_name}', 1) "
+        f"ON CONFLICT (table_name) DO UPDATE SET version = version + 1; END"
+        for operation in ("INSERT", "UPDATE", "DELETE")
+    ]
+
+
+for _table in VERSIONED_TABLES:
+    for _statement in change_version_triggers(_table.name):
+        event.listen(_table, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+
+
+# Unix time in seconds, with SQLite's millisecond resolution.
+UNIX_NOW = "((julianday('now') - 2440587.5) * 86400.0)"
+
+# Storage table -> (movement kind, item column).
+LEDGER_SOURCES = {"storage_product": ("product", "product_id"), "storage_material": ("material", "material_id")}
+
+
+def movement_triggers(table_name: str) -> list:
+    """CREATE TRIGGER statements appending an ``inventory_movement`` row for every quantity change in ``table_name``."""
+    kind, key = LEDGER_SOURCES[table_name]
+
+    def append(item, delta, when):
+        return (
+            f"INSERT INTO inventory_movement (kind, item_id, delta, reason, order_id, created_at) "
+            f"SELECT '{kind}', {item}, {delta}, "
+            f"coalesce((SELECT reason FROM inventory_movement_context), 'adjustment'), "
+            f"(SELECT order_id FROM inventory_movement_context), {UNIX_NOW} WHERE {when};"
+        )
+
+    new, old, changed = f"new.{key}", f"old.{key}", "new.quantity != old.quantity"
+    prefix = f"CREATE TRIGGER IF NOT EXISTS trg_{table_name}_movement"
+    return [
+        f"{prefix}_insert AFTER INSERT ON {table_name} BEGIN "
+        f"{append(new, 'new.quantity', f'{new} IS NOT NULL AND new.quantity != 0')} END",
+        f"{prefix}_delete AFTER DELETE ON {table_name} BEGIN "
+        f"{append(old, '-old.quantity', f'{old} IS NOT NULL AND old.quantity != 0')} END",
+        # A row moved to another item is a movement out of the old one and into the new one.
+        f"{prefix}_update AFTER UPDATE OF {key}, quantity ON {table_name} BEGIN "
+        f"{append(new, 'new.quantity - old.quantity', f'{new} IS {old} AND {new} IS NOT NULL AND {changed}')} "
+        f"{append(old, '-old.quantity', f'{new} IS NOT {old} AND {old} IS NOT NULL AND old.quantity != 0')} "
+        f"{append(new, 'new.quantity', f'{new} IS NOT {old} AND {new} IS NOT NULL AND new.quantity != 0')} "
+        "END",
+    ]
+
+
+APPEND_ONLY_TRIGGERS = [
+    f"CREATE TRIGGER IF NOT EXISTS trg_inventory_movement_no_{operation.lower()} BEFORE {operation} "
+    f"ON inventory_movement BEGIN SELECT RAISE(ABORT, 'inventory_movement is append-only'); END"
+    for operation in ("UPDATE", "DELETE")
+]
+
+for _table in (StorageProduct.__table__, StorageMaterial.__table__):
+    for _statement in movement_triggers(_table.name):
+        event.listen(_table, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+for _statement in APPEND_ONLY_TRIGGERS:
+    event.listen(InventoryMovement.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
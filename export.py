@@ -0,0 +1,82 @@
+"""Streaming table exports: ``GET /export/{table}?format=ndjson|csv&gzip=true``.
+
+Rows are read as Core tuples with ``stream_results``/``yield_per`` and written out
+one batch at a time, so memory stays flat whatever the table size. The whole
+export is a single SELECT on its own read connection, which SQLite runs against
+one snapshot even while writers commit.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import date
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+
+from database import get_read_engine
+from resources import BY_TABLE
+
+router = APIRouter(prefix="/export")
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+BATCH_ROWS = 5000
+
+
+def _json_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+# json.dumps(default=...) builds a new encoder per call; reuse one for every row.
+_encode_json = json.JSONEncoder(default=_json_default, separators=(",", ":")).encode
+
+
+def encode_ndjson(columns, rows) -> str:
+    return "".join(_encode_json(dict(zip(columns, row))) + "\n" for row in rows)
+
+
+def encode_csv(columns, rows) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def stream_table(engine: Engine, table, format: str = "ndjson", batch_rows: int = BATCH_ROWS):
+    encode = encode_csv if format == "csv" else encode_ndjson
+    with engine.connect() as connection:
+        result = connection.execution_options(stream_results=True, yield_per=batch_rows).execute(
+            select(table).order_by(*table.primary_key.columns)
+        )
+        columns = list(result.keys())
+        if format == "csv":
+            yield encode_csv(columns, [columns]).encode()
+        for rows in result.partitions():
+            yield encode(columns, rows).encode()
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+@router.get("/{table}")
+def export_table(table: str, format: str = Query("ndjson", pattern="^(ndjson|csv)$"), gzip: bool = False,
+                 engine: Engine = Depends(get_read_engine)):
+    resource = BY_TABLE.get(table)
+    if resource is None:
+        raise HTTPException(status_code=404, detail=f"Unknown table: {table}")
+
+    chunks = stream_table(engine, resource.table, format)
+    headers = {"Content-Disposition": f'attachment; filename="{table}.{format}"'}
+    if gzip:
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type=MEDIA_TYPES[format], headers=headers)
@@ -0,0 +1,112 @@
+"""Compound documents: ``?include=`` on the plant, product, material and order reads.
+
+``/orders/7?include=order_product.product`` returns the order with its lines
+and each line's product nested inside; ``,`` separates paths and ``.`` walks
+relationships, up to ``MAX_DEPTH`` levels. Every relationship on a path is
+loaded with one ``selectinload`` query for all parent rows, so a response costs
+one query per included relationship whatever the number of rows. Only the
+included relationships are read from the objects, which keeps ``lazy="raise"``
+happy, and the bodies are validated against the ``*WithRelations`` schemas.
+"""
+from typing import Optional
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import selectinload
+
+from serialization import adapter, encode, list_adapter
+
+MAX_DEPTH = 3
+MAX_PATHS = 10
+
+
+def parse(model, include: Optional[str]) -> dict:
+    """Turn ``a.b,a.c,d`` into ``{"a": {"b": {}, "c": {}}, "d": {}}``, checking every name."""
+    tree = {}
+    paths = [path.strip() for path in (include or "").split(",") if path.strip()]
+    if len(paths) > MAX_PATHS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_PATHS} include paths")
+    for path in paths:
+        names = path.split(".")
+        if len(names) > MAX_DEPTH:
+            raise HTTPException(status_code=400, detail=f"Include {path!r} is deeper than {MAX_DEPTH} levels")
+        node, current = tree, model
+        for name in names:
+            relationships = inspect(current).relationships
+            if name not in relationships:
+                raise HTTPException(status_code=400, detail=f"{current.__name__} has no relationship {name!r}; "
+                                                            f"use one of {sorted(relationships.keys())}")
+            node = node.setdefault(name, {})
+            current = relationships[name].mapper.class_
+    return tree
+
+
+def loader_options(model, tree: dict) -> list:
+    options = []
+    for name, subtree in tree.items():
+        option = selectinload(getattr(model, name))
+        if subtree:
+            option = option.options(*loader_options(inspect(model).relationships[name].mapper.class_, subtree))
+        options.append(option)
+    return options
+
+
+def tables(model, tree: dict) -> set:
+    """Tables read for the included relationships of ``model``."""
+    found = set()
+    for name, subtree in tree.items():
+        target = inspect(model).relationships[name].mapper.class_
+        found.add(target.__table__.name)
+        found |= tables(target, subtree)
+    return found
+
+
+def to_dict(obj, tree: dict) -> dict:
+    data = {attr.key: getattr(obj, attr.key) for attr in inspect(type(obj)).column_attrs}
+    for name, subtree in tree.items():
+        value = getattr(obj, name)
+        if isinstance(value, list):
+            data[name] = [to_dict(item, subtree) for item in value]
+        else:
+            data[name] = None if value is None else to_dict(value, subtree)
+    return data
+
+
+class IncludeTree:
+    def __init__(self, model, schema, tree: dict):
+        self.model = model
+        self.schema = schema
+        self.tree = tree
+
+    def __bool__(self) -> bool:
+        return bool(self.tree)
+
+    def query(self, db):
+        return db.query(self.model).options(*loader_options(self.model, self.tree))
+
+    def statement(self):
+        """``query`` as a ``select()``, for AsyncSession."""
+        return select(self.model).options(*loader_options(self.model, self.tree))
+
+    def render_one(self, obj, response: Response) -> Response:
+        schema_adapter = adapter(self.schema)
+        model = schema_adapter.validate_python(to_dict(obj, self.tree))
+        return encode(schema_adapter.dump_json(model, exclude_unset=True), response)
+
+    def render_list(self, objs, response: Response) -> Response:
+        schema_adapter = list_adapter(self.schema)
+        models = schema_adapter.validate_python([to_dict(obj, self.tree) for obj in objs])
+        return encode(schema_adapter.dump_json(models, exclude_unset=True), response)
+
+
+class Include:
+    """``?include=`` for one model, e.g. ``include: IncludeTree = Depends(Include(Order, OrderWithRelations))``."""
+
+    def __init__(self, model, schema):
+        self.model = model
+        self.schema = schema
+
+    def __call__(self, include: Optional[str] = Query(
+        None, description="Comma separated relationship paths, e.g. order_product.product"
+    )) -> IncludeTree:
+        return IncludeTree(self.model, self.schema, parse(self.model, include))
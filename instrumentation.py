@@ -0,0 +1,182 @@
+"""Per-statement SQL timing, a structured slow-query log and per-request totals.
+
+``install(engine)`` hooks ``before/after_cursor_execute`` on an engine. Every
+statement is timed; statements slower than ``DB_SLOW_QUERY_MS`` are written as
+one JSON object per line to the ``sql.slow`` logger, tagged with the endpoint
+that issued them. ``SQLStatsMiddleware`` creates a ``RequestSQLStats`` per HTTP
+request, exposes it as ``request.state.sql_stats`` and reports the totals in a
+``Server-Timing`` header.
+
+SQLite reports no rowcount for SELECTs, so the rows a statement returns are
+counted as they are fetched: its cursor is wrapped in ``_CountingCursor``, which
+adds them to the statement's record and to ``rows_returned``. ``rows_loaded``
+counts ORM instances only.
+"""
+import json
+import logging
+import time
+from collections import namedtuple
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event, orm
+from sqlalchemy.engine import Engine
+
+slow_query_logger = logging.getLogger("sql.slow")
+
+QueryRecord = namedtuple("QueryRecord", ["statement", "parameters", "duration", "rowcount"])
+
+# Enough to diagnose a request without letting a runaway loop hold every statement.
+MAX_RECORDS = 1000
+
+_current: ContextVar[Optional["RequestSQLStats"]] = ContextVar("sql_stats", default=None)
+
+
+class RequestSQLStats:
+    def __init__(self, scope=None):
+        self.scope = scope if scope is not None else {}
+        self.query_count = 0
+        self.total_time = 0.0
+        self.rows_loaded = 0
+        self.rows_returned = 0
+        self.records = []
+
+    @property
+    def endpoint(self) -> Optional[str]:
+        endpoint = self.scope.get("endpoint")
+        if endpoint is not None:
+            return getattr(endpoint, "__name__", str(endpoint))
+        return self.scope.get("path")
+
+    def add(self, record: QueryRecord) -> Optional[int]:
+        """Count ``record``; returns its index in ``records``, None once they are full."""
+        self.query_count += 1
+        self.total_time += record.duration
+        if len(self.records) < MAX_RECORDS:
+            self.records.append(record)
+            return len(self.records) - 1
+        return None
+
+    def add_rows(self, index: Optional[int], rows: int) -> None:
+        self.rows_returned += rows
+        if index is not None:
+            record = self.records[index]
+            self.records[index] = record._replace(rowcount=(record.rowcount or 0) + rows)
+
+
+def current_stats() -> Optional[RequestSQLStats]:
+    return _current.get()
+
+
+class collect_stats:
+    """Collect statistics for the statements run inside the block, outside of a request."""
+
+    def __enter__(self) -> RequestSQLStats:
+        self.stats = RequestSQLStats()
+        self._token = _current.set(self.stats)
+        return self.stats
+
+    def __exit__(self, *exc_info):
+        _current.reset(self._token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _make_after_cursor_execute(slow_query_ms: float):
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["query_start_time"].pop()
+        rowcount = cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else None
+        stats = _current.get()
+        if stats is not None:
+            index = stats.add(QueryRecord(statement, parameters, duration, rowcount))
+            if cursor.description is not None and context is not None:
+                # The result is built on context.cursor after this hook returns.
+                context.cursor = _CountingCursor(cursor, stats, index)
+        if duration * 1000 >= slow_query_ms:
+            slow_query_logger.warning(json.dumps({
+                "event": "slow_query",
+                "duration_ms": round(duration * 1000, 3),
+                "statement": statement,
+                "parameters": repr(parameters)[:500],
+                "executemany": executemany,
+                "rowcount": rowcount,
+                "endpoint": stats.endpoint if stats is not None else None,
+                "method": stats.scope.get("method") if stats is not None else None,
+            }))
+    return _after_cursor_execute
+
+
+class _CountingCursor:
+    """DBAPI cursor proxy that reports the rows fetched through it to ``stats``."""
+
+    def __init__(self, cursor, stats: RequestSQLStats, index: Optional[int]):
+        self._cursor = cursor
+        self._stats = stats
+        self._index = index
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._stats.add_rows(self._index, 1)
+            yield row
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._stats.add_rows(self._index, 1)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._stats.add_rows(self._index, len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._stats.add_rows(self._index, len(rows))
+        return rows
+
+
+def install(engine: Engine, slow_query_ms: float = 100.0) -> None:
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _make_after_cursor_execute(slow_query_ms))
+
+
+@event.listens_for(orm.Mapper, "load")
+def _count_loaded_row(target, context):
+    stats = _current.get()
+    if stats is not None:
+        stats.rows_loaded += 1
+
+
+class SQLStatsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestSQLStats(scope)
+        scope.setdefault("state", {})["sql_stats"] = stats
+        token = _current.set(stats)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                timing = f'db;dur={stats.total_time * 1000:.2f};desc="{stats.query_count} queries"'
+                headers.append((b"server-timing", timing.encode()))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
@@ -0,0 +1,184 @@
+"""Inventory totals per product and per material.
+
+``inventory_product_total`` and ``inventory_material_total`` hold, per item, the
+summed ``quantity`` and the ``row_count`` of ``storage_product`` and
+``storage_material``. Triggers apply each insert, update and delete to the
+totals as a delta, so a write costs one primary-key upsert and
+``GET /inventory/products/{id}`` one primary-key lookup, however many storage
+rows an item has. Items whose last storage row goes away are dropped.
+
+Deltas drift if rows are ever written with the triggers missing (e.g. restored
+from a dump), so ``python inventory.py verify [--repair]`` and
+``POST /inventory/verify`` compare the totals against a ``GROUP BY`` of the
+storage tables, report every difference and optionally rewrite the affected
+items. The tables and triggers are created and filled by migration 9.
+"""
+import argparse
+from collections import namedtuple
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+import schemas
+from conditional import VOLATILE, conditional_get
+from database import get_db, get_read_db
+from serialization import json_list
+
+router = APIRouter()
+
+Totals = namedtuple("Totals", ["table", "source", "key", "schema"])
+
+TOTALS = {
+    "products": Totals("inventory_product_total", "storage_product", "product_id", schemas.ProductInventory),
+    "materials": Totals("inventory_material_total", "storage_material", "material_id", schemas.MaterialInventory),
+}
+MAX_LIMIT = 10_000
+
+
+def schema_statements() -> list:
+    statements = []
+    for table, source, key, _ in TOTALS.values():
+        add = (f"INSERT INTO {table} ({key}, quantity, row_count) VALUES (new.{key}, new.quantity, 1) "
+               f"ON CONFLICT ({key}) DO UPDATE SET quantity = quantity + excluded.quantity, "
+               f"row_count = row_count + 1;")
+        remove = (f"UPDATE {table} SET quantity = quantity - old.quantity, row_count = row_count - 1 "
+                  f"WHERE {key} = old.{key}; DELETE FROM {table} WHERE {key} = old.{key} AND row_count <= 0;")
+        statements += [
+            f"CREATE TABLE IF NOT EXISTS {table} ({key} INTEGER NOT NULL, quantity INTEGER NOT NULL, "
+            f"row_count INTEGER NOT NULL, PRIMARY KEY ({key}))",
+            f"CREATE TRIGGER IF NOT EXISTS trg_{source}_total_insert AFTER INSERT ON {source} "
+            f"WHEN new.{key} IS NOT NULL BEGIN {add} END",
+            f"CREATE TRIGGER IF NOT EXISTS trg_{source}_total_delete AFTER DELETE ON {source} "
+            f"WHEN old.{key} IS NOT NULL BEGIN {remove} END",
+            # The update is a delete of the old row and an insert of the new one; either side may be NULL.
+            f"CREATE TRIGGER IF NOT EXISTS trg_{source}_total_update_old AFTER UPDATE OF {key}, quantity "
+            f"ON {source} WHEN old.{key} IS NOT NULL BEGIN {remove} END",
+            f"CREATE TRIGGER IF NOT EXISTS trg_{source}_total_update_new AFTER UPDATE OF {key}, quantity "
+            f"ON {source} WHEN new.{key} IS NOT NULL BEGIN {add} END",
+        ]
+    return statements
+
+
+def create_schema(connection: Connection) -> None:
+    for statement in schema_statements():
+        connection.exec_driver_sql(statement)
+
+
+def expected(totals: Totals) -> str:
+    return (f"SELECT {totals.key}, sum(quantity) AS quantity, count(*) AS row_count FROM {totals.source} "
+            f"WHERE {totals.key} IS NOT NULL GROUP BY {totals.key}")
+
+
+def rebuild(connection: Connection) -> None:
+    for totals in TOTALS.values():
+        connection.exec_driver_sql(f"DELETE FROM {totals.table}")
+        connection.exec_driver_sql(
+            f"INSERT INTO {totals.table} ({totals.key}, quantity, row_count) {expected(totals)}"
+        )
+
+
+def drift(connection: Connection, totals: Totals) -> list:
+    """Items whose stored total differs from the storage rows, as
+    ``(id, expected quantity, expected rows, stored quantity, stored rows)``."""
+    key = totals.key
+    return connection.exec_driver_sql(
+        f"SELECT item, sum(eq), sum(er), sum(sq), sum(sr) FROM ("
+        f"SELECT {key} AS item, quantity AS eq, row_count AS er, 0 AS sq, 0 AS sr FROM ({expected(totals)}) "
+        f"UNION ALL SELECT {key}, 0, 0, quantity, row_count FROM {totals.table}) "
+        f"GROUP BY item HAVING sum(eq) != sum(sq) OR sum(er) != sum(sr) ORDER BY item"
+    ).fetchall()
+
+
+def verify(connection: Connection, repair: bool = False) -> dict:
+    """Compare every total with its storage rows; with ``repair`` rewrite the drifted items."""
+    report = {}
+    for name, totals in TOTALS.items():
+        rows = drift(connection, totals)
+        if repair and rows:
+            connection.exec_driver_sql(f"DELETE FROM {totals.table} WHERE {totals.key} = ?",
+                                       [(row[0],) for row in rows])
+            # Items without storage rows stay deleted.
+            restored = [tuple(row[:3]) for row in rows if row[2]]
+            if restored:
+                connection.exec_driver_sql(
+                    f"INSERT INTO {totals.table} ({totals.key}, quantity, row_count) VALUES (?, ?, ?)", restored
+                )
+            # The reads' ETags are built from the storage table's counter; make them change too.
+            connection.exec_driver_sql(
+                "INSERT INTO change_version (table_name, version) VALUES (?, 1) "
+                "ON CONFLICT (table_name) DO UPDATE SET version = version + 1", (totals.source,)
+            )
+        report[name] = [
+            schemas.InventoryDrift(id=item, expected_quantity=eq, expected_rows=er,
+                                   stored_quantity=sq, stored_rows=sr)
+            for item, eq, er, sq, sr in rows
+        ]
+    return report
+
+
+def add_routes(router: APIRouter, name: str, totals: Totals) -> None:
+    select = f"SELECT {totals.key}, quantity, row_count FROM {totals.table}"
+    versions = Depends(conditional_get(totals.source, cache_control=VOLATILE))
+
+    def read_totals(response: Response, after: int = Query(0, description=f"Only items with a larger {totals.key}"),
+                    limit: int = Query(1000, ge=1, le=MAX_LIMIT), db: Session = Depends(get_read_db)):
+        rows = db.execute(text(f"{select} WHERE {totals.key} > :after ORDER BY {totals.key} LIMIT :limit"),
+                          {"after": after, "limit": limit}).all()
+        return json_list(totals.schema, rows, response)
+
+    def read_total(item_id: int, db: Session = Depends(get_read_db)):
+        row = db.execute(text(f"{select} WHERE {totals.key} = :id"), {"id": item_id}).first()
+        if row is None:
+            raise HTTPException(status_code=404, detail=f"No {totals.source} rows for {totals.key} {item_id}")
+        return row._mapping
+
+    router.add_api_route(f"/inventory/{name}", read_totals, methods=["GET"], response_model=List[totals.schema],
+                         dependencies=[versions], name=f"read_inventory_{name}")
+    router.add_api_route(f"/inventory/{name}/{{item_id}}", read_total, methods=["GET"], response_model=totals.schema,
+                         dependencies=[versions], name=f"read_inventory_{name}_item")
+
+
+for _name, _totals in TOTALS.items():
+    add_routes(router, _name, _totals)
+
+
+@router.post("/inventory/verify", response_model=schemas.InventoryVerification)
+def verify_inventory(repair: bool = False, db: Session = Depends(get_db)):
+    connection = db.connection()
+    if repair and connection.dialect.name == "sqlite":
+        # No storage write may land between reading the drift and rewriting it.
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+    report = verify(connection, repair)
+    db.commit()
+    return schemas.InventoryVerification(repaired=repair, **report)
+
+
+def main():
+    from database import build_engine, settings
+
+    parser = argparse.ArgumentParser(description="Check the inventory totals against the storage tables.")
+    parser.add_argument("command", choices=["verify", "rebuild"])
+    parser.add_argument("--repair", action="store_true")
+    parser.add_argument("--url", default=settings.database_url)
+    args = parser.parse_args()
+
+    engine = build_engine(settings.model_copy(update={"database_url": args.url}))
+    with engine.begin() as connection:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+        create_schema(connection)
+        if args.command == "rebuild":
+            rebuild(connection)
+            print("rebuilt inventory totals")
+            return
+        for name, rows in verify(connection, args.repair).items():
+            print(f"{name}: {len(rows)} drifted{' (repaired)' if args.repair and rows else ''}")
+            for row in rows:
+                print(f"  {row.id}: expected {row.expected_quantity} in {row.expected_rows} rows, "
+                      f"stored {row.stored_quantity} in {row.stored_rows} rows")
+
+
+if __name__ == "__main__":
+    main()
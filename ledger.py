@@ -0,0 +1,237 @@
+"""Inventory ledger: the history of ``storage_product`` and ``storage_material``.
+
+Triggers append one ``inventory_movement`` row per change to a storage row:
+the item, the signed ``delta`` of its quantity, a ``reason`` and the order it was
+taken for. Writes are labelled by setting ``inventory_movement_context`` inside
+their transaction (``movement_reason``); unlabelled ones are ``adjustment``.
+Consumption labels its decrements ``consumption`` and, when a single order is
+consumed, references it. Movements can't be updated or deleted.
+
+Balances are never replayed from the first movement. ``inventory_snapshot``
+holds the balance of every item after movement ``last_movement_id``, and the
+balance at time ``ts`` is the latest snapshot taken at or before ``ts`` (one
+descent of ``ix_inventory_snapshot_taken_at``) plus the movements between it
+and the last one recorded at ``ts`` (a rowid range). ``GET /inventory/as-of``
+answers with that, for every item or one of them; without ``ts`` it is the
+current balance.
+
+``compact`` keeps the tail short: once ``ledger_snapshot_every`` movements have
+piled up since the latest snapshot, it adds the tail to it. Movements up to a
+given id and existing snapshots never change, so the new snapshot is computed
+on a read connection, which in WAL mode doesn't hold up writers, and only its
+insert takes the write lock. The app runs it every ``ledger_compact_interval``
+seconds; ``python ledger.py compact`` does it once. Older snapshots are kept so
+that past timestamps stay as cheap as recent ones.
+
+Migration 10 creates the tables and a baseline snapshot of the storage tables
+as they were; there is no history before it.
+"""
+import argparse
+import logging
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import List, Literal, Optional
+
+import anyio
+import anyio.to_thread
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import delete, insert, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+import schemas
+from conditional import VOLATILE, conditional_get
+from database import (APPEND_ONLY_TRIGGERS, LEDGER_SOURCES, UNIX_NOW, InventoryMovement, InventoryMovementContext,
+                      InventorySnapshot, InventorySnapshotItem, get_read_db, movement_triggers)
+from serialization import adapter, encode, json_list
+
+logger = logging.getLogger("inventory.ledger")
+
+router = APIRouter()
+
+MAX_LIMIT = 10_000
+
+
+def create_schema(connection: Connection) -> None:
+    for model in (InventoryMovement, InventoryMovementContext, InventorySnapshot, InventorySnapshotItem):
+        model.__table__.create(connection, checkfirst=True)
+    for statement in APPEND_ONLY_TRIGGERS:
+        connection.exec_driver_sql(statement)
+    for table in LEDGER_SOURCES:
+        for statement in movement_triggers(table):
+            connection.exec_driver_sql(statement)
+
+
+def take_baseline(connection: Connection) -> int:
+    """Snapshot the storage tables as they are now; returns the snapshot id."""
+    snapshot_id = connection.exec_driver_sql(
+        f"INSERT INTO inventory_snapshot (taken_at, last_movement_id, baseline) "
+        f"SELECT {UNIX_NOW}, coalesce(max(id), 0), 1 FROM inventory_movement RETURNING id"
+    ).scalar()
+    for table, (kind, key) in LEDGER_SOURCES.items():
+        connection.exec_driver_sql(
+            f"INSERT INTO inventory_snapshot_item (snapshot_id, kind, item_id, quantity) "
+            f"SELECT ?, '{kind}', {key}, sum(quantity) FROM {table} WHERE {key} IS NOT NULL "
+            f"GROUP BY {key} HAVING sum(quantity) != 0", (snapshot_id,)
+        )
+    return snapshot_id
+
+
+@contextmanager
+def movement_reason(db: Session, reason: str, order_id: Optional[int] = None):
+    """Record the storage writes made inside the block with ``reason`` and ``order_id``.
+
+    Must be used inside the writing transaction, which serializes it with every other writer.
+    """
+    db.execute(insert(InventoryMovementContext), {"id": 1, "reason": reason, "order_id": order_id})
+    try:
+        yield
+    finally:
+        db.execute(delete(InventoryMovementContext))
+
+
+def balances(connection: Connection, snapshot_id: Optional[int], after: int, upto: int,
+             kind: Optional[str] = None, item_id: Optional[int] = None) -> list:
+    """``(kind, item_id, quantity)`` of the snapshot plus the movements ``after < id <= upto``; zeros left out."""
+    condition = "".join([" AND kind = :kind" if kind else "", " AND item_id = :item_id" if item_id is not None else ""])
+    return connection.execute(text(
+        f"SELECT kind, item_id, sum(quantity) FROM ("
+        f"SELECT kind, item_id, quantity FROM inventory_snapshot_item WHERE snapshot_id = :snapshot{condition} "
+        f"UNION ALL SELECT kind, item_id, delta FROM inventory_movement WHERE id > :after AND id <= :upto{condition}) "
+        f"GROUP BY kind, item_id HAVING sum(quantity) != 0 ORDER BY kind, item_id"
+    ), {"snapshot": snapshot_id, "after": after, "upto": upto, "kind": kind, "item_id": item_id}).all()
+
+
+def as_of(connection: Connection, ts: float, kind: Optional[str] = None, item_id: Optional[int] = None) -> dict:
+    """Balances at Unix time ``ts``; raises ``LookupError`` when ``ts`` is before the baseline."""
+    snapshot = connection.execute(text(
+        "SELECT id, taken_at, last_movement_id FROM inventory_snapshot WHERE taken_at <= :ts "
+        "ORDER BY taken_at DESC, id DESC LIMIT 1"
+    ), {"ts": ts}).first()
+    if snapshot is None:
+        first = connection.execute(text(
+            "SELECT taken_at FROM inventory_snapshot WHERE baseline ORDER BY taken_at LIMIT 1"
+        )).scalar()
+        if first is not None:
+            raise LookupError(first)
+    after = snapshot.last_movement_id if snapshot else 0
+    # Movement ids grow with time, so the tail is an id range ending at the last movement recorded by ts.
+    upto = connection.execute(text(
+        "SELECT id FROM inventory_movement WHERE created_at <= :ts ORDER BY created_at DESC, id DESC LIMIT 1"
+    ), {"ts": ts}).scalar() or 0
+    upto = max(upto, after)
+    rows = balances(connection, snapshot.id if snapshot else None, after, upto, kind, item_id)
+    return {
+        "ts": ts,
+        "snapshot_id": snapshot.id if snapshot else None,
+        "snapshot_taken_at": snapshot.taken_at if snapshot else None,
+        "tail_movements": upto - after,
+        "products": [{"id": item, "quantity": quantity} for k, item, quantity in rows if k == "product"],
+        "materials": [{"id": item, "quantity": quantity} for k, item, quantity in rows if k == "material"],
+    }
+
+
+def compact(engine: Engine, min_tail: int = 1) -> Optional[int]:
+    """Fold the movements since the latest snapshot into a new one if there are at least ``min_tail``.
+
+    Returns the new snapshot's id, or None when the tail was too short.
+    """
+    with engine.connect() as connection:
+        latest = connection.execute(text(
+            "SELECT id, last_movement_id FROM inventory_snapshot ORDER BY taken_at DESC, id DESC LIMIT 1"
+        )).first()
+        after = latest.last_movement_id if latest else 0
+        head = connection.execute(text(
+            "SELECT id, created_at FROM inventory_movement ORDER BY id DESC LIMIT 1"
+        )).first()
+        if head is None or head.id - after < max(min_tail, 1):
+            return None
+        rows = balances(connection, latest.id if latest else None, after, head.id)
+
+    with engine.begin() as connection:
+        if connection.dialect.name == "sqlite":
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+        # Another compaction may have got there first.
+        if connection.execute(text("SELECT 1 FROM inventory_snapshot WHERE last_movement_id >= :id"),
+                              {"id": head.id}).first():
+            return None
+        snapshot_id = connection.execute(insert(InventorySnapshot).values(
+            taken_at=head.created_at, last_movement_id=head.id, baseline=False
+        )).inserted_primary_key[0]
+        if rows:
+            connection.execute(insert(InventorySnapshotItem), [
+                {"snapshot_id": snapshot_id, "kind": kind, "item_id": item, "quantity": quantity}
+                for kind, item, quantity in rows
+            ])
+    logger.info("inventory snapshot %s: %s items after movement %s", snapshot_id, len(rows), head.id)
+    return snapshot_id
+
+
+async def compact_periodically(engine: Engine, interval: float, min_tail: int) -> None:
+    while True:
+        await anyio.sleep(interval)
+        try:
+            await anyio.to_thread.run_sync(compact, engine, min_tail)
+        except Exception:
+            logger.exception("inventory ledger compaction failed")
+
+
+def unix_time(ts: Optional[datetime]) -> float:
+    if ts is None:
+        return datetime.now(timezone.utc).timestamp()
+    # Timestamps without an offset are UTC, like the ones the ledger returns.
+    return (ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)).timestamp()
+
+
+def check_item(kind: Optional[str], item_id: Optional[int]) -> None:
+    if item_id is not None and kind is None:
+        raise HTTPException(status_code=422, detail="item_id needs kind")
+
+
+@router.get("/inventory/as-of", response_model=schemas.InventoryAsOf,
+            dependencies=[Depends(conditional_get(*LEDGER_SOURCES, cache_control=VOLATILE))])
+def read_inventory_as_of(response: Response,
+                         ts: Optional[datetime] = Query(None, description="Defaults to now; UTC without an offset"),
+                         kind: Optional[Literal["product", "material"]] = None, item_id: Optional[int] = None,
+                         db: Session = Depends(get_read_db)):
+    check_item(kind, item_id)
+    try:
+        result = as_of(db.connection(), unix_time(ts), kind, item_id)
+    except LookupError as exc:
+        first = datetime.fromtimestamp(exc.args[0], timezone.utc)
+        raise HTTPException(status_code=404, detail=f"No inventory history before {first.isoformat()}")
+    model_adapter = adapter(schemas.InventoryAsOf)
+    return encode(model_adapter.dump_json(model_adapter.validate_python(result)), response)
+
+
+@router.get("/inventory/movements", response_model=List[schemas.InventoryMovement],
+            dependencies=[Depends(conditional_get(*LEDGER_SOURCES, cache_control=VOLATILE))])
+def read_inventory_movements(response: Response, kind: Optional[Literal["product", "material"]] = None,
+                             item_id: Optional[int] = None,
+                             after: int = Query(0, description="Only movements with a larger id"),
+                             limit: int = Query(1000, ge=1, le=MAX_LIMIT), db: Session = Depends(get_read_db)):
+    check_item(kind, item_id)
+    condition = "".join([" AND kind = :kind" if kind else "", " AND item_id = :item_id" if item_id is not None else ""])
+    rows = db.execute(text(
+        f"SELECT id, kind, item_id, delta, reason, order_id, created_at FROM inventory_movement "
+        f"WHERE id > :after{condition} ORDER BY id LIMIT :limit"
+    ), {"after": after, "limit": limit, "kind": kind, "item_id": item_id}).all()
+    return json_list(schemas.InventoryMovement, rows, response)
+
+
+def main():
+    from database import build_engine, settings
+
+    parser = argparse.ArgumentParser(description="Maintain the inventory ledger snapshots.")
+    parser.add_argument("command", choices=["compact"])
+    parser.add_argument("--min-tail", type=int, default=1)
+    parser.add_argument("--url", default=settings.database_url)
+    args = parser.parse_args()
+
+    engine = build_engine(settings.model_copy(update={"database_url": args.url}))
+    snapshot_id = compact(engine, args.min_tail)
+    print(f"wrote snapshot {snapshot_id}" if snapshot_id else "tail too short, no snapshot written")
+
+
+if __name__ == "__main__":
+    main()
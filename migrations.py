@@ -0,0 +1,358 @@
+"""Versioned, in-place schema migrations for an existing SQLite database.
+
+The applied version is stored in ``PRAGMA user_version``. Every migration runs in
+its own transaction and only uses statements that SQLite can apply to a live
+database (CREATE INDEX, CREATE TABLE, ...), so readers keep working in WAL mode.
+
+    python migrations.py status
+    python migrations.py upgrade
+    python migrations.py check      # which index each endpoint query uses
+"""
+import argparse
+import re
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import DateTime, literal, select
+from sqlalchemy.engine import Connection, Engine
+
+Migration = namedtuple("Migration", ["version", "name", "upgrade"])
+
+MIGRATIONS = []
+
+
+class MigrationError(Exception):
+    pass
+
+
+def migration(version, name):
+    def register(func):
+        if any(m.version == version for m in MIGRATIONS):
+            raise MigrationError(f"Duplicate migration version {version}")
+        MIGRATIONS.append(Migration(version, name, func))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return func
+    return register
+
+
+def head_version() -> int:
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+def current_version(connection: Connection) -> int:
+    return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def _set_version(connection: Connection, version: int) -> None:
+    connection.exec_driver_sql(f"PRAGMA user_version = {int(version)}")
+
+
+def pending(connection: Connection):
+    version = current_version(connection)
+    return [m for m in MIGRATIONS if m.version > version]
+
+
+def upgrade(engine: Engine, target=None) -> list:
+    """Apply every pending migration up to ``target`` and return the applied ones."""
+    applied = []
+    with engine.connect() as connection:
+        todo = pending(connection)
+    for m in todo:
+        if target is not None and m.version > target:
+            break
+        with engine.begin() as connection:
+            # pysqlite only opens transactions for DML; take the write lock up front so
+            # DDL and data fixes of one migration commit or roll back together.
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+            m.upgrade(connection)
+            _set_version(connection, m.version)
+        applied.append(m)
+    return applied
+
+
+def stamp(engine: Engine, version=None) -> None:
+    """Mark a database created from the current models as up to date."""
+    with engine.begin() as connection:
+        _set_version(connection, head_version() if version is None else version)
+
+
+def _merge_duplicates(connection: Connection, table: str, keys) -> int:
+    """Fold rows sharing the same natural key into the oldest row, summing quantities."""
+    key_match = " AND ".join(f"d.{key} = {table}.{key}" for key in keys)
+    not_null = " AND ".join(f"{key} IS NOT NULL" for key in keys)
+    group_by = ", ".join(keys)
+    connection.exec_driver_sql(
+        f"UPDATE {table} SET quantity = (SELECT SUM(d.quantity) FROM {table} AS d WHERE {key_match}) "
+        f"WHERE id IN (SELECT MIN(id) FROM {table} WHERE {not_null} GROUP BY {group_by} HAVING COUNT(*) > 1)"
+    )
+    result = connection.exec_driver_sql(
+        f"DELETE FROM {table} WHERE {not_null} "
+        f"AND id NOT IN (SELECT MIN(id) FROM {table} WHERE {not_null} GROUP BY {group_by})"
+    )
+    return result.rowcount
+
+
+@migration(1, "foreign key, natural key and list endpoint indexes")
+def _add_indexes(connection: Connection) -> None:
+    for table, keys in (
+        ("plant_product", ("plant_id", "product_id")),
+        ("plant_material", ("plant_id", "material_id")),
+        ("product_material", ("product_id", "material_id")),
+        ("order_product", ("order_id", "product_id")),
+    ):
+        _merge_duplicates(connection, table, keys)
+        name = f"uq_{table}_{'_'.join(keys)}"
+        connection.exec_driver_sql(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(keys)})"
+        )
+
+    for name, table, columns in (
+        ("ix_plant_product_product_id", "plant_product", "product_id"),
+        ("ix_plant_material_material_id", "plant_material", "material_id"),
+        ("ix_product_material_material_id", "product_material", "material_id"),
+        ("ix_product_material_product_id_covering", "product_material", "product_id, material_id, quantity"),
+        ("ix_order_product_product_id", "order_product", "product_id"),
+        ("ix_order_product_order_id_covering", "order_product", "order_id, product_id, quantity"),
+        ("ix_storage_product_product_id", "storage_product", "product_id"),
+        ("ix_storage_material_material_id", "storage_material", "material_id"),
+        ("ix_order_order_date", '"order"', "order_date"),
+        ("ix_order_status_order_date", '"order"', "status, order_date"),
+        ("ix_order_customer_name", '"order"', "customer_name"),
+        ("ix_product_category", "product", "category"),
+    ):
+        connection.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+    connection.exec_driver_sql("ANALYZE")
+
+
+@migration(2, "unique natural keys for storage rows")
+def _unique_storage_keys(connection: Connection) -> None:
+    for table, key in (("storage_product", "product_id"), ("storage_material", "material_id")):
+        _merge_duplicates(connection, table, (key,))
+        connection.exec_driver_sql(f"CREATE UNIQUE INDEX IF NOT EXISTS uq_{table}_{key} ON {table} ({key})")
+        # The unique index serves every lookup the plain one did.
+        connection.exec_driver_sql(f"DROP INDEX IF EXISTS ix_{table}_{key}")
+
+
+# Columns (besides the id) and ON DELETE actions of the tables rebuilt by migration 3.
+_DELETE_ACTIONS = {
+    "plant_product": ("plant_id INTEGER, product_id INTEGER, quantity INTEGER",
+                      {"plant_id": ("plant", "CASCADE"), "product_id": ("product", "CASCADE")}),
+    "plant_material": ("plant_id INTEGER, material_id INTEGER, quantity INTEGER",
+                       {"plant_id": ("plant", "CASCADE"), "material_id": ("material", "CASCADE")}),
+    "product_material": ("product_id INTEGER, material_id INTEGER, quantity INTEGER NOT NULL",
+                         {"product_id": ("product", "CASCADE"), "material_id": ("material", "CASCADE")}),
+    "order_product": ("order_id INTEGER, product_id INTEGER, quantity INTEGER NOT NULL",
+                      {"order_id": ("order", "CASCADE"), "product_id": ("product", "SET NULL")}),
+    "storage_product": ("product_id INTEGER, quantity INTEGER NOT NULL",
+                        {"product_id": ("product", "CASCADE")}),
+    "storage_material": ("material_id INTEGER, quantity INTEGER NOT NULL",
+                         {"material_id": ("material", "CASCADE")}),
+}
+
+
+def _delete_actions(connection: Connection, table: str) -> dict:
+    rows = connection.exec_driver_sql(f"PRAGMA foreign_key_list({table})").fetchall()
+    return {row[3]: row[6] for row in rows}
+
+
+@migration(3, "ON DELETE CASCADE / SET NULL foreign keys")
+def _cascading_foreign_keys(connection: Connection) -> None:
+    # SQLite can't alter a foreign key, so each child table is rebuilt; nothing
+    # references these tables, which keeps the rebuild a plain copy-and-rename.
+    for table, (columns, actions) in _DELETE_ACTIONS.items():
+        if _delete_actions(connection, table) == {column: action for column, (_, action) in actions.items()}:
+            continue
+
+        # Rows the ORM used to leave behind with a NULL or dangling parent id.
+        for column, (parent, action) in actions.items():
+            dangling = f'{column} NOT IN (SELECT id FROM "{parent}")'
+            if action == "CASCADE":
+                connection.exec_driver_sql(f"DELETE FROM {table} WHERE {column} IS NULL OR {dangling}")
+            else:
+                connection.exec_driver_sql(f"UPDATE {table} SET {column} = NULL WHERE {dangling}")
+
+        indexes = connection.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,)
+        ).scalars().all()
+        foreign_keys = ", ".join(
+            f'FOREIGN KEY({column}) REFERENCES "{parent}" (id) ON DELETE {action}'
+            for column, (parent, action) in actions.items()
+        )
+        connection.exec_driver_sql(
+            f"CREATE TABLE {table}__new (id INTEGER NOT NULL, {columns}, PRIMARY KEY (id), {foreign_keys})"
+        )
+        names = ", ".join(["id"] + [column.split()[0] for column in columns.split(", ")])
+        connection.exec_driver_sql(f"INSERT INTO {table}__new ({names}) SELECT {names} FROM {table}")
+        connection.exec_driver_sql(f"DROP TABLE {table}")
+        connection.exec_driver_sql(f"ALTER TABLE {table}__new RENAME TO {table}")
+        for sql in indexes:
+            connection.exec_driver_sql(sql)
+
+    problems = connection.exec_driver_sql("PRAGMA foreign_key_check").fetchall()
+    if problems:
+        raise MigrationError(f"Foreign key violations after rebuild: {problems[:5]}")
+
+
+@migration(4, "change_version counters maintained by triggers")
+def _change_version_triggers(connection: Connection) -> None:
+    from database import VERSIONED_TABLES, change_version_triggers
+
+    connection.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS change_version (table_name VARCHAR NOT NULL, version INTEGER NOT NULL, "
+        "PRIMARY KEY (table_name))"
+    )
+    for table in VERSIONED_TABLES:
+        for statement in change_version_triggers(table.name):
+            connection.exec_driver_sql(statement)
+
+
+@migration(5, "full-text search index")
+def _search_index(connection: Connection) -> None:
+    import search
+
+    search.create_schema(connection)
+    search.rebuild(connection)
+
+
+@migration(6, "MRP run tables")
+def _mrp_tables(connection: Connection) -> None:
+    from database import MrpRun, MrpRunLine
+
+    for table in (MrpRun.__table__, MrpRunLine.__table__):
+        table.create(connection, checkfirst=True)
+
+
+@migration(7, "available-to-promise table")
+def _atp_table(connection: Connection) -> None:
+    import atp
+
+    atp.create_schema(connection)
+    atp.rebuild(connection)
+
+
+@migration(8, "order consumption records")
+def _order_consumption(connection: Connection) -> None:
+    from consumption import CONSUMING_STATUSES
+    from database import Order, OrderConsumption
+
+    OrderConsumption.__table__.create(connection, checkfirst=True)
+    # Orders completed or shipped before consumption existed must not take stock on their next edit.
+    connection.execute(
+        OrderConsumption.__table__.insert().from_select(
+            ["order_id", "status", "consumed_at"],
+            select(Order.id, Order.status, literal(datetime.now(), DateTime))
+            .where(Order.status.in_(CONSUMING_STATUSES)),
+        ).prefix_with("OR IGNORE")
+    )
+
+
+@migration(9, "inventory totals per product and material")
+def _inventory_totals(connection: Connection) -> None:
+    import inventory
+
+    inventory.create_schema(connection)
+    inventory.rebuild(connection)
+
+
+@migration(10, "inventory movement ledger")
+def _inventory_ledger(connection: Connection) -> None:
+    import ledger
+
+    ledger.create_schema(connection)
+    ledger.take_baseline(connection)
+
+
+def endpoint_queries():
+    """The statements each endpoint issues, with representative parameters."""
+    from database import Plant, Product, Material, Order, PlantProduct, PlantMaterial
+    from database import StorageProduct, StorageMaterial, ProductMaterial, OrderProduct
+
+    queries = {
+        "read_plants": select(Plant).limit(100),
+        "read_plant": select(Plant).where(Plant.id == 1),
+        "read_products": select(Product).limit(100),
+        "read_product": select(Product).where(Product.id == 1),
+        "read_materials": select(Material).limit(100),
+        "read_material": select(Material).where(Material.id == 1),
+        "read_orders": select(Order).limit(100),
+        "read_order": select(Order).where(Order.id == 1),
+        "read_plant_products": select(PlantProduct).limit(100),
+        "read_plant_materials": select(PlantMaterial).limit(100),
+        "read_product_materials": select(ProductMaterial).limit(100),
+        "read_order_products": select(OrderProduct).limit(100),
+        "read_storage_products": select(StorageProduct).limit(100),
+        "read_storage_materials": select(StorageMaterial).limit(100),
+    }
+    # ON DELETE actions and relationship loads find children by their foreign key.
+    for model, column in (
+        (PlantProduct, PlantProduct.plant_id), (PlantProduct, PlantProduct.product_id),
+        (PlantMaterial, PlantMaterial.plant_id), (PlantMaterial, PlantMaterial.material_id),
+        (ProductMaterial, ProductMaterial.product_id), (ProductMaterial, ProductMaterial.material_id),
+        (OrderProduct, OrderProduct.order_id), (OrderProduct, OrderProduct.product_id),
+        (StorageProduct, StorageProduct.product_id), (StorageMaterial, StorageMaterial.material_id),
+    ):
+        queries[f"relationship {column}"] = select(model).where(column == 1)
+    # List filters (filters.py) are only allowed on columns that lead an index.
+    from resources import RESOURCES
+
+    samples = {int: 1, str: "x", datetime: datetime(2024, 1, 1)}
+    for resource in RESOURCES:
+        for name in resource.filters:
+            column = resource.table.c[name]
+            queries[f"filter {resource.table.name}.{name}"] = (
+                select(resource.model).where(column == samples[column.type.python_type]).limit(100)
+            )
+    return queries
+
+
+_INDEX_RE = re.compile(r"USING (?:COVERING )?INDEX (\w+)|USING (INTEGER PRIMARY KEY)")
+
+
+def explain(connection: Connection, statement) -> list:
+    compiled = statement.compile(dialect=connection.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled), params).fetchall()
+    return [row[3] for row in rows]
+
+
+def index_report(engine: Engine) -> list:
+    """Return (query, index or None, plan) for every endpoint query."""
+    report = []
+    with engine.connect() as connection:
+        for name, statement in endpoint_queries().items():
+            plan = explain(connection, statement)
+            index = None
+            for detail in plan:
+                match = _INDEX_RE.search(detail)
+                if match:
+                    index = match.group(1) or match.group(2)
+                    break
+            report.append((name, index, plan))
+    return report
+
+
+def main():
+    from database import build_engine, settings
+
+    parser = argparse.ArgumentParser(description="Apply and inspect schema migrations.")
+    parser.add_argument("command", choices=["status", "upgrade", "check"])
+    parser.add_argument("--url", default=settings.database_url)
+    parser.add_argument("--target", type=int)
+    args = parser.parse_args()
+
+    engine = build_engine(settings.model_copy(update={"database_url": args.url}))
+    if args.command == "upgrade":
+        for m in upgrade(engine, args.target):
+            print(f"applied {m.version}: {m.name}")
+    if args.command in ("status", "upgrade"):
+        with engine.connect() as connection:
+            print(f"database version {current_version(connection)}, head {head_version()}")
+            for m in pending(connection):
+                print(f"pending {m.version}: {m.name}")
+    if args.command == "check":
+        for name, index, plan in index_report(engine):
+            print(f"{name:<45} {index or 'TABLE SCAN':<45} {' | '.join(plan)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Material requirements planning: ``POST /planning/mrp-runs``.
+
+A run takes every order whose status is in ``OPEN_STATUSES`` and computes, per
+material and per plant, how much is required, how much is on hand and what is
+short:
+
+1. Product demand is the sum of the open order lines per product, netted
+   against finished stock in ``storage_product``.
+2. Each product is made at its primary plant, the ``plant_product`` row with
+   the largest quantity; products no plant makes only count towards the totals.
+3. The net product demand is pushed through the recipes (``product_material``)
+   into a requirement per (plant, material), netted against that plant's
+   ``plant_material`` stock.
+4. Whatever the plants can't cover is netted against the central
+   ``storage_material`` stock, giving the shortage per material.
+
+All inputs are read with a handful of set-based queries (the order lines are
+summed per product in SQL, since no output is per order) in one deferred
+transaction on their own connection, which in WAL mode doesn't hold up writers.
+The explosion runs on NumPy arrays indexed by id, with no transaction open: the
+recipe matrix is kept sparse as (product, material, quantity) triples, and the
+matrix-vector product is a ``bincount`` over them. Only storing the run takes
+the write lock. Runs and their lines are stored in ``mrp_run`` and
+``mrp_run_line`` (migration 6) and can be read back with
+``GET /planning/mrp-runs/{id}``.
+"""
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+import schemas
+from database import MrpRun, MrpRunLine, get_db, get_read_db
+
+router = APIRouter()
+
+OPEN_STATUSES = ("Pending", "New")
+
+# Integer arrays of rows: demand (product, quantity, lines), product_stock (product, quantity),
+# recipes (product, material, quantity), plant_products (plant, product, quantity),
+# plant_stock (plant, material, quantity), material_stock (material, quantity).
+Inputs = namedtuple("Inputs", [
+    "orders", "demand", "product_stock", "recipes", "plant_products", "plant_stock", "material_stock",
+])
+
+_STATUSES = ", ".join(f"'{value}'" for value in OPEN_STATUSES)
+
+INPUT_QUERIES = {
+    "demand": "SELECT op.product_id, SUM(op.quantity), COUNT(*) FROM \"order\" AS o "
+              "JOIN order_product AS op ON op.order_id = o.id "
+              f"WHERE o.status IN ({_STATUSES}) AND op.product_id IS NOT NULL GROUP BY op.product_id",
+    "product_stock": "SELECT product_id, quantity FROM storage_product WHERE product_id IS NOT NULL",
+    "recipes": "SELECT product_id, material_id, quantity FROM product_material "
+               "WHERE product_id IS NOT NULL AND material_id IS NOT NULL",
+    "plant_products": "SELECT plant_id, product_id, COALESCE(quantity, 0) FROM plant_product "
+                      "WHERE plant_id IS NOT NULL AND product_id IS NOT NULL",
+    "plant_stock": "SELECT plant_id, material_id, COALESCE(quantity, 0) FROM plant_material "
+                   "WHERE plant_id IS NOT NULL AND material_id IS NOT NULL",
+    "material_stock": "SELECT material_id, quantity FROM storage_material WHERE material_id IS NOT NULL",
+}
+COLUMNS = {"demand": 3, "product_stock": 2, "recipes": 3, "plant_products": 3, "plant_stock": 3, "material_stock": 2}
+
+
+def load_inputs(connection) -> Inputs:
+    # Imported here so starting the app doesn't pay for NumPy.
+    import numpy as np
+
+    orders = connection.exec_driver_sql(f'SELECT COUNT(*) FROM "order" WHERE status IN ({_STATUSES})').scalar()
+    # Plain tuples: NumPy probes Row objects for the array protocol one key lookup at a time.
+    arrays = {
+        name: np.array([tuple(row) for row in connection.exec_driver_sql(sql)], dtype=np.int64)
+        .reshape(-1, COLUMNS[name])
+        for name, sql in INPUT_QUERIES.items()
+    }
+    return Inputs(orders=orders, **arrays)
+
+
+def compute(inputs: Inputs):
+    """Explode and net the demand; returns ``(totals, plants)`` as int64 arrays of
+    ``(material_id, required, on_hand, shortage)`` and ``(plant_id, material_id, required, on_hand, shortage)``.
+    """
+    import numpy as np
+
+    recipes = inputs.recipes
+    size = 1 + max((int(a[:, column].max()) for a, column in (
+        (inputs.demand, 0), (inputs.product_stock, 0), (recipes, 0), (inputs.plant_products, 1),
+    ) if len(a)), default=0)
+    net = np.zeros(size, dtype=np.int64)
+    net[inputs.demand[:, 0]] = inputs.demand[:, 1]
+    net[inputs.product_stock[:, 0]] -= inputs.product_stock[:, 1]
+    np.maximum(net, 0, out=net)
+
+    # Primary plant per product: sort by product, then largest quantity, then lowest plant id.
+    plant_products = inputs.plant_products
+    plant_products = plant_products[np.lexsort((plant_products[:, 0], -plant_products[:, 2], plant_products[:, 1]))]
+    first = np.ones(len(plant_products), dtype=bool)
+    first[1:] = plant_products[1:, 1] != plant_products[:-1, 1]
+    plant_of = np.full(size, -1, dtype=np.int64)
+    plant_of[plant_products[first, 1]] = plant_products[first, 0]
+
+    need = net[recipes[:, 0]] * recipes[:, 2]
+    used = need > 0
+    plants, materials, need = plant_of[recipes[used, 0]], recipes[used, 1], need[used]
+
+    # Sum the recipe entries per (plant, material); the key packs both ids into one integer.
+    width = 1 + int(max(materials.max(initial=0), inputs.plant_stock[:, 1].max(initial=0)))
+    keys, inverse = np.unique((plants + 1) * width + materials, return_inverse=True)
+    required = np.bincount(inverse, weights=need, minlength=len(keys)).astype(np.int64)
+    key_plants, key_materials = keys // width - 1, keys % width
+
+    stock_keys = (inputs.plant_stock[:, 0] + 1) * width + inputs.plant_stock[:, 1]
+    order = np.argsort(stock_keys)
+    stock_keys, stock = stock_keys[order], inputs.plant_stock[order, 2]
+    plant_on_hand = np.zeros(len(keys), dtype=np.int64)
+    if len(stock_keys):
+        position = np.minimum(np.searchsorted(stock_keys, keys), len(stock_keys) - 1)
+        plant_on_hand = np.where(stock_keys[position] == keys, stock[position], 0)
+    covered = np.minimum(required, plant_on_hand)
+
+    material_ids, per_material = np.unique(key_materials, return_inverse=True)
+    total_required = np.bincount(per_material, weights=required, minlength=len(material_ids)).astype(np.int64)
+    total_covered = np.bincount(per_material, weights=covered, minlength=len(material_ids)).astype(np.int64)
+    central = np.zeros(width, dtype=np.int64)
+    stocked = inputs.material_stock[inputs.material_stock[:, 0] < width]
+    central[stocked[:, 0]] = stocked[:, 1]
+    total_on_hand = total_covered + central[material_ids]
+    totals = np.column_stack([
+        material_ids, total_required, total_on_hand, np.maximum(total_required - total_on_hand, 0),
+    ])
+
+    at_plant = key_plants >= 0
+    plants = np.column_stack([
+        key_plants, key_materials, required, plant_on_hand, required - covered,
+    ])[at_plant]
+    return totals, plants
+
+
+def run_mrp(db: Session) -> MrpRun:
+    start = time.perf_counter()
+    created_at = datetime.now()
+    with db.get_bind().connect() as connection:
+        if connection.dialect.name == "sqlite":
+            # One snapshot for every input query; a deferred transaction doesn't hold up writers.
+            connection.exec_driver_sql("BEGIN")
+        inputs = load_inputs(connection)
+    totals, plants = compute(inputs)
+
+    # The write lock is only taken to store the run.
+    if db.connection().dialect.name == "sqlite":
+        db.connection().exec_driver_sql("BEGIN IMMEDIATE")
+    run = MrpRun(created_at=created_at, orders=inputs.orders, order_lines=int(inputs.demand[:, 2].sum()),
+                 duration_ms=0.0)
+    db.add(run)
+    db.flush()
+    rows = [
+        {"run_id": run.id, "plant_id": None, "material_id": m, "required": r, "on_hand": h, "shortage": s}
+        for m, r, h, s in totals.tolist()
+    ] + [
+        {"run_id": run.id, "plant_id": p, "material_id": m, "required": r, "on_hand": h, "shortage": s}
+        for p, m, r, h, s in plants.tolist()
+    ]
+    if rows:
+        db.execute(insert(MrpRunLine), rows)
+    run.duration_ms = round((time.perf_counter() - start) * 1000, 3)
+    db.commit()
+    return run
+
+
+def run_result(db: Session, run: MrpRun) -> schemas.MrpRun:
+    lines = db.execute(
+        select(MrpRunLine).where(MrpRunLine.run_id == run.id).order_by(MrpRunLine.plant_id, MrpRunLine.material_id)
+    ).scalars().all()
+    return schemas.MrpRun(
+        id=run.id, created_at=run.created_at, orders=run.orders, order_lines=run.order_lines,
+        duration_ms=run.duration_ms,
+        materials=[line for line in lines if line.plant_id is None],
+        plants=[line for line in lines if line.plant_id is not None],
+    )
+
+
+@router.post("/planning/mrp-runs", response_model=schemas.MrpRun, status_code=status.HTTP_201_CREATED)
+def create_mrp_run(db: Session = Depends(get_db)):
+    return run_result(db, run_mrp(db))
+
+
+@router.get("/planning/mrp-runs/{run_id}", response_model=schemas.MrpRun)
+def read_mrp_run(run_id: int, db: Session = Depends(get_read_db)):
+    run = db.get(MrpRun, run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="MRP run not found")
+    return run_result(db, run)
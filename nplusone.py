@@ -0,0 +1,78 @@
+"""Flag N+1 query patterns per request.
+
+An N+1 shows up as the same SQL statement run again and again with different
+parameters, typically one lazy load per row of a list. ``NPlusOneMiddleware``
+inspects the statements recorded by ``SQLStatsMiddleware`` before the response
+starts and, depending on ``DB_NPLUSONE``, logs them (``warn``) or fails the
+request (``raise``). In both modes it reports the query count in
+``X-Query-Count`` so tests can hold every endpoint to a budget.
+"""
+import json
+import logging
+from collections import defaultdict, namedtuple
+from typing import List
+
+from instrumentation import RequestSQLStats
+
+logger = logging.getLogger("sql.nplusone")
+
+MODES = ("off", "warn", "raise")
+
+Repeat = namedtuple("Repeat", ["statement", "count", "distinct_parameters"])
+
+
+class NPlusOneError(RuntimeError):
+    pass
+
+
+def detect(stats: RequestSQLStats, threshold: int = 3) -> List[Repeat]:
+    """Statements run at least ``threshold`` times with more than one set of parameters."""
+    parameters = defaultdict(list)
+    for record in stats.records:
+        parameters[record.statement].append(repr(record.parameters))
+    repeats = []
+    for statement, seen in parameters.items():
+        distinct = len(set(seen))
+        if len(seen) >= threshold and distinct > 1:
+            repeats.append(Repeat(statement, len(seen), distinct))
+    return repeats
+
+
+class NPlusOneMiddleware:
+    """Must run inside ``SQLStatsMiddleware``, i.e. be added before it."""
+
+    def __init__(self, app, settings):
+        self.app = app
+        self.settings = settings
+
+    async def __call__(self, scope, receive, send):
+        mode = self.settings.nplusone
+        if scope["type"] != "http" or mode == "off":
+            await self.app(scope, receive, send)
+            return
+        if mode not in MODES:
+            raise ValueError(f"Unknown N+1 detection mode: {mode!r}")
+
+        async def send_with_check(message):
+            if message["type"] == "http.response.start":
+                stats = scope["state"]["sql_stats"]
+                repeats = detect(stats, self.settings.nplusone_threshold)
+                for repeat in repeats:
+                    logger.warning(json.dumps({
+                        "event": "n_plus_one",
+                        "statement": repeat.statement,
+                        "count": repeat.count,
+                        "distinct_parameters": repeat.distinct_parameters,
+                        "endpoint": stats.endpoint,
+                        "method": scope.get("method"),
+                    }))
+                if repeats and mode == "raise":
+                    raise NPlusOneError(
+                        f"{stats.endpoint} ran {repeats[0].count}x: {repeats[0].statement}"
+                    )
+                headers = list(message.get("headers", []))
+                headers.append((b"x-query-count", str(stats.query_count).encode()))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        await self.app(scope, receive, send_with_check)
@@ -0,0 +1,81 @@
+from dataclasses import dataclass
+
+import schemas
+from conditional import CATALOG, VOLATILE
+from database import Plant, Product, Material, Order, PlantProduct, PlantMaterial
+from database import StorageProduct, StorageMaterial, ProductMaterial, OrderProduct
+
+
+@dataclass(frozen=True)
+class Resource:
+    path: str
+    model: type
+    create_schema: type
+    schema: type
+    singular: str
+    plural: str
+    label: str
+    # Partial body accepted by PATCH; resources without one have no PUT/PATCH routes.
+    update_schema: type = None
+    has_detail: bool = False
+    # Columns with a unique index that identify a row for upserts.
+    natural_key: tuple = ()
+    # Columns the list endpoint can be filtered by (see filters.py); each must lead an index.
+    filters: tuple = ()
+    # Schema of ``?include=`` compound documents (includes.py); None where the reads take no includes.
+    with_relations: type = None
+    # Cache-Control of the list and detail reads (see conditional.py).
+    cache_control: str = CATALOG
+
+    @property
+    def table(self):
+        return self.model.__table__
+
+    @property
+    def updatable(self) -> bool:
+        return self.update_schema is not None
+
+    @property
+    def id_param(self) -> str:
+        return f"{self.singular}_id"
+
+
+# One entry per table exposed by apis.py, in the order the routes are declared there.
+RESOURCES = [
+    Resource("/plants", Plant, schemas.PlantCreate, schemas.Plant,
+             "plant", "plants", "Plant", update_schema=schemas.PlantUpdate, has_detail=True,
+             with_relations=schemas.PlantWithRelations, filters=("name",)),
+    Resource("/products", Product, schemas.ProductCreate, schemas.Product,
+             "product", "products", "Product", update_schema=schemas.ProductUpdate, has_detail=True,
+             with_relations=schemas.ProductWithRelations, filters=("name", "category")),
+    Resource("/materials", Material, schemas.MaterialCreate, schemas.Material,
+             "material", "materials", "Material", update_schema=schemas.MaterialUpdate, has_detail=True,
+             with_relations=schemas.MaterialWithRelations, filters=("name",)),
+    Resource("/orders", Order, schemas.OrderCreate, schemas.Order,
+             "order", "orders", "Order", update_schema=schemas.OrderUpdate, has_detail=True,
+             with_relations=schemas.OrderWithRelations, filters=("status", "customer_name", "order_date"),
+             cache_control=VOLATILE),
+    Resource("/plant-products", PlantProduct, schemas.PlantProductCreate, schemas.PlantProduct,
+             "plant_product", "plant_products", "Plant-Product association",
+             natural_key=("plant_id", "product_id"), filters=("plant_id", "product_id")),
+    Resource("/plant-materials", PlantMaterial, schemas.PlantMaterialCreate, schemas.PlantMaterial,
+             "plant_material", "plant_materials", "Plant-Material association",
+             natural_key=("plant_id", "material_id"), filters=("plant_id", "material_id")),
+    Resource("/product-materials", ProductMaterial, schemas.ProductMaterialCreate, schemas.ProductMaterial,
+             "product_material", "product_materials", "Product-Material association",
+             natural_key=("product_id", "material_id"), filters=("product_id", "material_id")),
+    Resource("/order-products", OrderProduct, schemas.OrderProductCreate, schemas.OrderProduct,
+             "order_product", "order_products", "Order-Product association",
+             natural_key=("order_id", "product_id"), filters=("order_id", "product_id"), cache_control=VOLATILE),
+    Resource("/storage-products", StorageProduct, schemas.StorageProductCreate, schemas.StorageProduct,
+             "storage_product", "storage_products", "Storage Product",
+             update_schema=schemas.StorageProductUpdate, natural_key=("product_id",), filters=("product_id",),
+             cache_control=VOLATILE),
+    Resource("/storage-materials", StorageMaterial, schemas.StorageMaterialCreate, schemas.StorageMaterial,
+             "storage_material", "storage_materials", "Storage Material",
+             update_schema=schemas.StorageMaterialUpdate, natural_key=("material_id",), filters=("material_id",),
+             cache_control=VOLATILE),
+]
+
+BY_PATH = {resource.path.strip("/"): resource for resource in RESOURCES}
+BY_TABLE = {resource.table.name: resource for resource in RESOURCES}
@@ -1,29 +1,8 @@
-import os
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
-from sqlalchemy import Column, Integer, DECIMAL, String, ForeignKey, DateTime
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, List
 from datetime import datetime
 from decimal import Decimal
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATABASE_FILE = os.path.join(BASE_DIR, "project.db")
-DATABASE_URL = "sqlite:///" + DATABASE_FILE
-engine = create_engine(DATABASE_URL, echo=True)
-Base = declarative_base()
-
-
-try:
-    with engine.connect() as connection:
-        print("Database connected successfully!")
-except Exception as e:
-    print(f"Error connecting to database: {e}")
-
-Session = sessionmaker(bind=engine)
-session = Session()
-
 
 # Base models (for creating items - they don't have IDs yet)
 # class PlantBase(BaseModel):
@@ -200,8 +179,15 @@ class PlantCreate(PlantBase):
 
 class Plant(PlantBase):
     id: int
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+# Update bodies: every field may be left out. Columns that are NOT NULL, and the item a
+# storage row counts, are typed without Optional, so leaving them out keeps the stored
+# value but an explicit null fails with 422 (pydantic doesn't validate defaults).
+class PlantUpdate(BaseModel):
+    name: str = None
+    location: Optional[str] = None
+    capacity: Optional[int] = None
 
 
 class ProductBase(BaseModel):
@@ -215,8 +201,13 @@ class ProductCreate(ProductBase):
 
 class Product(ProductBase):
     id: int
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+class ProductUpdate(BaseModel):
+    name: str = None
+    description: Optional[str] = None
+    category: Optional[str] = None
+    price: Optional[float] = None
 
 
 class MaterialBase(BaseModel):
@@ -230,8 +221,13 @@ class MaterialCreate(MaterialBase):
 
 class Material(MaterialBase):
     id: int
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+class MaterialUpdate(BaseModel):
+    name: str = None
+    description: Optional[str] = None
+    unit: Optional[str] = None
+    cost: Optional[float] = None
 
 
 class OrderBase(BaseModel):
@@ -244,5 +240,242 @@ class OrderCreate(OrderBase):
 
 class Order(OrderBase):
     id: int
-    class Config:
-        orm_mode = True
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class OrderUpdate(BaseModel):
+    order_date: datetime = None
+    status: str = None
+    customer_name: Optional[str] = None
+
+class PlantProductCreate(BaseModel):
+    plant_id: int
+    product_id: int
+    quantity: Optional[int] = None
+
+class PlantProduct(PlantProductCreate):
+    id: int
+    model_config = ConfigDict(from_attributes=True)
+
+
+class PlantMaterialCreate(BaseModel):
+    plant_id: int
+    material_id: int
+    quantity: Optional[int] = None
+
+class PlantMaterial(PlantMaterialCreate):
+    id: int
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ProductMaterialCreate(BaseModel):
+    product_id: int
+    material_id: int
+    quantity: int
+
+class ProductMaterial(ProductMaterialCreate):
+    id: int
+    model_config = ConfigDict(from_attributes=True)
+
+
+class OrderProductCreate(BaseModel):
+    order_id: int
+    product_id: int
+    quantity: int
+
+class OrderProduct(OrderProductCreate):
+    id: int
+    # Deleting a product keeps its order lines (ON DELETE SET NULL).
+    product_id: Optional[int]
+    model_config = ConfigDict(from_attributes=True)
+
+
+class StorageProductCreate(BaseModel):
+    product_id: int
+    quantity: int
+
+class StorageProduct(StorageProductCreate):
+    id: int
+    model_config = ConfigDict(from_attributes=True)
+
+class StorageProductUpdate(BaseModel):
+    product_id: int = None
+    quantity: int = None
+
+
+class StorageMaterialCreate(BaseModel):
+    material_id: int
+    quantity: int
+
+class StorageMaterial(StorageMaterialCreate):
+    id: int
+    model_config = ConfigDict(from_attributes=True)
+
+class StorageMaterialUpdate(BaseModel):
+    material_id: int = None
+    quantity: int = None
+
+
+# Responses with ?include= (see includes.py): relationships appear only when included.
+class PlantWithRelations(Plant):
+    plant_product: Optional[List["PlantProductWithRelations"]] = None
+    plant_material: Optional[List["PlantMaterialWithRelations"]] = None
+
+class ProductWithRelations(Product):
+    plant_product: Optional[List["PlantProductWithRelations"]] = None
+    product_material: Optional[List["ProductMaterialWithRelations"]] = None
+    storage_product: Optional[List["StorageProductWithRelations"]] = None
+    order_product: Optional[List["OrderProductWithRelations"]] = None
+
+class MaterialWithRelations(Material):
+    plant_material: Optional[List["PlantMaterialWithRelations"]] = None
+    product_material: Optional[List["ProductMaterialWithRelations"]] = None
+    storage_material: Optional[List["StorageMaterialWithRelations"]] = None
+
+class OrderWithRelations(Order):
+    order_product: Optional[List["OrderProductWithRelations"]] = None
+
+class PlantProductWithRelations(PlantProduct):
+    plant: Optional[PlantWithRelations] = None
+    product: Optional[ProductWithRelations] = None
+
+class PlantMaterialWithRelations(PlantMaterial):
+    plant: Optional[PlantWithRelations] = None
+    material: Optional[MaterialWithRelations] = None
+
+class ProductMaterialWithRelations(ProductMaterial):
+    product: Optional[ProductWithRelations] = None
+    material: Optional[MaterialWithRelations] = None
+
+class OrderProductWithRelations(OrderProduct):
+    order: Optional[OrderWithRelations] = None
+    product: Optional[ProductWithRelations] = None
+
+class StorageProductWithRelations(StorageProduct):
+    product: Optional[ProductWithRelations] = None
+
+class StorageMaterialWithRelations(StorageMaterial):
+    material: Optional[MaterialWithRelations] = None
+
+for _model in (PlantWithRelations, ProductWithRelations, MaterialWithRelations, OrderWithRelations):
+    _model.model_rebuild()
+
+
+class BulkItemError(BaseModel):
+    index: int
+    errors: List[dict]
+
+class BulkCreated(BaseModel):
+    index: int
+    id: int
+
+class BulkResult(BaseModel):
+    created: List[BulkCreated] = []
+    errors: List[BulkItemError] = []
+
+class BulkDeleted(BaseModel):
+    deleted: List[int] = []
+
+
+class MaterialRequirement(BaseModel):
+    material_id: int
+    name: str
+    unit: Optional[str] = None
+    required: int
+    on_hand: int
+    shortage: int
+
+class OrderMaterials(BaseModel):
+    order_ids: List[int]
+    materials: List[MaterialRequirement]
+
+class OrderMaterialsRequest(BaseModel):
+    order_ids: List[int] = Field(..., min_length=1, max_length=1000)
+
+
+class OrderTransition(BaseModel):
+    order_ids: List[int] = Field(..., min_length=1, max_length=10_000)
+    status: str
+
+class OrderTransitionResult(BaseModel):
+    updated: List[int]
+    consumed: List[int]
+    missing: List[int]
+
+
+class ProductAtp(BaseModel):
+    product_id: int
+    name: str
+    on_hand: int
+    buildable: int
+    atp: int
+
+
+class ProductInventory(BaseModel):
+    product_id: int
+    quantity: int
+    row_count: int
+
+class MaterialInventory(BaseModel):
+    material_id: int
+    quantity: int
+    row_count: int
+
+class InventoryDrift(BaseModel):
+    id: int
+    expected_quantity: int
+    expected_rows: int
+    stored_quantity: int
+    stored_rows: int
+
+class InventoryVerification(BaseModel):
+    repaired: bool
+    products: List[InventoryDrift]
+    materials: List[InventoryDrift]
+
+
+class ItemBalance(BaseModel):
+    id: int
+    quantity: int
+
+class InventoryAsOf(BaseModel):
+    ts: datetime
+    snapshot_id: Optional[int] = None
+    snapshot_taken_at: Optional[datetime] = None
+    tail_movements: int
+    products: List[ItemBalance]
+    materials: List[ItemBalance]
+
+class InventoryMovement(BaseModel):
+    id: int
+    kind: str
+    item_id: int
+    delta: int
+    reason: str
+    order_id: Optional[int] = None
+    created_at: datetime
+
+
+class MrpRunLine(BaseModel):
+    plant_id: Optional[int] = None
+    material_id: int
+    required: int
+    on_hand: int
+    shortage: int
+    model_config = ConfigDict(from_attributes=True)
+
+class MrpRun(BaseModel):
+    id: int
+    created_at: datetime
+    orders: int
+    order_lines: int
+    duration_ms: float
+    materials: List[MrpRunLine]
+    plants: List[MrpRunLine]
+
+
+class SearchHit(BaseModel):
+    entity: str
+    id: int
+    name: str
+    snippet: str
+    score: float
@@ -0,0 +1,150 @@
+"""Full-text search over plant, product and material names and descriptions.
+
+``GET /search?q=herbal te&entity=product`` matches against one FTS5 table,
+``search_fts``, that triggers keep in step with ``plant`` (name, location),
+``product`` and ``material`` (name, description). Rows are keyed by
+``id * 4 + code`` so every source row has a fixed rowid. Results are ordered by
+BM25 with names weighted above descriptions and come with a highlighted
+snippet. Each word of ``q`` must match; ``word*`` matches a prefix, which the
+``prefix`` indexes answer directly for two and three letters.
+
+Scoring is per matching row, so a word found in a third of a million-row
+catalog takes hundreds of milliseconds to rank. Every match is ranked by
+default; callers that prefer latency over completeness can pass
+``max_ranked=N`` to score only the N newest matches (highest rowids, found
+through the index in a fraction of a millisecond), at the price of missing
+older rows that would have ranked higher. Selective queries rank all their
+matches either way.
+
+The table and triggers are created by migration 5, which also fills the index.
+``python search.py rebuild`` repopulates it for a database whose index was
+dropped or got out of step (e.g. rows written with triggers disabled).
+"""
+import argparse
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+import schemas
+from conditional import CATALOG, conditional_get
+from database import get_read_db
+
+router = APIRouter()
+
+# entity -> (rowid code, source table, column indexed as the description)
+SOURCES = {
+    "plant": (1, "plant", "location"),
+    "product": (2, "product", "description"),
+    "material": (3, "material", "description"),
+}
+ENTITIES = {code: entity for entity, (code, _, _) in SOURCES.items()}
+NAME_WEIGHT = 10.0
+MAX_LIMIT = 100
+
+
+def schema_statements() -> list:
+    statements = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5("
+        "name, description, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+        # ORDER BY rank uses this instead of scoring with a function call per row.
+        f"INSERT INTO search_fts (search_fts, rank) VALUES ('rank', 'bm25({NAME_WEIGHT}, 1.0)')",
+    ]
+    for code, table, description in SOURCES.values():
+        insert = (f"INSERT INTO search_fts (rowid, name, description) "
+                  f"VALUES (new.id * 4 + {code}, new.name, new.{description});")
+        delete = f"DELETE FROM search_fts WHERE rowid = old.id * 4 + {code};"
+        statements += [
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_search_insert AFTER INSERT ON {table} BEGIN {insert} END",
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_search_update "
+            f"AFTER UPDATE OF id, name, {description} ON {table} BEGIN {delete} {insert} END",
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_search_delete AFTER DELETE ON {table} BEGIN {delete} END",
+        ]
+    return statements
+
+
+def create_schema(connection: Connection) -> None:
+    for statement in schema_statements():
+        connection.exec_driver_sql(statement)
+
+
+def rebuild(connection: Connection) -> int:
+    """Refill ``search_fts`` from the source tables; returns the number of indexed rows."""
+    connection.exec_driver_sql("DELETE FROM search_fts")
+    for code, table, description in SOURCES.values():
+        connection.exec_driver_sql(
+            f"INSERT INTO search_fts (rowid, name, description) "
+            f"SELECT id * 4 + {code}, name, {description} FROM {table}"
+        )
+    # Merge the segments written above into one b-tree per term.
+    connection.exec_driver_sql("INSERT INTO search_fts (search_fts) VALUES ('optimize')")
+    return connection.exec_driver_sql("SELECT count(*) FROM search_fts").scalar()
+
+
+def match_expression(q: str) -> str:
+    """Quote every word so user input can't use (or break) the FTS5 query syntax."""
+    terms = []
+    for word in q.split():
+        stem = word.rstrip("*")
+        if stem:
+            terms.append('"' + stem.replace('"', '""') + '"' + ("*" if stem != word else ""))
+    if not terms:
+        raise HTTPException(status_code=400, detail="q must contain at least one word")
+    return " ".join(terms)
+
+
+@router.get("/search", response_model=List[schemas.SearchHit],
+            dependencies=[Depends(conditional_get("plant", "product", "material", cache_control=CATALOG))])
+def search(q: str = Query(..., min_length=1, max_length=200),
+           entity: Optional[str] = Query(None, description="Comma separated: plant, product, material"),
+           limit: int = Query(20, ge=1, le=MAX_LIMIT),
+           max_ranked: Optional[int] = Query(None, ge=1, description="Only rank the newest N matches"),
+           db: Session = Depends(get_read_db)):
+    where = "search_fts MATCH :match"
+    if entity:
+        codes = []
+        for name in entity.split(","):
+            if name.strip() not in SOURCES:
+                raise HTTPException(status_code=400, detail=f"Unknown entity {name!r}; use {sorted(SOURCES)}")
+            codes.append(SOURCES[name.strip()][0])
+        where += f" AND rowid % 4 IN ({', '.join(str(code) for code in codes)})"
+    params = {"match": match_expression(q), "limit": limit}
+    ranked = where
+    if max_ranked is not None:
+        # FTS5 evaluates rowid bounds in the index, so this caps the rows bm25 has to score.
+        ranked += (f" AND rowid >= coalesce((SELECT rowid FROM search_fts WHERE {where} "
+                   f"ORDER BY rowid DESC LIMIT 1 OFFSET :max_ranked - 1), 0)")
+        params["max_ranked"] = max_ranked
+    sql = (f"SELECT rowid, name, snippet(search_fts, -1, '<b>', '</b>', '…', 12) AS snippet, rank "
+           f"FROM search_fts WHERE {ranked} ORDER BY rank LIMIT :limit")
+    try:
+        rows = db.execute(text(sql), params).all()
+    except OperationalError as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid search: {exc.orig}")
+    return [
+        schemas.SearchHit(entity=ENTITIES[row.rowid % 4], id=row.rowid // 4, name=row.name,
+                          snippet=row.snippet, score=-row.rank)
+        for row in rows
+    ]
+
+
+def main():
+    from database import build_engine, settings
+
+    parser = argparse.ArgumentParser(description="Maintain the full-text search index.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--url", default=settings.database_url)
+    args = parser.parse_args()
+
+    engine = build_engine(settings.model_copy(update={"database_url": args.url}))
+    with engine.begin() as connection:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+        create_schema(connection)
+        print(f"indexed {rebuild(connection)} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Fast JSON path for the list endpoints.
+
+A handler that returns ORM objects for ``response_model=List[schemas.X]`` goes
+through three passes per row: FastAPI validates them into models, turns those
+into plain Python with ``jsonable_encoder`` and only then ``json.dumps`` the
+result. ``json_list`` instead takes plain column rows (no identity map, no
+instance state), validates them with a cached ``TypeAdapter`` and dumps the
+models straight to bytes in pydantic-core. The output is identical;
+``response_model`` stays on the route for the OpenAPI schema.
+"""
+from functools import lru_cache
+from typing import List
+
+from fastapi import Response
+from pydantic import TypeAdapter
+from sqlalchemy import inspect
+
+
+@lru_cache(maxsize=None)
+def adapter(schema) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+@lru_cache(maxsize=None)
+def list_adapter(schema) -> TypeAdapter:
+    return TypeAdapter(List[schema])
+
+
+@lru_cache(maxsize=None)
+def row_columns(model) -> tuple:
+    """The mapped columns of ``model``; querying these returns plain rows instead of tracked objects."""
+    return tuple(getattr(model, attr.key) for attr in inspect(model).column_attrs)
+
+
+def json_list(schema, rows, response: Response) -> Response:
+    """Encode ``row_columns`` rows as a JSON array of ``schema``, keeping the headers set on ``response``."""
+    rows_adapter = list_adapter(schema)
+    # Validating dicts is several times faster than reading Row attributes with from_attributes.
+    keys = rows[0]._fields if rows else ()
+    return encode(rows_adapter.dump_json(rows_adapter.validate_python([dict(zip(keys, row)) for row in rows])),
+                  response)
+
+
+def encode(body: bytes, response: Response) -> Response:
+    """Wrap an encoded JSON body, keeping the headers set on ``response``."""
+    encoded = Response(body, media_type="application/json")
+    # Returning a Response bypasses the dependency one, so carry over ETag, cursor and cookie headers.
+    encoded.raw_headers.extend(response.headers.raw)
+    return encoded
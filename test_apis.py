@@ -6,8 +6,8 @@ from datetime import datetime
 import os
 import json
 
-from apis import app
-from database import Base, get_db
+from apis import app, response_cache
+from database import Base, get_db, get_read_db
 from database import Plant, Product, Material, Order, PlantProduct, ProductMaterial
 
 TEST_DB_URL = "sqlite:///./test.db"
@@ -22,6 +22,7 @@ def override_get_db():
         db.close()
 
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_db
 
 client = TestClient(app)
 
@@ -30,6 +31,8 @@ def setup_database():
     Base.metadata.create_all(bind=engine)
     yield
     Base.metadata.drop_all(bind=engine)
+    # drop_all doesn't go through a Session, so the table versions don't move.
+    response_cache.clear()
 
 def test_create_plant(setup_database):
     plant_data = {"name": "Test Plant", "location": "Test Location", "capacity": 100}
@@ -304,5 +307,40 @@ def test_full_order_flow(setup_database):
     assert order_data["status"] == "Completed"
     assert order_data["customer_name"] == "John Doe"
 
+def test_patch_updates_only_given_fields(setup_database):
+    plant_id = client.post("/plants/", json={"name": "Plant", "location": "North", "capacity": 10}).json()["id"]
+    response = client.patch(f"/plants/{plant_id}", json={"capacity": 25})
+    assert response.status_code == 200
+    assert response.json() == {"id": plant_id, "name": "Plant", "location": "North", "capacity": 25}
+    assert client.patch(f"/plants/{plant_id}", json={}).json()["capacity"] == 25
+    assert client.patch("/plants/999", json={"capacity": 1}).status_code == 404
+
+def test_patch_rejects_null_for_required_columns(setup_database):
+    plant_id = client.post("/plants/", json={"name": "Plant", "location": "North"}).json()["id"]
+    response = client.patch(f"/plants/{plant_id}", json={"name": None})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "name"]
+    # Nullable columns can still be cleared.
+    assert client.patch(f"/plants/{plant_id}", json={"location": None}).json()["location"] is None
+    order = {"order_date": "2024-01-01T00:00:00", "status": "New"}
+    order_id = client.post("/orders/", json=order).json()["id"]
+    assert client.patch(f"/orders/{order_id}", json={"status": None}).status_code == 422
+    assert client.patch(f"/orders/{order_id}", json={"order_date": None}).status_code == 422
+    # A storage row without its item would not serialize either.
+    storage_id = client.post("/storage-products/", json={"product_id": 1, "quantity": 5}).json()["id"]
+    assert client.patch(f"/storage-products/{storage_id}", json={"product_id": None}).status_code == 422
+    assert client.get("/storage-products/").status_code == 200
+    storage_id = client.post("/storage-materials/", json={"material_id": 1, "quantity": 5}).json()["id"]
+    assert client.patch(f"/storage-materials/{storage_id}", json={"material_id": None}).status_code == 422
+
+def test_duplicate_storage_row_conflicts(setup_database):
+    assert client.post("/storage-products/", json={"product_id": 1, "quantity": 5}).status_code == 201
+    response = client.post("/storage-products/", json={"product_id": 1, "quantity": 2})
+    assert response.status_code == 409
+
+    upsert_response = client.put("/storage-products/by-key?mode=add", json={"product_id": 1, "quantity": 2})
+    assert upsert_response.status_code == 200
+    assert upsert_response.json()["quantity"] == 7
+
 if __name__ == "__main__":
     pytest.main(["-vv"])
\ No newline at end of file
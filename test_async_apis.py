@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+import async_apis
+from config import Settings
+from database import Base, build_async_engine, get_async_db, get_async_read_db
+
+
+@pytest.fixture
+def client(tmp_path):
+    async_engine = build_async_engine(Settings(database_url=f"sqlite:///{tmp_path / 'async.db'}"))
+
+    async def create_tables():
+        async with async_engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create_tables())
+    AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(async_apis.router)
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_async_read_db] = override_get_async_db
+    with TestClient(app) as test_client:
+        yield test_client
+    asyncio.run(async_engine.dispose())
+
+
+def test_async_plant_crud(client):
+    response = client.post("/plants/", json={"name": "Async Plant", "location": "Here", "capacity": 10})
+    assert response.status_code == 201
+    plant_id = response.json()["id"]
+
+    assert client.get(f"/plants/{plant_id}").json()["name"] == "Async Plant"
+    response = client.put(f"/plants/{plant_id}", json={"name": "Renamed", "location": "There", "capacity": 20})
+    assert response.json()["capacity"] == 20
+    response = client.patch(f"/plants/{plant_id}", json={"location": "Elsewhere"})
+    assert response.json() == {"id": plant_id, "name": "Renamed", "location": "Elsewhere", "capacity": 20}
+    assert [plant["name"] for plant in client.get("/plants/").json()] == ["Renamed"]
+
+    assert client.delete(f"/plants/{plant_id}").status_code == 204
+    assert client.get(f"/plants/{plant_id}").status_code == 404
+
+
+def test_async_association_routes(client):
+    product_id = client.post("/products/", json={"name": "Tea"}).json()["id"]
+    order_id = client.post("/orders/", json={"order_date": "2024-01-01T00:00:00", "status": "New"}).json()["id"]
+
+    response = client.post("/order-products/", json={"order_id": order_id, "product_id": product_id, "quantity": 3})
+    assert response.status_code == 201
+    assert response.json()["quantity"] == 3
+    assert len(client.get("/order-products/").json()) == 1
+    assert client.delete(f"/order-products/{response.json()['id']}").status_code == 204
+    assert client.delete("/order-products/999").status_code == 404
+
+
+def test_async_order_updates_consume_stock(client):
+    product_id = client.post("/products/", json={"name": "Tea"}).json()["id"]
+    storage_id = client.post("/storage-products/", json={"product_id": product_id, "quantity": 3}).json()["id"]
+    order = {"order_date": "2024-01-01T00:00:00", "status": "Pending"}
+    first, second = (client.post("/orders/", json=order).json()["id"] for _ in range(2))
+    client.post("/order-products/", json={"order_id": first, "product_id": product_id, "quantity": 2})
+    client.post("/order-products/", json={"order_id": second, "product_id": product_id, "quantity": 5})
+
+    def on_hand():
+        return [row["quantity"] for row in client.get("/storage-products/").json() if row["id"] == storage_id]
+
+    assert client.patch(f"/orders/{first}", json={"status": "Completed"}).status_code == 200
+    assert on_hand() == [1]
+    response = client.put(f"/orders/{first}", json={**order, "status": "Shipped", "customer_name": "Renamed"})
+    assert response.json()["customer_name"] == "Renamed"
+    assert on_hand() == [1]
+    assert client.patch(f"/orders/{second}", json={"status": "Shipped"}).status_code == 409
+    assert client.get(f"/orders/{second}").json()["status"] == "Pending"
+
+
+def test_async_reads_send_etags_and_304(client):
+    client.post("/plants/", json={"name": "Plant"})
+    response = client.get("/plants/")
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"].startswith("public")
+    assert client.get("/plants/", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/plants/1", headers={"If-None-Match": etag}).status_code == 200
+
+    client.patch("/plants/1", json={"location": "There"})
+    assert client.get("/plants/", headers={"If-None-Match": etag}).status_code == 200
+    assert client.get("/orders/").headers["cache-control"] == "private, no-cache"
+
+
+def test_async_reads_render_includes(client):
+    product_id = client.post("/products/", json={"name": "Tea"}).json()["id"]
+    order_id = client.post("/orders/", json={"order_date": "2024-01-01T00:00:00", "status": "New"}).json()["id"]
+    client.post("/order-products/", json={"order_id": order_id, "product_id": product_id, "quantity": 3})
+
+    order = client.get(f"/orders/{order_id}?include=order_product.product").json()
+    assert order["order_product"][0]["product"]["name"] == "Tea"
+    orders = client.get("/orders/?include=order_product").json()
+    assert [line["quantity"] for line in orders[0]["order_product"]] == [3]
+    assert "order_product" not in client.get(f"/orders/{order_id}").json()
+    assert client.get("/orders/?include=nothing").status_code == 400
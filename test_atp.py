@@ -0,0 +1,86 @@
+import pytest
+
+import atp
+from database import Material, Product, ProductMaterial, StorageMaterial, StorageProduct
+from pagination import MAX_LIMIT, NEXT_CURSOR_HEADER
+
+
+def seed(db):
+    # Written before the table exists: migration 7 has to compute them.
+    db.add_all([Product(name="Herbal Tea"), Product(name="Soap"), Material(name="Leaves"), Material(name="Box")])
+    db.flush()
+    db.add_all([
+        # Tea: 3 leaves + 1 box; Soap has no recipe.
+        ProductMaterial(product_id=1, material_id=1, quantity=3),
+        ProductMaterial(product_id=1, material_id=2, quantity=1),
+        StorageMaterial(material_id=1, quantity=10),
+        StorageMaterial(material_id=2, quantity=5),
+        StorageProduct(product_id=1, quantity=2),
+        StorageProduct(product_id=2, quantity=7),
+    ])
+
+
+@pytest.fixture
+def client(make_client):
+    atp.atp_cache.clear()
+    return make_client(atp.router, seed=seed, run_migrations=True)
+
+
+def promise(client, product_id):
+    body = client.get(f"/products/{product_id}/atp").json()
+    return body["on_hand"], body["buildable"], body["atp"]
+
+
+def test_on_hand_plus_buildable(client):
+    assert client.get("/atp").json() == [
+        {"product_id": 1, "name": "Herbal Tea", "on_hand": 2, "buildable": 3, "atp": 5},
+        {"product_id": 2, "name": "Soap", "on_hand": 7, "buildable": 0, "atp": 7},
+    ]
+    assert client.get("/products/9/atp").status_code == 404
+
+
+def test_list_is_paged_with_cursors(client):
+    for _ in range(2):
+        # The second round is served from atp_cache and keeps the cursor.
+        first = client.get("/atp", params={"limit": 1})
+        assert [row["product_id"] for row in first.json()] == [1]
+        cursor = first.headers[NEXT_CURSOR_HEADER]
+    second = client.get("/atp", params={"limit": 1, "after": cursor})
+    assert [row["product_id"] for row in second.json()] == [2]
+    assert NEXT_CURSOR_HEADER not in second.headers
+    assert [row["name"] for row in client.get("/atp", params={"sort": "-name"}).json()] == ["Soap", "Herbal Tea"]
+    assert client.get("/atp", params={"limit": MAX_LIMIT + 1}).status_code == 422
+
+
+def test_triggers_follow_storage_and_recipe_writes(client):
+    assert client.get("/atp").json()[0]["atp"] == 5
+    with client.session() as db:
+        db.get(StorageMaterial, 1).quantity = 30
+        db.commit()
+    # Boxes are now the limit.
+    assert promise(client, 1) == (2, 5, 7)
+    assert client.get("/atp").json()[0]["atp"] == 7
+    with client.session() as db:
+        db.delete(db.get(ProductMaterial, 2))
+        db.add(ProductMaterial(product_id=2, material_id=2, quantity=2))
+        db.get(StorageProduct, 1).quantity = 0
+        db.commit()
+    assert promise(client, 1) == (0, 10, 10)
+    assert promise(client, 2) == (7, 2, 9)
+    with client.session() as db:
+        db.delete(db.get(StorageMaterial, 2))
+        db.add(Product(name="Candle"))
+        db.commit()
+    assert promise(client, 2) == (7, 0, 7)
+    assert promise(client, 3) == (0, 0, 0)
+
+
+def test_rebuild_matches_triggers(client):
+    with client.session() as db:
+        db.get(StorageMaterial, 2).quantity = 1
+        db.commit()
+        before = client.get("/atp").json()
+        assert atp.rebuild(db.connection()) == 2
+        db.commit()
+    atp.atp_cache.clear()
+    assert client.get("/atp").json() == before
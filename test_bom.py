@@ -0,0 +1,76 @@
+from datetime import datetime
+
+import pytest
+from starlette.middleware import Middleware
+
+import apis
+import bom
+from database import Material, Order, OrderProduct, Product, ProductMaterial, StorageMaterial
+from instrumentation import SQLStatsMiddleware
+
+
+def seed(db):
+    db.add_all([Product(name="Tea"), Product(name="Cup"), Material(name="Leaves", unit="g"),
+                Material(name="Clay", unit="kg"), Material(name="Box")])
+    db.add_all(Order(order_date=datetime(2024, 1, i), status="New") for i in range(1, 4))
+    db.flush()
+    db.add_all([
+        # Tea: 5 g leaves + 1 box; Cup: 2 kg clay + 1 box.
+        ProductMaterial(product_id=1, material_id=1, quantity=5),
+        ProductMaterial(product_id=1, material_id=3, quantity=1),
+        ProductMaterial(product_id=2, material_id=2, quantity=2),
+        ProductMaterial(product_id=2, material_id=3, quantity=1),
+        OrderProduct(order_id=1, product_id=1, quantity=3),
+        OrderProduct(order_id=1, product_id=2, quantity=1),
+        OrderProduct(order_id=2, product_id=2, quantity=4),
+        StorageMaterial(material_id=1, quantity=100),
+        StorageMaterial(material_id=3, quantity=2),
+    ])
+
+
+@pytest.fixture
+def client(make_client):
+    bom.requirements_cache.clear()
+    return make_client(bom.router, apis.router, middlewares=[Middleware(SQLStatsMiddleware)], seed=seed)
+
+
+def summary(response):
+    return [(m["name"], m["required"], m["on_hand"], m["shortage"]) for m in response.json()["materials"]]
+
+
+def queries(response) -> int:
+    return int(response.headers["server-timing"].split('desc="')[1].split()[0])
+
+
+def test_order_materials_with_stock_and_shortage(client):
+    response = client.get("/orders/1/materials")
+    assert response.status_code == 200
+    assert summary(response) == [("Leaves", 15, 100, 0), ("Clay", 2, 0, 2), ("Box", 4, 2, 2)]
+    assert response.json()["materials"][0]["unit"] == "g"
+
+
+def test_many_orders_are_summed(client):
+    response = client.post("/orders/materials", json={"order_ids": [1, 2, 1]})
+    assert response.json()["order_ids"] == [1, 2]
+    assert summary(response) == [("Leaves", 15, 100, 0), ("Clay", 10, 0, 10), ("Box", 8, 2, 6)]
+    assert client.post("/orders/materials", json={"order_ids": [1, 9]}).status_code == 404
+
+
+def test_cached_until_lines_recipes_or_stock_change(client):
+    first = client.get("/orders/1/materials")
+    again = client.get("/orders/1/materials")
+    # Only the change_version lookup: the explosion comes from the cache.
+    assert queries(again) == 1
+    assert summary(again) == summary(first)
+
+    client.patch("/storage-materials/2", json={"quantity": 4})
+    assert summary(client.get("/orders/1/materials"))[2] == ("Box", 4, 4, 0)
+    client.delete("/order-products/2")
+    assert [m[0] for m in summary(client.get("/orders/1/materials"))] == ["Leaves", "Box"]
+    client.post("/product-materials/", json={"product_id": 1, "material_id": 2, "quantity": 1})
+    assert summary(client.get("/orders/1/materials"))[1] == ("Clay", 3, 0, 3)
+
+
+def test_empty_and_missing_orders(client):
+    assert client.get("/orders/3/materials").json() == {"order_ids": [3], "materials": []}
+    assert client.get("/orders/99/materials").status_code == 404
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+from sqlalchemy import func, select
+
+import bulk
+from database import Plant
+
+
+@pytest.fixture
+def client(make_client, monkeypatch):
+    monkeypatch.setattr(bulk, "CHUNK_ROWS", 3)
+    client = make_client(bulk.router)
+    client.plant_count = lambda: client.session().execute(select(func.count()).select_from(Plant)).scalar()
+    return client
+
+
+def test_bulk_create_returns_ids_in_order(client):
+    plants = [{"name": f"Plant {i}", "capacity": i} for i in range(7)]
+    response = client.post("/plants/bulk", json=plants)
+    assert response.status_code == 201
+    body = response.json()
+    assert body["errors"] == []
+    assert [item["index"] for item in body["created"]] == list(range(7))
+    assert [item["id"] for item in body["created"]] == list(range(1, 8))
+    assert client.plant_count() == 7
+
+
+def test_bulk_create_reports_item_errors(client):
+    plants = [{"name": "A"}, {"capacity": 1}, {"name": "B"}, {"name": "A"}, {"name": "C"}]
+    response = client.post("/plants/bulk", json=plants)
+    assert response.status_code == 207
+    body = response.json()
+    assert [item["index"] for item in body["created"]] == [0, 2, 4]
+    errors = {error["index"]: error["errors"] for error in body["errors"]}
+    assert errors[1][0]["loc"] == ["name"]
+    assert errors[3][0]["type"] == "integrity_error"
+    assert client.plant_count() == 3
+
+
+def test_atomic_bulk_create_is_all_or_nothing(client):
+    plants = [{"name": "A"}, {"name": "B"}, {"name": "C"}, {"name": "A"}]
+    response = client.post("/plants/bulk", params={"atomic": True}, json=plants)
+    assert response.status_code == 422
+    assert response.json()["created"] == []
+    assert [error["index"] for error in response.json()["errors"]] == [3]
+    assert client.plant_count() == 0
+
+
+def test_bulk_create_from_ndjson(client):
+    body = "\n".join([json.dumps({"name": "A"}), "{not json", "", json.dumps({"name": "B"})])
+    response = client.post("/plants/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 207
+    assert [item["index"] for item in response.json()["created"]] == [0, 2]
+    assert response.json()["errors"][0]["index"] == 1
+
+
+def test_bulk_body_must_be_an_array(client):
+    assert client.post("/plants/bulk", json={"name": "A"}).status_code == 400
+
+
+def test_bulk_delete_returns_deleted_ids(client):
+    client.post("/plants/bulk", json=[{"name": f"Plant {i}"} for i in range(4)])
+    response = client.delete("/plants/", params={"ids": "1,3,99"})
+    assert response.status_code == 200
+    assert response.json() == {"deleted": [1, 3]}
+    assert client.plant_count() == 2
+    assert client.delete("/plants/", params={"ids": "1,x"}).status_code == 422
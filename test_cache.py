@@ -0,0 +1,80 @@
+import pytest
+from starlette.middleware import Middleware
+
+import apis
+import cache
+from bulk import router as bulk_router
+from cache import ResponseCache, ResponseCacheMiddleware
+
+
+@pytest.fixture
+def client(make_client):
+    response_cache = ResponseCache(max_entries=2, ttl=60.0)
+    client = make_client(bulk_router, apis.router, middlewares=[
+        Middleware(ResponseCacheMiddleware, cache=response_cache, resources=["plants", "products", "materials"]),
+    ])
+    client.cache = response_cache
+    return client
+
+
+def test_second_read_is_a_hit_until_a_write(client):
+    client.post("/plants/", json={"name": "A", "location": "X", "capacity": 1})
+    assert client.get("/plants/").headers["x-cache"] == "MISS"
+    hit = client.get("/plants/")
+    assert hit.headers["x-cache"] == "HIT"
+    assert [plant["name"] for plant in hit.json()] == ["A"]
+
+    client.patch("/plants/1", json={"name": "B"})
+    after_patch = client.get("/plants/")
+    assert after_patch.headers["x-cache"] == "MISS"
+    assert after_patch.json()[0]["name"] == "B"
+
+    client.delete("/plants/", params={"ids": "1"})
+    assert client.get("/plants/").json() == []
+    assert client.cache.stats()["hits"] == 1
+    assert client.cache.stats()["stale"] == 2
+
+
+def test_query_string_is_part_of_the_key_and_uncached_paths_pass_through(client):
+    client.post("/plants/", json={"name": "A", "location": "X", "capacity": 1})
+    client.get("/plants/", params={"limit": 1})
+    assert client.get("/plants/", params={"limit": 2}).headers["x-cache"] == "MISS"
+    assert "x-cache" not in client.get("/orders/").headers
+    assert client.get("/plants/999").status_code == 404
+    assert client.get("/plants/999").headers["x-cache"] == "MISS"
+
+
+def test_parent_delete_invalidates_cascaded_tables(client):
+    client.post("/plants/", json={"name": "A", "location": "X", "capacity": 1})
+    client.post("/products/", json={"name": "Tea", "price": 1})
+    client.post("/plant-products/", json={"plant_id": 1, "product_id": 1})
+    before = cache.table_version("plant_product")
+    client.delete("/plants/1")
+    assert "plant_product" in cache._cascade_targets("plant")
+    assert cache.table_version("plant_product") > before
+
+
+def test_lru_and_ttl_eviction(monkeypatch):
+    response_cache = ResponseCache(max_entries=2, ttl=10.0)
+    for key in ("a", "b", "c"):
+        response_cache.put(key, (), (200, [], key.encode()))
+    assert response_cache.get("a", ()) is None
+    assert response_cache.get("c", ()) == (200, [], b"c")
+
+    now = cache.time.monotonic()
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now + 11)
+    assert response_cache.get("c", ()) is None
+    stats = response_cache.stats()
+    assert (stats["evictions"], stats["hits"], stats["misses"], stats["stale"]) == (1, 1, 2, 1)
+
+
+def test_included_tables_invalidate_the_entry(client):
+    client.post("/plants/", json={"name": "A", "location": "X", "capacity": 1})
+    client.post("/products/", json={"name": "Tea", "price": 1})
+    params = {"include": "plant_product"}
+    client.get("/plants/", params=params)
+    assert client.get("/plants/", params=params).headers["x-cache"] == "HIT"
+    client.post("/plant-products/", json={"plant_id": 1, "product_id": 1})
+    refreshed = client.get("/plants/", params=params)
+    assert refreshed.headers["x-cache"] == "MISS"
+    assert refreshed.json()[0]["plant_product"][0]["product_id"] == 1
@@ -0,0 +1,77 @@
+import pytest
+from starlette.middleware import Middleware
+
+import apis
+from cache import ResponseCache, ResponseCacheMiddleware
+from conditional import etag_matches
+from instrumentation import SQLStatsMiddleware
+
+
+@pytest.fixture
+def response_cache():
+    return None
+
+
+@pytest.fixture
+def client(make_client, response_cache):
+    middlewares = [Middleware(SQLStatsMiddleware)]
+    if response_cache is not None:
+        middlewares.insert(0, Middleware(ResponseCacheMiddleware, cache=response_cache, resources=["plants"]))
+    client = make_client(apis.router, middlewares=middlewares)
+    client.post("/plants/", json={"name": "A", "location": "X", "capacity": 1})
+    client.post("/orders/", json={"order_date": "2024-01-01T00:00:00", "status": "New"})
+    return client
+
+
+def queries(response) -> int:
+    return int(response.headers["server-timing"].split('desc="')[1].split()[0])
+
+
+def test_matching_if_none_match_returns_304_without_the_list_query(client):
+    first = client.get("/orders/")
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    again = client.get("/orders/", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+    assert queries(again) == 1
+
+    client.patch("/orders/1", json={"status": "Shipped"})
+    changed = client.get("/orders/", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_etag_depends_on_url_and_table(client):
+    plants = client.get("/plants/")
+    assert plants.headers["cache-control"].startswith("public, max-age=")
+    assert plants.headers["etag"] != client.get("/plants/", params={"limit": 1}).headers["etag"]
+    assert plants.headers["etag"] != client.get("/plants/1").headers["etag"]
+
+    # Writes to another table leave the plant ETags alone.
+    client.post("/orders/", json={"order_date": "2024-01-02T00:00:00", "status": "New"})
+    assert client.get("/plants/", headers={"If-None-Match": plants.headers["etag"]}).status_code == 304
+
+
+def test_cascaded_delete_changes_child_etag(client):
+    client.post("/products/", json={"name": "Tea", "price": 1})
+    client.post("/plant-products/", json={"plant_id": 1, "product_id": 1})
+    etag = client.get("/plant-products/").headers["etag"]
+    client.delete("/plants/1")
+    assert client.get("/plant-products/", headers={"If-None-Match": etag}).status_code == 200
+
+
+@pytest.mark.parametrize("response_cache", [ResponseCache()])
+def test_response_cache_hits_honour_if_none_match(client):
+    etag = client.get("/plants/").headers["etag"]
+    hit = client.get("/plants/", headers={"If-None-Match": f'W/{etag}, "other"'})
+    assert hit.status_code == 304
+    assert hit.headers["x-cache"] == "HIT"
+
+
+def test_etag_matches():
+    assert etag_matches('"a", "b"', '"b"')
+    assert etag_matches("*", '"b"')
+    assert not etag_matches("", '"b"')
@@ -0,0 +1,99 @@
+from datetime import datetime
+
+import pytest
+
+import apis
+import consumption
+from database import Material, Order, OrderConsumption, OrderProduct, Product, ProductMaterial, StorageMaterial
+from database import StorageProduct, init_db
+
+
+def seed(db):
+    db.add_all([Product(name="Tea"), Product(name="Gift card"), Material(name="Leaves"), Material(name="Box")])
+    db.add_all(Order(order_date=datetime(2024, 1, i), status="Pending") for i in range(1, 5))
+    db.flush()
+    db.add_all([
+        # Tea: 2 leaves + 1 box; gift cards have no recipe.
+        ProductMaterial(product_id=1, material_id=1, quantity=2),
+        ProductMaterial(product_id=1, material_id=2, quantity=1),
+        StorageProduct(product_id=1, quantity=3),
+        StorageProduct(product_id=2, quantity=1),
+        StorageMaterial(material_id=1, quantity=20),
+        StorageMaterial(material_id=2, quantity=10),
+        OrderProduct(order_id=1, product_id=1, quantity=5),
+        OrderProduct(order_id=2, product_id=1, quantity=2),
+        OrderProduct(order_id=2, product_id=2, quantity=1),
+        OrderProduct(order_id=3, product_id=2, quantity=1),
+    ])
+
+
+@pytest.fixture
+def client(make_client):
+    return make_client(consumption.router, apis.router, seed=seed)
+
+
+def stock(client):
+    with client.session() as db:
+        return ([row.quantity for row in db.query(StorageProduct).order_by(StorageProduct.id)],
+                [row.quantity for row in db.query(StorageMaterial).order_by(StorageMaterial.id)])
+
+
+def test_completing_an_order_uses_goods_then_materials_once(client):
+    response = client.patch("/orders/1", json={"status": "Completed"})
+    assert response.json()["status"] == "Completed"
+    # 3 teas from stock, 2 built from 4 leaves and 2 boxes.
+    assert stock(client) == ([0, 1], [16, 8])
+    client.patch("/orders/1", json={"status": "Shipped"})
+    client.put("/orders/1", json={"order_date": "2024-01-01T00:00:00", "status": "Shipped"})
+    assert stock(client) == ([0, 1], [16, 8])
+    client.patch("/orders/4", json={"status": "Pending"})
+    assert client.patch("/orders/99", json={"status": "Completed"}).status_code == 404
+
+
+def test_insufficient_stock_rejects_without_writing(client):
+    client.patch("/orders/3", json={"status": "Completed"})
+    response = client.patch("/orders/2", json={"status": "Completed"})
+    assert response.status_code == 409
+    assert response.json()["detail"]["products"] == [{"product_id": 2, "required": 1, "available": 0}]
+    assert stock(client) == ([3, 0], [20, 10])
+    assert client.get("/orders/2").json()["status"] == "Pending"
+    with client.session() as db:
+        assert [row.order_id for row in db.query(OrderConsumption)] == [3]
+
+
+def test_bulk_transition_consumes_in_one_batch(client):
+    response = client.post("/orders/transitions", json={"order_ids": [1, 2, 4, 99], "status": "Shipped"})
+    assert response.json() == {"updated": [1, 2, 4], "consumed": [1, 2, 4], "missing": [99]}
+    # 7 teas: 3 from stock, 4 built; the gift card from stock.
+    assert stock(client) == ([0, 0], [12, 6])
+    again = client.post("/orders/transitions", json={"order_ids": [1, 2], "status": "Completed"})
+    assert again.json()["consumed"] == []
+    assert stock(client) == ([0, 0], [12, 6])
+    short = client.post("/orders/transitions", json={"order_ids": [3], "status": "Shipped"})
+    assert short.status_code == 409
+    assert client.get("/orders/3").json()["status"] == "Pending"
+
+
+def test_orders_already_completed_or_shipped_are_not_consumed_again(client):
+    with client.session() as db:
+        # Shipped before consumption existed; migration 8 records it as consumed.
+        db.add(Order(order_date=datetime(2023, 12, 1), status="Shipped", customer_name="Old"))
+        db.flush()
+        db.add(OrderProduct(order_id=5, product_id=2, quantity=5))
+        db.commit()
+    init_db(client.engine)
+    with client.session() as db:
+        assert [row.order_id for row in db.query(OrderConsumption)] == [5]
+        # Created as Completed through POST /orders/, so never recorded.
+        db.add(Order(order_date=datetime(2024, 2, 1), status="Completed"))
+        db.flush()
+        db.add(OrderProduct(order_id=6, product_id=2, quantity=5))
+        db.commit()
+
+    renamed = client.put("/orders/5", json={"order_date": "2023-12-01T00:00:00", "status": "Shipped",
+                                            "customer_name": "New"})
+    assert renamed.status_code == 200
+    assert renamed.json()["customer_name"] == "New"
+    assert client.patch("/orders/5", json={"status": "Shipped"}).status_code == 200
+    assert client.patch("/orders/6", json={"status": "Shipped"}).status_code == 200
+    assert stock(client) == ([3, 1], [20, 10])
@@ -0,0 +1,120 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+from fastapi import Request, Response
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+import migrations
+from config import Settings
+from database import LAST_WRITE_COOKIE, LAST_WRITE_HEADER, build_engine, build_read_engine, init_db, wrote_recently
+
+
+def test_throughput_profile_pragmas(tmp_path):
+    engine = build_engine(Settings(database_url=f"sqlite:///{tmp_path / 'pragmas.db'}"))
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1
+        assert connection.execute(text("PRAGMA foreign_keys")).scalar() == 1
+        assert connection.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+    assert engine.pool.size() == 40
+    engine.dispose()
+
+
+def test_strict_profile_overrides(tmp_path):
+    settings = Settings(database_url=f"sqlite:///{tmp_path / 'strict.db'}", profile="strict", busy_timeout=250)
+    engine = build_engine(settings)
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 2
+        assert connection.execute(text("PRAGMA busy_timeout")).scalar() == 250
+    engine.dispose()
+
+
+def test_unknown_profile():
+    with pytest.raises(ValueError):
+        Settings(profile="fast").pragmas
+
+
+def test_read_engine_is_read_only(tmp_path):
+    settings = Settings(database_url=f"sqlite:///{tmp_path / 'routing.db'}")
+    writer = build_engine(settings)
+    with writer.begin() as connection:
+        connection.execute(text("CREATE TABLE t (x INTEGER)"))
+        connection.execute(text("INSERT INTO t VALUES (1)"))
+
+    reader = build_read_engine(settings)
+    with reader.connect() as connection:
+        assert connection.execute(text("PRAGMA query_only")).scalar() == 1
+        assert connection.execute(text("SELECT x FROM t")).scalar() == 1
+        with pytest.raises(OperationalError):
+            connection.execute(text("INSERT INTO t VALUES (2)"))
+    reader.dispose()
+    writer.dispose()
+
+
+def test_commit_marks_client_for_read_your_writes(tmp_path):
+    engine = build_engine(Settings(database_url=f"sqlite:///{tmp_path / 'ryw.db'}"))
+    response = Response()
+    db = sessionmaker(bind=engine)(info={"response": response})
+    db.commit()
+    db.close()
+    assert LAST_WRITE_COOKIE in response.headers["set-cookie"]
+
+    request = Request({"type": "http", "headers": [(LAST_WRITE_HEADER.lower().encode(), response.headers[LAST_WRITE_HEADER].encode())]})
+    assert wrote_recently(request)
+    assert not wrote_recently(Request({"type": "http", "headers": []}))
+    for stamp in (str(time.time() + 3600), "inf", "nan", "-inf", "soon"):
+        assert not wrote_recently(Request({"type": "http", "headers": [(LAST_WRITE_HEADER.lower().encode(), stamp.encode())]}))
+    engine.dispose()
+
+
+def test_import_has_no_side_effects(tmp_path):
+    db_file = tmp_path / "untouched.db"
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_file}")
+    result = subprocess.run(
+        [sys.executable, "-c", "import apis, schemas, database"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env, capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == ""
+    assert not db_file.exists()
+
+
+def test_import_leaves_optional_features_unloaded():
+    modules = ["numpy", "aiosqlite", "async_apis", "sqlalchemy.ext.asyncio"]
+    result = subprocess.run(
+        [sys.executable, "-c", f"import sys, apis; print([m for m in {modules!r} if m in sys.modules])"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=dict(os.environ, DB_ASYNC="0"),
+        capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[]"
+
+
+def test_init_db_creates_schema_and_migrates(tmp_path):
+    engine = build_engine(Settings(database_url=f"sqlite:///{tmp_path / 'init.db'}"))
+    init_db(engine)
+    with engine.connect() as connection:
+        assert migrations.current_version(connection) == migrations.head_version()
+        assert connection.execute(text("SELECT COUNT(*) FROM plant")).scalar() == 0
+    engine.dispose()
+
+
+def test_deletes_cascade_in_the_database(tmp_path):
+    engine = build_engine(Settings(database_url=f"sqlite:///{tmp_path / 'cascade.db'}"))
+    init_db(engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO product (id, name) VALUES (1, 'Tea')")
+        connection.exec_driver_sql("INSERT INTO \"order\" (id, order_date, status) VALUES (1, '2024-01-01', 'New')")
+        connection.exec_driver_sql("INSERT INTO storage_product (product_id, quantity) VALUES (1, 5)")
+        connection.exec_driver_sql("INSERT INTO order_product (order_id, product_id, quantity) VALUES (1, 1, 2)")
+        connection.exec_driver_sql("DELETE FROM product WHERE id = 1")
+        assert connection.execute(text("SELECT COUNT(*) FROM storage_product")).scalar() == 0
+        assert connection.execute(text("SELECT order_id, product_id FROM order_product")).fetchall() == [(1, None)]
+        connection.exec_driver_sql("DELETE FROM \"order\" WHERE id = 1")
+        assert connection.execute(text("SELECT COUNT(*) FROM order_product")).scalar() == 0
+    engine.dispose()
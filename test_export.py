@@ -0,0 +1,60 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import export
+from database import Base, Order, OrderProduct, Product, get_read_engine
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "BATCH_ROWS", 7)
+    engine = create_engine(f"sqlite:///{tmp_path / 'export.db'}")
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine)() as db:
+        db.add(Order(order_date=datetime(2024, 3, 1, 12, 30), status="New", customer_name="ACME"))
+        db.add_all(Product(name=f"Product {i}", price=i) for i in range(20))
+        db.add_all(OrderProduct(order_id=1, product_id=i, quantity=i) for i in range(1, 21))
+        db.commit()
+
+    app = FastAPI()
+    app.include_router(export.router)
+    app.dependency_overrides[get_read_engine] = lambda: engine
+    yield TestClient(app)
+    engine.dispose()
+
+
+def test_ndjson_export(client):
+    response = client.get("/export/order_product")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == list(range(1, 21))
+    assert rows[0] == {"id": 1, "order_id": 1, "product_id": 1, "quantity": 1}
+
+    order, = [json.loads(line) for line in client.get("/export/order").text.splitlines()]
+    assert order["order_date"] == "2024-03-01T12:30:00"
+
+
+def test_csv_export_with_gzip(client):
+    response = client.get("/export/product", params={"format": "csv", "gzip": True})
+    assert response.headers["content-encoding"] == "gzip"
+    # The client decodes transparently; check the raw bytes are gzip as well.
+    with client.stream("GET", "/export/product", params={"format": "csv", "gzip": True}) as raw:
+        assert gzip.decompress(b"".join(raw.iter_raw())) == response.content
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == ["id", "name", "description", "category", "price"]
+    assert len(rows) == 21
+
+
+def test_unknown_table_and_format(client):
+    assert client.get("/export/nope").status_code == 404
+    assert client.get("/export/product", params={"format": "xml"}).status_code == 422
@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import apis
+from database import Order, OrderProduct, Product
+from pagination import NEXT_CURSOR_HEADER
+
+
+def seed(db):
+    db.add_all([Product(name="Tea", category="Drinks"), Product(name="Cup", category="Ware")])
+    start = datetime(2024, 1, 1)
+    db.add_all(
+        Order(order_date=start + timedelta(days=i), status="Pending" if i % 2 else "New",
+              customer_name="Ann" if i < 6 else "Bob")
+        for i in range(10)
+    )
+    db.add_all(OrderProduct(order_id=order_id, product_id=1, quantity=1) for order_id in (1, 2))
+
+
+@pytest.fixture
+def client(make_client):
+    return make_client(apis.router, seed=seed)
+
+
+def test_filters_combine_with_sort_and_cursor(client):
+    params = {"status": "Pending", "customer_name": "Ann", "order_date[gte]": "2024-01-02", "sort": "-order_date",
+              "limit": 2}
+    first = client.get("/orders/", params=params)
+    assert first.status_code == 200
+    assert [order["id"] for order in first.json()] == [6, 4]
+
+    second = client.get("/orders/", params={**params, "after": first.headers[NEXT_CURSOR_HEADER]})
+    assert [order["id"] for order in second.json()] == [2]
+
+
+def test_in_and_range_operators(client):
+    assert [line["order_id"] for line in client.get("/order-products/", params={"order_id[in]": "2,3"}).json()] == [2]
+    dates = client.get("/orders/", params=[("order_date[gte]", "2024-01-03"), ("order_date[lt]", "2024-01-05")])
+    assert [order["id"] for order in dates.json()] == [3, 4]
+    assert [product["name"] for product in client.get("/products/", params={"category": "Ware"}).json()] == ["Cup"]
+
+
+@pytest.mark.parametrize("params, detail", [
+    ({"location": "X"}, "Cannot filter by 'location'"),
+    ({"status[like]": "N%"}, "Unknown filter operator"),
+    ({"order_date[gte]": "yesterday"}, "Invalid value"),
+])
+def test_rejects_unlisted_columns_operators_and_values(client, params, detail):
+    path = "/plants/" if "location" in params else "/orders/"
+    response = client.get(path, params=params)
+    assert response.status_code == 400
+    assert detail in response.json()["detail"]
+
+
+def test_unknown_parameters_are_ignored(client):
+    assert client.get("/orders/", params={"_": "123"}).status_code == 200
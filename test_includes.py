@@ -0,0 +1,78 @@
+from datetime import datetime
+
+import pytest
+from starlette.middleware import Middleware
+
+import apis
+from database import Material, Order, OrderProduct, Plant, PlantMaterial, PlantProduct, Product
+from instrumentation import SQLStatsMiddleware
+
+
+def seed(db):
+    db.add_all([Plant(name="North"), Material(name="Steel")])
+    db.add_all(Product(name=f"Product {i}") for i in range(1, 6))
+    db.add_all(Order(order_date=datetime(2024, 1, i), status="New") for i in range(1, 3))
+    db.flush()
+    db.add_all(OrderProduct(order_id=1, product_id=i, quantity=i) for i in range(1, 6))
+    db.add(OrderProduct(order_id=2, product_id=1, quantity=1))
+    db.add_all([PlantProduct(plant_id=1, product_id=2), PlantMaterial(plant_id=1, material_id=1)])
+
+
+@pytest.fixture
+def client(make_client):
+    return make_client(apis.router, middlewares=[Middleware(SQLStatsMiddleware)], seed=seed)
+
+
+def queries(response) -> int:
+    return int(response.headers["server-timing"].split('desc="')[1].split()[0])
+
+
+def test_order_with_lines_and_products_costs_a_fixed_number_of_queries(client):
+    many = client.get("/orders/1", params={"include": "order_product.product"})
+    assert many.status_code == 200
+    body = many.json()
+    assert [(line["product_id"], line["product"]["name"]) for line in body["order_product"]] == [
+        (i, f"Product {i}") for i in range(1, 6)
+    ]
+    assert "order" not in body["order_product"][0]
+    one = client.get("/orders/2", params={"include": "order_product.product"})
+    # ETag lookup, the order, its lines, their products.
+    assert queries(many) == queries(one) == 4
+
+
+def test_list_with_several_paths(client):
+    plants = client.get("/plants/", params={"include": "plant_product.product,plant_material.material"}).json()
+    assert plants[0]["plant_product"][0]["product"]["name"] == "Product 2"
+    assert plants[0]["plant_material"][0]["material"]["name"] == "Steel"
+    assert "plant_product" not in client.get("/plants/").json()[0]
+    assert "order_product" not in client.get("/orders/1").json()
+
+
+def test_included_tables_are_part_of_the_etag(client):
+    params = {"include": "order_product"}
+    first = client.get("/orders/1", params=params)
+    assert first.headers["cache-control"] == "private, no-cache"
+    client.patch("/products/1", json={"name": "Renamed"})
+    assert client.get("/orders/1", params=params, headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+    client.delete("/order-products/6")
+    assert client.get("/orders/1", params=params, headers={"If-None-Match": first.headers["etag"]}).status_code == 200
+
+
+@pytest.mark.parametrize("include, detail", [
+    ("order_product.nope", "OrderProduct has no relationship 'nope'"),
+    ("order_product.product.order_product.order", "deeper than 3 levels"),
+])
+def test_rejects_unknown_and_too_deep_includes(client, include, detail):
+    response = client.get("/orders/1", params={"include": include})
+    assert response.status_code == 400
+    assert detail in response.json()["detail"]
+
+
+def test_order_lines_outlive_their_product(client):
+    assert client.delete("/products/1").status_code == 204
+    lines = client.get("/order-products/")
+    assert lines.status_code == 200, lines.text
+    assert [line["product_id"] for line in lines.json() if line["order_id"] == 2] == [None]
+    order = client.get("/orders/2?include=order_product.product")
+    assert order.status_code == 200, order.text
+    assert [(line["product_id"], line["product"]) for line in order.json()["order_product"]] == [(None, None)]
@@ -0,0 +1,109 @@
+import json
+import logging
+
+from fastapi import Depends, FastAPI, Request
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+import apis
+import instrumentation
+from database import Base, Plant, get_db, get_read_db
+
+
+def make_app(tmp_path, slow_query_ms):
+    engine = create_engine(f"sqlite:///{tmp_path / 'stats.db'}")
+    instrumentation.install(engine, slow_query_ms)
+    Base.metadata.create_all(engine)
+    SessionLocal = sessionmaker(bind=engine)
+
+    def get_session():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.add_middleware(instrumentation.SQLStatsMiddleware)
+
+    @app.get("/plants-count")
+    def plants_count(request: Request, db=Depends(get_session)):
+        db.add_all([Plant(name="A"), Plant(name="B")])
+        db.commit()
+        names = [plant.name for plant in db.query(Plant).all()]
+        stats = request.state.sql_stats
+        return {"names": names, "queries": stats.query_count, "rows": stats.rows_loaded}
+
+    return app, engine
+
+
+def test_request_stats_and_server_timing(tmp_path):
+    app, engine = make_app(tmp_path, slow_query_ms=10_000)
+    response = TestClient(app).get("/plants-count")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["queries"] >= 2
+    assert body["rows"] == 2
+    assert response.headers["server-timing"].startswith("db;dur=")
+    assert f'"{body["queries"]} queries"' in response.headers["server-timing"]
+    engine.dispose()
+
+
+def test_slow_queries_are_logged_with_endpoint(tmp_path, caplog):
+    app, engine = make_app(tmp_path, slow_query_ms=0)
+    caplog.clear()
+    with caplog.at_level(logging.WARNING, logger="sql.slow"):
+        TestClient(app).get("/plants-count")
+    entries = [json.loads(record.getMessage()) for record in caplog.records if record.name == "sql.slow"]
+    assert entries
+    assert {entry["endpoint"] for entry in entries} == {"plants_count"}
+    assert all(entry["duration_ms"] >= 0 for entry in entries)
+    engine.dispose()
+
+
+def test_collect_stats_outside_requests(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'collect.db'}")
+    instrumentation.install(engine)
+    with instrumentation.collect_stats() as stats:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            connection.execute(text("SELECT 2"))
+    assert stats.query_count == 2
+    assert [record.statement for record in stats.records] == ["SELECT 1", "SELECT 2"]
+    engine.dispose()
+
+
+def test_rows_returned_by_core_list_endpoints(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'rows.db'}")
+    instrumentation.install(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO plant (name) VALUES ('A'), ('B'), ('C')")
+    SessionLocal = sessionmaker(bind=engine)
+
+    def get_session():
+        with SessionLocal() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(apis.router)
+    app.dependency_overrides[get_db] = get_session
+    app.dependency_overrides[get_read_db] = get_session
+    seen = []
+
+    @app.middleware("http")
+    async def keep_stats(request, call_next):
+        response = await call_next(request)
+        seen.append(request.state.sql_stats)
+        return response
+
+    app.add_middleware(instrumentation.SQLStatsMiddleware)
+    response = TestClient(app).get("/plants/")
+    assert len(response.json()) == 3
+    # json_list serializes Core rows: no ORM instance is loaded, but the rows are counted.
+    stats, = seen
+    assert stats.rows_loaded == 0
+    assert [record.rowcount for record in stats.records if "FROM plant" in record.statement] == [3]
+    assert stats.rows_returned >= 3
+    engine.dispose()
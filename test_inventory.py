@@ -0,0 +1,59 @@
+import pytest
+
+import inventory
+from database import Material, Product, StorageMaterial, StorageProduct
+
+
+def seed(db):
+    # Written before the totals exist: migration 9 has to add them up.
+    db.add_all([Product(name="Tea"), Product(name="Soap"), Material(name="Leaves")])
+    db.flush()
+    db.add_all([StorageProduct(product_id=1, quantity=4), StorageMaterial(material_id=1, quantity=9)])
+
+
+@pytest.fixture
+def client(make_client):
+    return make_client(inventory.router, seed=seed, run_migrations=True)
+
+
+def totals(client, name):
+    return [tuple(row.values()) for row in client.get(f"/inventory/{name}").json()]
+
+
+def test_triggers_apply_every_write(client):
+    assert totals(client, "products") == [(1, 4, 1)]
+    assert client.get("/inventory/materials/1").json() == {"material_id": 1, "quantity": 9, "row_count": 1}
+    with client.session() as db:
+        db.add(StorageProduct(product_id=2, quantity=3))
+        db.get(StorageProduct, 1).quantity = 10
+        db.get(StorageMaterial, 1).quantity = 2
+        db.commit()
+    assert totals(client, "products") == [(1, 10, 1), (2, 3, 1)]
+    assert totals(client, "materials") == [(1, 2, 1)]
+    with client.session() as db:
+        db.delete(db.get(StorageProduct, 2))
+        db.flush()
+        # Moving a row to another product takes it from the old total as well.
+        db.get(StorageProduct, 1).product_id = 2
+        db.commit()
+    assert totals(client, "products") == [(2, 10, 1)]
+    assert client.get("/inventory/products/1").status_code == 404
+    assert client.post("/inventory/verify").json() == {"repaired": False, "products": [], "materials": []}
+
+
+def test_verify_reports_and_repairs_drift(client):
+    etag = client.get("/inventory/products").headers["etag"]
+    with client.engine.begin() as connection:
+        connection.exec_driver_sql("UPDATE inventory_product_total SET quantity = 7")
+        connection.exec_driver_sql("INSERT INTO inventory_material_total VALUES (5, 1, 1)")
+    report = client.post("/inventory/verify").json()
+    assert report["products"] == [{"id": 1, "expected_quantity": 4, "expected_rows": 1,
+                                   "stored_quantity": 7, "stored_rows": 1}]
+    assert [row["id"] for row in report["materials"]] == [5]
+    assert totals(client, "products") == [(1, 7, 1)]
+
+    assert client.post("/inventory/verify", params={"repair": True}).json()["repaired"] is True
+    assert totals(client, "products") == [(1, 4, 1)]
+    assert totals(client, "materials") == [(1, 9, 1)]
+    assert client.get("/inventory/products", headers={"If-None-Match": etag}).status_code == 200
+    assert client.post("/inventory/verify").json()["products"] == []
@@ -0,0 +1,120 @@
+import time
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+import ledger
+from consumption import consume
+from database import Material, Order, OrderProduct, Product, ProductMaterial, StorageMaterial, StorageProduct
+
+
+def seed(db):
+    db.add_all([Product(name="Tea"), Product(name="Soap"), Material(name="Leaves")])
+    db.flush()
+    db.add_all([StorageProduct(product_id=1, quantity=4), StorageMaterial(material_id=1, quantity=9)])
+
+
+@pytest.fixture
+def client(make_client):
+    return make_client(ledger.router, seed=seed, run_migrations=True)
+
+
+def set_quantity(client, model, row_id, quantity):
+    with client.session() as db:
+        db.get(model, row_id).quantity = quantity
+        db.commit()
+    # Movements are stamped with millisecond resolution.
+    time.sleep(0.01)
+
+
+def now():
+    moment = datetime.now(timezone.utc)
+    time.sleep(0.01)
+    return moment.isoformat()
+
+
+def as_of(client, ts=None, **params):
+    response = client.get("/inventory/as-of", params={"ts": ts, **params} if ts else params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_every_storage_change_is_a_movement(client):
+    set_quantity(client, StorageProduct, 1, 10)
+    with client.session() as db:
+        db.get(StorageProduct, 1).product_id = 2
+        db.delete(db.get(StorageMaterial, 1))
+        db.commit()
+    movements = client.get("/inventory/movements").json()
+    assert [(m["kind"], m["item_id"], m["delta"], m["reason"]) for m in movements] == [
+        ("material", 1, 9, "adjustment"), ("product", 1, 4, "adjustment"), ("product", 1, 6, "adjustment"),
+        ("product", 1, -10, "adjustment"), ("product", 2, 10, "adjustment"), ("material", 1, -9, "adjustment"),
+    ]
+    assert [m["id"] for m in client.get("/inventory/movements?kind=product&item_id=1&after=2").json()] == [3, 4]
+    assert client.get("/inventory/movements?item_id=1").status_code == 422
+
+    with client.engine.begin() as connection:
+        with pytest.raises(IntegrityError):
+            connection.exec_driver_sql("UPDATE inventory_movement SET delta = 0")
+    with client.engine.begin() as connection:
+        with pytest.raises(IntegrityError):
+            connection.exec_driver_sql("DELETE FROM inventory_movement")
+
+
+def test_as_of_reads_snapshot_plus_tail(client):
+    before_baseline = datetime(2000, 1, 1, tzinfo=timezone.utc).isoformat()
+    assert client.get("/inventory/as-of", params={"ts": before_baseline}).status_code == 404
+
+    start = now()
+    set_quantity(client, StorageProduct, 1, 10)
+    after_first = now()
+    set_quantity(client, StorageProduct, 1, 7)
+    snapshot_id = ledger.compact(client.engine)
+    assert ledger.compact(client.engine) is None
+    after_compaction = now()
+    set_quantity(client, StorageProduct, 1, 1)
+
+    # The migration's baseline already holds the seeded stock.
+    at_start = as_of(client, start)
+    assert at_start["products"] == [{"id": 1, "quantity": 4}]
+    assert at_start["materials"] == [{"id": 1, "quantity": 9}]
+    assert at_start["tail_movements"] == 0
+    assert as_of(client, after_first)["products"] == [{"id": 1, "quantity": 10}]
+    compacted = as_of(client, after_compaction)
+    assert (compacted["snapshot_id"], compacted["tail_movements"]) == (snapshot_id, 0)
+    assert compacted["products"] == [{"id": 1, "quantity": 7}]
+    current = as_of(client)
+    assert (current["snapshot_id"], current["tail_movements"]) == (snapshot_id, 1)
+    assert current["products"] == [{"id": 1, "quantity": 1}]
+    material = as_of(client, kind="material", item_id=1)
+    assert (material["products"], material["materials"]) == ([], [{"id": 1, "quantity": 9}])
+
+    with client.engine.connect() as connection:
+        totals = connection.execute(text("SELECT sum(quantity) FROM storage_product")).scalar()
+    assert sum(item["quantity"] for item in current["products"]) == totals
+
+
+def test_compaction_waits_for_enough_movements(client):
+    set_quantity(client, StorageProduct, 1, 5)
+    assert ledger.compact(client.engine, min_tail=2) is None
+    set_quantity(client, StorageProduct, 1, 6)
+    assert ledger.compact(client.engine, min_tail=2) is not None
+
+
+def test_consumption_movements_reference_the_order(client):
+    with client.session() as db:
+        db.add_all([Order(order_date=datetime(2024, 1, 1), status="Pending"),
+                    ProductMaterial(product_id=2, material_id=1, quantity=3)])
+        db.flush()
+        db.add_all([OrderProduct(order_id=1, product_id=1, quantity=2),
+                    OrderProduct(order_id=1, product_id=2, quantity=1)])
+        db.commit()
+        assert consume(db, [1], "Shipped") == [1]
+        db.commit()
+        assert db.execute(text("SELECT count(*) FROM inventory_movement_context")).scalar() == 0
+    consumed = client.get("/inventory/movements?after=2").json()
+    assert [(m["kind"], m["item_id"], m["delta"], m["reason"], m["order_id"]) for m in consumed] == [
+        ("product", 1, -2, "consumption", 1), ("material", 1, -3, "consumption", 1),
+    ]
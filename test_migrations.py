@@ -0,0 +1,103 @@
+from sqlalchemy import create_engine
+
+import migrations
+from database import Base
+
+
+def make_legacy_db(path):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        names = connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"
+        ).scalars().all()
+        for name in names:
+            connection.exec_driver_sql(f"DROP INDEX {name}")
+    return engine
+
+
+def test_upgrade_adds_indexes_and_merges_duplicates(tmp_path):
+    engine = make_legacy_db(tmp_path / "legacy.db")
+    with engine.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO \"order\" (id, order_date, status) VALUES (1, '2024-01-01', 'New')")
+        connection.exec_driver_sql("INSERT INTO product (id, name) VALUES (1, 'Tea')")
+        connection.exec_driver_sql(
+            "INSERT INTO order_product (order_id, product_id, quantity) VALUES (1, 1, 2), (1, 1, 3)"
+        )
+        connection.exec_driver_sql("INSERT INTO storage_product (product_id, quantity) VALUES (1, 4), (1, 6)")
+
+    applied = migrations.upgrade(engine)
+    assert [m.version for m in applied] == [m.version for m in migrations.MIGRATIONS]
+
+    with engine.connect() as connection:
+        assert migrations.current_version(connection) == migrations.head_version()
+        rows = connection.exec_driver_sql("SELECT order_id, product_id, quantity FROM order_product").fetchall()
+        assert rows == [(1, 1, 5)]
+        assert connection.exec_driver_sql("SELECT product_id, quantity FROM storage_product").fetchall() == [(1, 10)]
+        indexes = connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'").scalars().all()
+        assert "uq_order_product_order_id_product_id" in indexes
+        assert "uq_storage_material_material_id" in indexes
+        assert "ix_storage_material_material_id" not in indexes
+
+    assert migrations.upgrade(engine) == []
+
+
+def test_index_report_uses_fk_indexes(tmp_path):
+    engine = make_legacy_db(tmp_path / "report.db")
+    migrations.upgrade(engine)
+    report = {name: index for name, index, plan in migrations.index_report(engine)}
+    assert report["read_order"] == "INTEGER PRIMARY KEY"
+    assert report["relationship OrderProduct.product_id"] == "ix_order_product_product_id"
+    assert report["relationship StorageMaterial.material_id"] == "uq_storage_material_material_id"
+    assert report["filter order.status"] == "ix_order_status_order_date"
+    assert all(index for name, index in report.items() if name.startswith("filter "))
+
+
+def test_upgrade_rebuilds_foreign_keys_with_delete_actions(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'cascade.db'}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP TABLE order_product")
+        connection.exec_driver_sql(
+            "CREATE TABLE order_product (id INTEGER NOT NULL, order_id INTEGER, product_id INTEGER, "
+            "quantity INTEGER NOT NULL, PRIMARY KEY (id), FOREIGN KEY(order_id) REFERENCES \"order\" (id), "
+            "FOREIGN KEY(product_id) REFERENCES product (id))"
+        )
+        connection.exec_driver_sql("CREATE UNIQUE INDEX uq_order_product_order_id_product_id "
+                                   "ON order_product (order_id, product_id)")
+        connection.exec_driver_sql("INSERT INTO \"order\" (id, order_date, status) VALUES (1, '2024-01-01', 'New')")
+        connection.exec_driver_sql("INSERT INTO product (id, name) VALUES (1, 'Tea')")
+        connection.exec_driver_sql(
+            "INSERT INTO order_product (id, order_id, product_id, quantity) "
+            "VALUES (1, 1, 1, 2), (2, NULL, 1, 3), (3, 1, 9, 4)"
+        )
+    migrations.stamp(engine, 2)
+
+    assert [m.version for m in migrations.upgrade(engine, target=3)] == [3]
+    with engine.connect() as connection:
+        assert migrations._delete_actions(connection, "order_product") == {
+            "order_id": "CASCADE", "product_id": "SET NULL",
+        }
+        rows = connection.exec_driver_sql("SELECT id, order_id, product_id FROM order_product ORDER BY id").fetchall()
+        assert rows == [(1, 1, 1), (3, 1, None)]
+        indexes = connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'order_product'"
+        ).scalars().all()
+        assert "uq_order_product_order_id_product_id" in indexes
+
+
+def test_upgrade_adds_change_version_triggers(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'versions.db'}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP TABLE change_version")
+        connection.exec_driver_sql("DROP TRIGGER trg_plant_version_insert")
+    migrations.stamp(engine, 3)
+
+    assert [m.version for m in migrations.upgrade(engine, target=4)] == [4]
+    with engine.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO plant (name) VALUES ('A')")
+        connection.exec_driver_sql("UPDATE plant SET capacity = 1")
+        assert connection.exec_driver_sql(
+            "SELECT version FROM change_version WHERE table_name = 'plant'"
+        ).scalar() == 2
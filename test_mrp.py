@@ -0,0 +1,105 @@
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import mrp
+from database import Material, Order, OrderProduct, Plant, PlantMaterial, PlantProduct, Product, ProductMaterial
+from database import StorageMaterial, StorageProduct
+
+
+def seed(db):
+    db.add_all([Plant(name="North"), Plant(name="South")])
+    db.add_all([Product(name="Tea"), Product(name="Cup"), Product(name="Spoon")])
+    db.add_all([Material(name="Leaves"), Material(name="Clay"), Material(name="Steel")])
+    db.add_all([
+        Order(order_date=datetime(2024, 1, 1), status="Pending"),
+        Order(order_date=datetime(2024, 1, 2), status="New"),
+        Order(order_date=datetime(2024, 1, 3), status="Shipped"),
+    ])
+    db.flush()
+    db.add_all([
+        OrderProduct(order_id=1, product_id=1, quantity=10),
+        OrderProduct(order_id=1, product_id=2, quantity=3),
+        OrderProduct(order_id=2, product_id=1, quantity=5),
+        OrderProduct(order_id=2, product_id=3, quantity=4),
+        # Shipped orders don't count.
+        OrderProduct(order_id=3, product_id=2, quantity=100),
+        # 15 Tea ordered, 5 in stock: 10 to make.
+        StorageProduct(product_id=1, quantity=5),
+        # Tea: 2 leaves; Cup: 3 clay + 1 steel; Spoon: 1 steel.
+        ProductMaterial(product_id=1, material_id=1, quantity=2),
+        ProductMaterial(product_id=2, material_id=2, quantity=3),
+        ProductMaterial(product_id=2, material_id=3, quantity=1),
+        ProductMaterial(product_id=3, material_id=3, quantity=1),
+        # Tea is made at North (larger quantity wins), Cup at South, nobody makes Spoons.
+        PlantProduct(plant_id=1, product_id=1, quantity=50),
+        PlantProduct(plant_id=2, product_id=1, quantity=10),
+        PlantProduct(plant_id=2, product_id=2, quantity=10),
+        PlantMaterial(plant_id=1, material_id=1, quantity=12),
+        PlantMaterial(plant_id=2, material_id=2, quantity=4),
+        StorageMaterial(material_id=1, quantity=3),
+        StorageMaterial(material_id=3, quantity=1),
+    ])
+
+
+@pytest.fixture
+def client(make_client):
+    return make_client(mrp.router, seed=seed)
+
+
+def lines(items, *keys):
+    return [tuple(item[key] for key in keys) for item in items]
+
+
+def test_run_nets_product_plant_and_central_stock(client):
+    response = client.post("/planning/mrp-runs")
+    assert response.status_code == 201
+    run = response.json()
+    assert (run["orders"], run["order_lines"]) == (2, 4)
+    assert lines(run["materials"], "material_id", "required", "on_hand", "shortage") == [
+        (1, 20, 15, 5),  # 12 at North + 3 central
+        (2, 9, 4, 5),
+        (3, 7, 1, 6),
+    ]
+    assert lines(run["plants"], "plant_id", "material_id", "required", "on_hand", "shortage") == [
+        (1, 1, 20, 12, 8),
+        (2, 2, 9, 4, 5),
+        (2, 3, 3, 0, 3),
+    ]
+    assert all(item["plant_id"] is None for item in run["materials"])
+
+
+def test_runs_are_persisted(client):
+    created = client.post("/planning/mrp-runs").json()
+    stored = client.get(f"/planning/mrp-runs/{created['id']}").json()
+    assert stored == created
+    assert client.get("/planning/mrp-runs/99").status_code == 404
+
+
+def test_compute_without_open_orders():
+    empty = {3: np.empty((0, 3), dtype=np.int64), 2: np.empty((0, 2), dtype=np.int64)}
+    inputs = mrp.Inputs(0, **{name: empty[columns] for name, columns in mrp.COLUMNS.items()})
+    totals, plants = mrp.compute(inputs)
+    assert totals.shape == (0, 4) and plants.shape == (0, 5)
+
+
+def test_writers_are_not_blocked_while_a_run_computes(client, monkeypatch):
+    compute = mrp.compute
+
+    def compute_while_writing(inputs):
+        # A writer that gives up at once if the run holds the write lock.
+        writer = sqlite3.connect(client.engine.url.database, timeout=0)
+        try:
+            writer.execute("UPDATE storage_material SET quantity = quantity + 1")
+            writer.commit()
+        finally:
+            writer.close()
+        return compute(inputs)
+
+    monkeypatch.setattr(mrp, "compute", compute_while_writing)
+    response = client.post("/planning/mrp-runs")
+    assert response.status_code == 201, response.text
+    # The run reflects the stock as it was read, before the concurrent write.
+    assert {m["material_id"]: m["on_hand"] for m in response.json()["materials"]}[1] == 15
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import apis
+from database import Order, Product
+from pagination import MAX_LIMIT, NEXT_CURSOR_HEADER, encode_cursor
+
+
+def seed(db):
+    db.add_all(Product(name=f"Product {i}", category="C") for i in range(25))
+    start = datetime(2024, 1, 1)
+    # Pairs of orders share a date so paging has to break ties by id.
+    db.add_all(Order(order_date=start + timedelta(days=i // 2), status="New") for i in range(11))
+
+
+@pytest.fixture
+def client(make_client):
+    return make_client(apis.router, seed=seed)
+
+
+def walk(client, url, **params):
+    pages = []
+    response = client.get(url, params=params)
+    while True:
+        assert response.status_code == 200
+        pages.append(response.json())
+        if NEXT_CURSOR_HEADER not in response.headers:
+            assert "link" not in response.headers
+            return pages
+        assert response.headers["link"].endswith('; rel="next"')
+        response = client.get(url, params=dict(params, after=response.headers[NEXT_CURSOR_HEADER]))
+
+
+def test_cursor_pages_cover_every_row_once(client):
+    pages = walk(client, "/products/", limit=10)
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert [item["id"] for page in pages for item in page] == list(range(1, 26))
+
+
+def test_descending_sort_breaks_ties_by_id(client):
+    pages = walk(client, "/orders/", limit=3, sort="-order_date")
+    rows = [(item["order_date"], item["id"]) for page in pages for item in page]
+    assert len(rows) == 11
+    assert rows == sorted(rows, reverse=True)
+
+
+def test_link_header_can_be_followed(client):
+    response = client.get("/products/", params={"limit": 20, "skip": 0})
+    next_url = response.headers["link"].split(">")[0].lstrip("<")
+    assert "skip" not in next_url
+    assert [item["id"] for item in client.get(next_url).json()] == list(range(21, 26))
+
+
+def test_offset_mode_still_works(client):
+    response = client.get("/products/", params={"skip": 20, "limit": 3})
+    assert [item["id"] for item in response.json()] == [21, 22, 23]
+    assert NEXT_CURSOR_HEADER in response.headers
+
+
+@pytest.mark.parametrize("params", [
+    {"after": "not-a-cursor"},
+    {"after": encode_cursor("name", ["Product 1", 2])},
+    {"sort": "category"},
+    {"skip": 5, "after": encode_cursor("id", [5])},
+])
+def test_bad_page_requests(client, params):
+    assert client.get("/products/", params=params).status_code == 400
+
+
+@pytest.mark.parametrize("limit", [0, -1, MAX_LIMIT + 1])
+def test_limit_out_of_range(client, limit):
+    assert client.get("/products/", params={"limit": limit}).status_code == 422
@@ -0,0 +1,168 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from fastapi import Depends
+from starlette.middleware import Middleware
+
+import apis
+import nplusone
+from database import PlantProduct, get_db
+from instrumentation import RequestSQLStats, QueryRecord, SQLStatsMiddleware
+from nplusone import NPlusOneError, NPlusOneMiddleware
+
+SEED_ROWS = 5
+
+# Queries per request, including the ones the ORM issues while committing and
+# refreshing. These must not grow with the number of rows in the tables; deletes
+# are one statement and leave the children to ON DELETE in the schema. Reads
+# include the change_version lookup behind their ETag. Shipping an order (patch_order)
+# also consumes its stock: BEGIN IMMEDIATE, five grouped reads, setting and clearing the
+# ledger's movement reason and the consumption record.
+QUERY_BUDGETS = {
+    "create_plant": 2, "read_plants": 2, "read_plant": 2, "update_plant": 1, "patch_plant": 1,
+    "delete_plant": 1,
+    "create_product": 2, "read_products": 2, "read_product": 2, "update_product": 1, "patch_product": 1,
+    "delete_product": 1,
+    "create_material": 2, "read_materials": 2, "read_material": 2, "update_material": 1, "patch_material": 1,
+    "delete_material": 1,
+    "create_order": 2, "read_orders": 2, "read_order": 2, "update_order": 1, "patch_order": 10,
+    "delete_order": 1,
+    "create_plant_product": 2, "read_plant_products": 2, "delete_plant_product": 1,
+    "create_plant_material": 2, "read_plant_materials": 2, "delete_plant_material": 1,
+    "create_product_material": 2, "read_product_materials": 2, "delete_product_material": 1,
+    "create_order_product": 2, "read_order_products": 2, "delete_order_product": 1,
+    "create_storage_product": 2, "read_storage_products": 2, "update_storage_product": 1,
+    "patch_storage_product": 1, "delete_storage_product": 1,
+    "create_storage_material": 2, "read_storage_materials": 2, "update_storage_material": 1,
+    "patch_storage_material": 1, "delete_storage_material": 1,
+}
+
+
+@pytest.fixture
+def client(make_client, monkeypatch):
+    monkeypatch.setattr(apis.settings, "nplusone", "raise")
+    return make_client(apis.router, middlewares=[
+        Middleware(NPlusOneMiddleware, settings=apis.settings), Middleware(SQLStatsMiddleware),
+    ])
+
+
+def seed(client):
+    for i in range(SEED_ROWS):
+        client.post("/plants/", json={"name": f"Plant {i}", "location": "Here", "capacity": 10})
+        client.post("/products/", json={"name": f"Product {i}", "category": "C", "price": 1.5})
+        client.post("/materials/", json={"name": f"Material {i}", "unit": "kg", "cost": 2.5})
+        client.post("/orders/", json={"order_date": "2024-01-01T00:00:00", "status": "New"})
+    for i in range(1, SEED_ROWS + 1):
+        client.post("/plant-products/", json={"plant_id": 1, "product_id": i, "quantity": 1})
+        client.post("/plant-materials/", json={"plant_id": 1, "material_id": i, "quantity": 1})
+        client.post("/product-materials/", json={"product_id": 1, "material_id": i, "quantity": 1})
+        client.post("/order-products/", json={"order_id": 1, "product_id": i, "quantity": 1})
+        client.post("/storage-products/", json={"product_id": i, "quantity": 1})
+        client.post("/storage-materials/", json={"material_id": i, "quantity": 1})
+
+
+def endpoint_calls():
+    plant = {"name": "New Plant", "location": "There", "capacity": 5}
+    product = {"name": "New Product", "category": "C", "price": 3}
+    material = {"name": "New Material", "unit": "kg", "cost": 4}
+    order = {"order_date": "2024-02-01T00:00:00", "status": "Open"}
+    return [
+        ("read_plants", "GET", "/plants/", None),
+        ("read_plant", "GET", "/plants/1", None),
+        ("create_plant", "POST", "/plants/", plant),
+        ("update_plant", "PUT", "/plants/2", dict(plant, name="Renamed Plant")),
+        ("patch_plant", "PATCH", "/plants/3", {"capacity": 7}),
+        ("read_products", "GET", "/products/", None),
+        ("read_product", "GET", "/products/1", None),
+        ("create_product", "POST", "/products/", product),
+        ("update_product", "PUT", "/products/2", dict(product, name="Renamed Product")),
+        ("patch_product", "PATCH", "/products/3", {"price": 9.5}),
+        ("read_materials", "GET", "/materials/", None),
+        ("read_material", "GET", "/materials/1", None),
+        ("create_material", "POST", "/materials/", material),
+        ("update_material", "PUT", "/materials/2", dict(material, name="Renamed Material")),
+        ("patch_material", "PATCH", "/materials/3", {"unit": "g"}),
+        ("read_orders", "GET", "/orders/", None),
+        ("read_order", "GET", "/orders/1", None),
+        ("create_order", "POST", "/orders/", order),
+        ("update_order", "PUT", "/orders/2", order),
+        ("patch_order", "PATCH", "/orders/3", {"status": "Shipped"}),
+        ("read_plant_products", "GET", "/plant-products/", None),
+        ("create_plant_product", "POST", "/plant-products/", {"plant_id": 2, "product_id": 1, "quantity": 1}),
+        ("delete_plant_product", "DELETE", "/plant-products/2", None),
+        ("read_plant_materials", "GET", "/plant-materials/", None),
+        ("create_plant_material", "POST", "/plant-materials/", {"plant_id": 2, "material_id": 1, "quantity": 1}),
+        ("delete_plant_material", "DELETE", "/plant-materials/2", None),
+        ("read_product_materials", "GET", "/product-materials/", None),
+        ("create_product_material", "POST", "/product-materials/",
+         {"product_id": 2, "material_id": 1, "quantity": 1}),
+        ("delete_product_material", "DELETE", "/product-materials/2", None),
+        ("read_order_products", "GET", "/order-products/", None),
+        ("create_order_product", "POST", "/order-products/", {"order_id": 2, "product_id": 1, "quantity": 1}),
+        ("delete_order_product", "DELETE", "/order-products/2", None),
+        ("read_storage_products", "GET", "/storage-products/", None),
+        ("create_storage_product", "POST", "/storage-products/", {"product_id": 6, "quantity": 3}),
+        ("update_storage_product", "PUT", "/storage-products/2", {"product_id": 2, "quantity": 4}),
+        ("patch_storage_product", "PATCH", "/storage-products/3", {"quantity": 9}),
+        ("delete_storage_product", "DELETE", "/storage-products/2", None),
+        ("read_storage_materials", "GET", "/storage-materials/", None),
+        ("create_storage_material", "POST", "/storage-materials/", {"material_id": 6, "quantity": 3}),
+        ("update_storage_material", "PUT", "/storage-materials/2", {"material_id": 2, "quantity": 4}),
+        ("patch_storage_material", "PATCH", "/storage-materials/3", {"quantity": 9}),
+        ("delete_storage_material", "DELETE", "/storage-materials/2", None),
+        # Parents last, so they still have the children seeded above.
+        ("delete_plant", "DELETE", "/plants/1", None),
+        ("delete_product", "DELETE", "/products/1", None),
+        ("delete_material", "DELETE", "/materials/1", None),
+        ("delete_order", "DELETE", "/orders/1", None),
+    ]
+
+
+def test_every_endpoint_has_a_budget():
+    assert {route.name for route in apis.router.routes} == set(QUERY_BUDGETS)
+    assert {name for name, *_ in endpoint_calls()} == set(QUERY_BUDGETS)
+
+
+def test_endpoints_stay_within_query_budget(client):
+    seed(client)
+    over_budget = {}
+    for name, method, url, body in endpoint_calls():
+        response = client.request(method, url, json=body)
+        assert response.status_code < 400, (name, response.status_code, response.text)
+        count = int(response.headers["x-query-count"])
+        if count > QUERY_BUDGETS[name]:
+            over_budget[name] = count
+    assert over_budget == {}
+
+
+def test_detect_flags_repeated_statements():
+    stats = RequestSQLStats()
+    for product_id in (1, 2, 3):
+        stats.add(QueryRecord("SELECT * FROM product WHERE id = ?", (product_id,), 0.0, 1))
+    for _ in range(3):
+        stats.add(QueryRecord("SELECT 1", (), 0.0, 1))
+    repeats = nplusone.detect(stats, threshold=3)
+    assert [(repeat.statement, repeat.count) for repeat in repeats] == [("SELECT * FROM product WHERE id = ?", 3)]
+    assert nplusone.detect(stats, threshold=4) == []
+
+
+def test_raise_mode_fails_n_plus_one_requests(client):
+    seed(client)
+
+    @client.app.get("/lazy-walk")
+    def lazy_walk(db=Depends(get_db)):
+        return [link.product.name for link in db.query(PlantProduct).all()]
+
+    with pytest.raises(NPlusOneError):
+        client.get("/lazy-walk")
+
+
+def test_lazy_raise_switch():
+    env = dict(os.environ, DB_LAZY_RAISE="1")
+    result = subprocess.run(
+        [sys.executable, "-c", "from database import Plant; print(Plant.plant_product.property.lazy)"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env, capture_output=True, text=True,
+    )
+    assert result.stdout.strip() == "raise", result.stderr
@@ -0,0 +1,74 @@
+import pytest
+
+import search
+from database import Material, Plant, Product
+
+
+def seed(db):
+    # Written before the index exists: migration 5 has to pick them up.
+    db.add_all([
+        Product(name="Herbal Tea", description="Chamomile and mint"),
+        Product(name="Black Coffee", description="Roasted beans, pairs well with herbal biscuits"),
+        Material(name="Mint leaves", description="Dried herbal leaves"),
+        Plant(name="North Plant", location="Herbal valley"),
+    ])
+
+
+@pytest.fixture
+def client(make_client):
+    return make_client(search.router, seed=seed, run_migrations=True)
+
+
+def hits(client, **params):
+    response = client.get("/search", params=params)
+    assert response.status_code == 200
+    return [(hit["entity"], hit["id"]) for hit in response.json()]
+
+
+def test_ranks_name_matches_first_and_highlights(client):
+    response = client.get("/search", params={"q": "herbal"})
+    results = response.json()
+    assert (results[0]["entity"], results[0]["name"]) == ("product", "Herbal Tea")
+    assert {(hit["entity"], hit["id"]) for hit in results} == {("product", 1), ("product", 2), ("material", 1),
+                                                               ("plant", 1)}
+    assert any("<b>herbal</b>" in hit["snippet"].lower() for hit in results)
+    assert response.headers["etag"]
+
+
+def test_prefix_and_entity_filter(client):
+    assert hits(client, q="herbal te*") == [("product", 1)]
+    assert hits(client, q="herbal te") == []
+    assert set(hits(client, q="herbal", entity="material,plant")) == {("material", 1), ("plant", 1)}
+    assert client.get("/search", params={"q": "herbal", "entity": "order"}).status_code == 400
+
+
+def test_triggers_follow_inserts_updates_and_deletes(client):
+    with client.session() as db:
+        db.add(Product(name="Green Tea"))
+        db.get(Product, 1).name = "Fruit Infusion"
+        db.delete(db.get(Material, 1))
+        db.commit()
+    assert hits(client, q="tea") == [("product", 3)]
+    assert hits(client, q="mint", entity="material") == []
+    assert hits(client, q="infusion") == [("product", 1)]
+
+
+def test_user_input_cannot_break_the_query(client):
+    for q in ['"', "tea OR", "NEAR(a b)", "-", "col:tea"]:
+        assert client.get("/search", params={"q": q}).status_code == 200
+
+
+def test_rebuild_restores_the_index(client):
+    with client.engine.begin() as connection:
+        connection.exec_driver_sql("DELETE FROM search_fts")
+        assert search.rebuild(connection) == 4
+    assert hits(client, q="coffee") == [("product", 2)]
+
+
+def test_old_name_matches_outrank_many_newer_description_matches(client):
+    with client.session() as db:
+        db.add_all(Product(name=f"Cup {i}", description="Goes well with tea") for i in range(2100))
+        db.commit()
+    assert hits(client, q="tea", entity="product")[0] == ("product", 1)
+    # The opt-in cap only scores the newest matches.
+    assert ("product", 1) not in hits(client, q="tea", entity="product", max_ranked=100)
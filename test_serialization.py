@@ -0,0 +1,36 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import schemas
+from database import Base, Order, Product
+from serialization import json_list, list_adapter, row_columns
+
+
+def test_json_list_matches_the_response_model_path(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'serialize.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add_all([
+            Order(order_date=datetime(2024, 1, 1, 8, 30), status="New"),
+            Order(order_date=datetime(2024, 1, 2), status="Shipped", customer_name="Ann"),
+            Product(name="Tea", price=Decimal("2.50")),
+        ])
+        db.commit()
+
+        for model, schema in ((Order, schemas.Order), (Product, schemas.Product)):
+            expected = jsonable_encoder(list_adapter(schema).validate_python(db.query(model).all(), from_attributes=True))
+            response = Response()
+            response.headers["ETag"] = '"abc"'
+            encoded = json_list(schema, db.query(*row_columns(model)).all(), response)
+            assert json.loads(encoded.body) == expected
+            assert encoded.headers["etag"] == '"abc"'
+            assert encoded.headers["content-type"] == "application/json"
+
+    assert json_list(schemas.Order, [], Response()).body == b"[]"
+    engine.dispose()
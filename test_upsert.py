@@ -0,0 +1,47 @@
+from datetime import datetime
+
+import pytest
+
+import upsert
+from database import Order, OrderProduct, Product, StorageProduct
+
+
+def seed(db):
+    db.add_all([Product(name="Tea"), Product(name="Cup"), Order(order_date=datetime(2024, 1, 1), status="New")])
+
+
+@pytest.fixture
+def client(make_client):
+    client = make_client(upsert.router, seed=seed)
+    client.rows = lambda model: client.session().query(model).order_by(model.id).all()
+    return client
+
+
+def test_upsert_by_key_sets_then_adds(client):
+    first = client.put("/storage-products/by-key", json={"product_id": 1, "quantity": 5})
+    assert first.status_code == 200
+    assert first.json() == {"id": 1, "product_id": 1, "quantity": 5}
+
+    client.put("/storage-products/by-key", json={"product_id": 1, "quantity": 7})
+    added = client.put("/storage-products/by-key", params={"mode": "add"}, json={"product_id": 1, "quantity": 3})
+    assert added.json() == {"id": 1, "product_id": 1, "quantity": 10}
+    assert len(client.rows(StorageProduct)) == 1
+
+
+def test_bulk_upsert_matches_ids_by_natural_key(client):
+    client.put("/order-products/by-key", json={"order_id": 1, "product_id": 2, "quantity": 1})
+    lines = [
+        {"order_id": 1, "product_id": 1, "quantity": 2},
+        {"order_id": 1, "product_id": 2, "quantity": 3},
+        {"order_id": 1, "product_id": 1, "quantity": 4},
+    ]
+    response = client.put("/order-products/by-key/bulk", params={"mode": "add"}, json=lines)
+    assert response.status_code == 200
+    assert [(item["index"], item["id"]) for item in response.json()["created"]] == [(0, 2), (1, 1), (2, 2)]
+    rows = [(row.product_id, row.quantity) for row in client.rows(OrderProduct)]
+    assert rows == [(2, 4), (1, 6)]
+
+
+def test_upsert_rejects_unknown_mode(client):
+    response = client.put("/storage-products/by-key", params={"mode": "merge"}, json={"product_id": 1, "quantity": 1})
+    assert response.status_code == 422
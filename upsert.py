@@ -0,0 +1,65 @@
+"""Natural-key upserts for the association and storage tables.
+
+``PUT /{resource}/by-key`` writes one row identified by its natural key (e.g.
+``product_id`` for storage, ``order_id, product_id`` for order lines) with a single
+``INSERT ... ON CONFLICT DO UPDATE``, so clients no longer look the row up first.
+``PUT /{resource}/by-key/bulk`` does the same for an array or NDJSON body.
+``?mode=set`` (default) overwrites the quantity, ``?mode=add`` adds to it.
+"""
+from typing import List
+
+from fastapi import APIRouter, Depends, Query, Request, Response
+from pydantic import TypeAdapter
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+import schemas
+from bulk import write_bulk
+from database import get_db
+from resources import RESOURCES
+
+router = APIRouter()
+
+MODE = Query("set", pattern="^(set|add)$")
+
+
+def upsert_statement(resource, mode: str = "set"):
+    table = resource.table
+    statement = insert(table)
+    excluded = statement.excluded
+    values = {
+        column.name: excluded[column.name]
+        for column in table.c if column.name != "id" and column.name not in resource.natural_key
+    }
+    if mode == "add":
+        values["quantity"] = func.coalesce(table.c.quantity, 0) + func.coalesce(excluded.quantity, 0)
+    return statement.on_conflict_do_update(
+        index_elements=[table.c[key] for key in resource.natural_key], set_=values
+    )
+
+
+def add_upsert_routes(router: APIRouter, resource) -> None:
+    create_schema = resource.create_schema
+    adapter = TypeAdapter(List[create_schema])
+
+    def upsert(payload: create_schema, mode: str = MODE, db: Session = Depends(get_db)):
+        statement = upsert_statement(resource, mode).returning(*resource.table.c)
+        row = db.execute(statement, payload.model_dump()).one()
+        db.commit()
+        return row._mapping
+
+    async def upsert_bulk(request: Request, response: Response, mode: str = MODE, atomic: bool = False,
+                          db: Session = Depends(get_db)):
+        return await write_bulk(request, response, db, adapter, resource.table, atomic,
+                                statement=upsert_statement(resource, mode), keys=resource.natural_key)
+
+    router.add_api_route(f"{resource.path}/by-key", upsert, methods=["PUT"], response_model=resource.schema,
+                         name=f"upsert_{resource.singular}")
+    router.add_api_route(f"{resource.path}/by-key/bulk", upsert_bulk, methods=["PUT"],
+                         response_model=schemas.BulkResult, name=f"upsert_{resource.plural}_bulk")
+
+
+for _resource in RESOURCES:
+    if _resource.natural_key:
+        add_upsert_routes(router, _resource)